@@ -0,0 +1,41 @@
+"""add admin_stats counters table
+
+Revision ID: 20261019_add_admin_stats
+Revises: merge_final_20251228
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_add_admin_stats'
+down_revision = 'merge_final_20251228'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'admin_stats',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('total_users', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('doctors', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('patients', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('appointments', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('reconciled_at', sa.DateTime(timezone=True), nullable=True),
+    )
+
+    # Seed the single counters row from the current table contents
+    op.execute("""
+    INSERT INTO admin_stats (id, total_users, doctors, patients, appointments, reconciled_at)
+    SELECT 1,
+           (SELECT count(*) FROM users),
+           (SELECT count(*) FROM users WHERE role = 'doctor'),
+           (SELECT count(*) FROM users WHERE role = 'patient'),
+           (SELECT count(*) FROM appointments),
+           now();
+    """)
+
+
+def downgrade():
+    op.drop_table('admin_stats')
@@ -0,0 +1,46 @@
+"""add doctor_patients roster link table
+
+Revision ID: 20261019_doctor_patients
+Revises: 20261019_doctor_trgm
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_doctor_patients'
+down_revision = '20261019_doctor_trgm'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'doctor_patients',
+        sa.Column('doctor_id', sa.String(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('patient_id', sa.String(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('patient_name', sa.String(), nullable=False, server_default=''),
+        sa.Column('first_seen_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+        sa.Column('last_seen_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+    )
+    op.create_index('ix_doctor_patients_roster', 'doctor_patients', ['doctor_id', 'patient_name', 'patient_id'])
+
+    # Backfill from existing appointments; medical_records has no doctor column
+    # (only the free-text doctor_name), so it contributes no links
+    op.execute("""
+    INSERT INTO doctor_patients (doctor_id, patient_id, patient_name, first_seen_at, last_seen_at)
+    SELECT pairs.doctor_id, pairs.patient_id,
+           lower(coalesce(u.full_name, split_part(u.email, '@', 1))),
+           now(), now()
+    FROM (
+        SELECT DISTINCT doctor_id, patient_id FROM appointments WHERE doctor_id IS NOT NULL
+    ) AS pairs
+    JOIN users u ON u.id = pairs.patient_id
+    JOIN users d ON d.id = pairs.doctor_id
+    ON CONFLICT DO NOTHING;
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_doctor_patients_roster', table_name='doctor_patients')
+    op.drop_table('doctor_patients')
@@ -0,0 +1,32 @@
+"""add pg_trgm indexes for doctor directory search
+
+Revision ID: 20261019_doctor_trgm
+Revises: 20261019_user_listing_indexes
+Create Date: 2026-10-19 00:00:00.000000
+
+NOTE: Postgres-only. Other dialects fall back to the in-process trigram index
+in app/services/doctor_search.py, so this migration is a no-op there.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_doctor_trgm'
+down_revision = '20261019_user_listing_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_users_full_name_trgm ON users USING gin (full_name gin_trgm_ops);')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_doctors_specialization_trgm ON doctors USING gin (specialization gin_trgm_ops);')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('DROP INDEX IF EXISTS ix_doctors_specialization_trgm;')
+    op.execute('DROP INDEX IF EXISTS ix_users_full_name_trgm;')
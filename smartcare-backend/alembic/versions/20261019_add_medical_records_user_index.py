@@ -0,0 +1,22 @@
+"""add index for a patient's newest medical records
+
+Revision ID: 20261019_medical_records_user
+Revises: 20261019_room_chat
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_medical_records_user'
+down_revision = '20261019_room_chat'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_medical_records_user_created', 'medical_records', ['user_id', 'created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_medical_records_user_created', table_name='medical_records')
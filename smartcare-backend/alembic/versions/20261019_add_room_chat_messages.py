@@ -0,0 +1,32 @@
+"""add room_chat_messages log table
+
+Revision ID: 20261019_room_chat
+Revises: 20261019_doctor_patients
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_room_chat'
+down_revision = '20261019_doctor_patients'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'room_chat_messages',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('room_id', sa.String(), nullable=False),
+        sa.Column('seq', sa.BigInteger(), nullable=False),
+        sa.Column('sender', sa.String(), nullable=False),
+        sa.Column('frame', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+    op.create_index('ix_room_chat_messages_room_seq', 'room_chat_messages', ['room_id', 'seq', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_room_chat_messages_room_seq', table_name='room_chat_messages')
+    op.drop_table('room_chat_messages')
@@ -0,0 +1,28 @@
+"""add indexes for admin user listing
+
+Revision ID: 20261019_user_listing_indexes
+Revises: 20261019_add_admin_stats
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_user_listing_indexes'
+down_revision = '20261019_add_admin_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_role_active_email', 'users', ['role', 'is_active', 'email'])
+    # text_pattern_ops lets LIKE 'prefix%' use the index under any collation (Postgres only)
+    op.create_index(
+        'ix_users_email_pattern', 'users', ['email'],
+        postgresql_ops={'email': 'text_pattern_ops'},
+    )
+
+
+def downgrade():
+    op.drop_index('ix_users_email_pattern', table_name='users')
+    op.drop_index('ix_users_role_active_email', table_name='users')
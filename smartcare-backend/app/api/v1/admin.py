@@ -1,12 +1,19 @@
+import csv
+import io
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from jose import jwt, JWTError
 
+from app import signaling
 from app.core.config import settings
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models.user import User
 from app.models.appointment import Appointment
+from app.models.doctor import Doctor
+from app.services import admin_stats, doctor_directory, doctor_facets, llm, response_cache
+from app.utils.pagination import decode_cursor, encode_cursor, escape_like, set_next_cursor
 
 router = APIRouter()
 
@@ -33,32 +40,135 @@ def require_admin(payload: dict = Depends(get_token_payload)) -> dict:
 
 
 @router.get("/stats")
-def get_stats(db: Session = Depends(get_db), _payload: dict = Depends(require_admin)):
-    total_users = db.query(User).count()
-    doctors = db.query(User).filter(getattr(User, 'role', None) == 'doctor').count()
-    patients = db.query(User).filter(getattr(User, 'role', None) == 'patient').count()
-    appointments = db.query(Appointment).count()
+def get_stats(approximate: bool = False, db: Session = Depends(get_db), _payload: dict = Depends(require_admin)):
+    # Counters are maintained on write (see app/services/admin_stats.py); this reads one row.
+    # approximate=true uses Postgres planner statistics instead.
+    return admin_stats.read_stats(db, approximate=approximate)
+
+
+@router.post("/stats/reconcile")
+def reconcile_stats(db: Session = Depends(get_db), _payload: dict = Depends(require_admin)):
+    return admin_stats.reconcile(db)
+
+
+@router.get("/signaling")
+def signaling_metrics(_payload: dict = Depends(require_admin)):
+    # Per-worker view: rooms, sockets and outbound queue depth/drops
+    return signaling.manager.metrics()
+
+
+@router.get("/ai")
+def ai_metrics(_payload: dict = Depends(require_admin)):
+    # Per-worker view: LLM calls in flight, timeouts, rejections and latency,
+    # plus note-generation response cache hits and shared in-flight calls
+    return {**llm.get_provider().metrics(), "response_cache": response_cache.cache.stats()}
+
+
+USER_PAGE_MAX = 500
+EXPORT_BATCH_SIZE = 1000
+USER_COLUMNS = (User.id, User.full_name, User.email, User.role, User.is_active, User.created_at)
+CSV_HEADER = ["id", "full_name", "email", "role", "is_active", "created_at"]
+
+
+def _filtered_users(db: Session, role: Optional[str], is_active: Optional[bool], email_prefix: Optional[str]):
+    # Filters line up with ix_users_role_active_email / ix_users_email_pattern
+    query = db.query(*USER_COLUMNS)
+    if role:
+        query = query.filter(User.role == role)
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+    if email_prefix:
+        query = query.filter(User.email.like(escape_like(email_prefix) + "%", escape="\\"))
+    return query
+
+
+def _user_row(u) -> dict:
     return {
-        "total_users": total_users,
-        "doctors": doctors,
-        "patients": patients,
-        "appointments": appointments,
+        "id": u.id,
+        "full_name": u.full_name or u.email,
+        "email": u.email,
+        "role": u.role or 'patient',
+        "is_active": bool(u.is_active) if u.is_active is not None else True,
+        "created_at": u.created_at.isoformat() if u.created_at else None,
     }
 
 
 @router.get("/users")
-def list_users(db: Session = Depends(get_db), _payload: dict = Depends(require_admin)):
-    rows = db.query(User).all()
-    result = []
-    for u in rows:
-        result.append({
-            "id": u.id,
-            "full_name": getattr(u, 'full_name', None) or u.email,
-            "email": u.email,
-            "role": getattr(u, 'role', None) or 'patient',
-            "created_at": u.created_at.isoformat() if getattr(u, 'created_at', None) else None,
-        })
-    return result
+def list_users(
+    response: Response,
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    email_prefix: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=USER_PAGE_MAX),
+    db: Session = Depends(get_db),
+    _payload: dict = Depends(require_admin),
+):
+    """Keyset-paginated user listing ordered by email.
+
+    The body stays a plain list; the cursor for the next page is returned in
+    the X-Next-Cursor header and omitted on the last page.
+    """
+    query = _filtered_users(db, role, is_active, email_prefix)
+    after = decode_cursor(cursor, 1)
+    if after:
+        if not isinstance(after[0], str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(User.email > after[0])
+    rows = query.order_by(User.email.asc()).limit(limit + 1).all()
+
+    page = rows[:limit]
+    if len(rows) > limit:
+        set_next_cursor(response, encode_cursor(page[-1].email))
+    return [_user_row(u) for u in page]
+
+
+@router.get("/users/export.csv")
+def export_users_csv(
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    email_prefix: Optional[str] = None,
+    _payload: dict = Depends(require_admin),
+):
+    """Stream all matching users as CSV, fetched in keyset batches.
+
+    Each batch is formatted and yielded before the next is fetched, so memory
+    stays constant regardless of table size. The generator owns its session
+    because it runs after the request dependencies have been torn down.
+    """
+    def _generate():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(CSV_HEADER)
+        yield buf.getvalue()
+
+        db = SessionLocal()
+        try:
+            last_email = None
+            while True:
+                query = _filtered_users(db, role, is_active, email_prefix)
+                if last_email is not None:
+                    query = query.filter(User.email > last_email)
+                batch = query.order_by(User.email.asc()).limit(EXPORT_BATCH_SIZE).all()
+                if not batch:
+                    break
+                buf.seek(0)
+                buf.truncate()
+                for u in batch:
+                    row = _user_row(u)
+                    writer.writerow([row[k] for k in CSV_HEADER])
+                yield buf.getvalue()
+                last_email = batch[-1].email
+                if len(batch) < EXPORT_BATCH_SIZE:
+                    break
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        _generate(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="users.csv"'},
+    )
 
 
 @router.delete("/users/{user_id}")
@@ -66,10 +176,20 @@ def delete_user(user_id: str, db: Session = Depends(get_db), _payload: dict = De
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    was_doctor = user.role == 'doctor'
+    # The profile goes first: its user_id is NOT NULL, so the ORM cannot orphan it
+    profile = db.query(Doctor).filter(Doctor.user_id == user.id).first()
+    profile_id = profile.id if profile else None
     try:
+        if profile:
+            db.delete(profile)
         db.delete(user)
         db.commit()
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
+    if profile_id is not None:
+        doctor_facets.remove_doctor(profile_id)
+    if was_doctor or profile_id is not None:
+        doctor_directory.invalidate()
     return {"status": "deleted", "id": user_id}
@@ -6,6 +6,7 @@ from datetime import datetime
 from jose import jwt, JWTError
 from ...core.config import settings
 from ...database import get_db
+from ...services import admin_stats, doctor_patients
 import logging
 import hmac
 import hashlib
@@ -89,6 +90,9 @@ def create_appointment(payload: AppointmentCreate, user_id: str = Depends(get_cu
             "status": 'booked',
             "reason": payload.reason,
         })
+        # Raw SQL bypasses the ORM events that maintain admin counters and the roster index
+        admin_stats.apply_deltas(db.connection(), appointments=1)
+        doctor_patients.link_patient(db.connection(), payload.doctor_id, user_id)
         db.commit()
         # --- NEW: Trigger Notification ---
         # This runs only if the commit succeeds
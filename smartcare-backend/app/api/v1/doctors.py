@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
+import json
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
+from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from pydantic import BaseModel
 
@@ -7,6 +8,8 @@ from app.database import get_db
 from app.models.doctor import Doctor
 from app.models.user import User
 from app.api.v1.auth import get_current_user
+from app.services import doctor_search, doctor_directory, doctor_facets
+from app.utils.pagination import set_next_cursor
 
 router = APIRouter()
 
@@ -32,37 +35,75 @@ class UpdateDoctorProfile(BaseModel):
     availability: Optional[dict] = None # {"mon": ["09:00", "17:00"]}
 
 
+DOCTOR_PAGE_MAX = 100
+
+
+def _doctor_row(d: Doctor) -> dict:
+    return {
+        "id": d.id,
+        "user_id": d.user_id,
+        "name": doctor_search.display_name(d.user.full_name, d.user.email),
+        "email": d.user.email,
+        "avatar": getattr(d.user, 'avatar', None),
+        "specialization": d.specialization,
+        "bio": d.bio,
+        "consultation_fee": d.consultation_fee,
+        "availability": d.availability
+    }
+
+
+def _build_page(db: Session, search, specialization, cursor, limit, facets) -> doctor_directory.DirectoryPage:
+    allowed = doctor_facets.get_index(db).matching_ids(facets) if any(facets.values()) else None
+    ids, next_cursor = doctor_search.search_page(db, search, specialization, cursor, limit, allowed)
+    rows = []
+    if ids:
+        # Single eager-loaded query for the whole page (no per-row lazy load of d.user)
+        doctors = db.query(Doctor).options(joinedload(Doctor.user)).filter(Doctor.id.in_(ids)).all()
+        by_id = {d.id: d for d in doctors}
+        rows = [_doctor_row(by_id[i]) for i in ids if i in by_id]
+    body = json.dumps(rows, separators=(",", ":")).encode()
+    return doctor_directory.DirectoryPage(body, next_cursor)
+
+
 @router.get("/", response_model=List[DoctorResponse])
 def get_doctors(
     search: Optional[str] = None, 
     specialization: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=DOCTOR_PAGE_MAX),
+    fee: List[str] = Query([]),
+    day: List[str] = Query([]),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Doctor).join(User)
-    
-    if search:
-        query = query.filter(User.full_name.ilike(f"%{search}%"))
-    if specialization:
-        query = query.filter(Doctor.specialization.ilike(f"%{specialization}%"))
-        
-    doctors = query.all()
-    
-    # Map to response schema manually if needed, or rely on ORM mode if structure matches
-    # Since we are flattening User fields into the response, we might need a helper or manual map
-    results = []
-    for d in doctors:
-        results.append({
-            "id": d.id,
-            "user_id": d.user_id,
-            "name": d.user.full_name if d.user.full_name else d.user.email.split('@')[0],
-            "email": d.user.email,
-            "avatar": d.user.avatar,
-            "specialization": d.specialization,
-            "bio": d.bio,
-            "consultation_fee": d.consultation_fee,
-            "availability": d.availability
-        })
-    return results
+    # Trigram search (pg_trgm on Postgres, in-process index elsewhere), ranked by relevance.
+    # fee/day narrow results to facet values (see /facets).
+    # Pages are cached as serialized JSON per filter key; see app/services/doctor_directory.py.
+    facets = {"fee": fee, "day": day}
+    key = doctor_directory.make_key(search, specialization, cursor, limit, facets)
+    page = doctor_directory.cache.get_or_build(key, lambda: _build_page(db, search, specialization, cursor, limit, facets))
+
+    headers = {"ETag": page.etag, "Cache-Control": "no-cache"}
+    if page.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    response = Response(content=page.body, media_type="application/json", headers=headers)
+    set_next_cursor(response, page.next_cursor)
+    return response
+
+@router.get("/facets")
+def get_facets(
+    specialization: List[str] = Query([]),
+    fee: List[str] = Query([]),
+    day: List[str] = Query([]),
+    db: Session = Depends(get_db)
+):
+    """Facet counts for the directory under the given selection.
+
+    Served from in-memory bitsets; values within a facet are OR'ed, facets are AND'ed.
+    """
+    selected = {"specialization": specialization, "fee": fee, "day": day}
+    return doctor_facets.get_index(db).counts(selected)
+
 
 @router.put("/profile")
 def update_profile(
@@ -91,6 +132,9 @@ def update_profile(
         
     db.commit()
     db.refresh(doctor)
+    doctor_search.index_doctor(doctor, current_user)
+    doctor_facets.index_doctor(doctor)
+    doctor_directory.invalidate()
     return {"status": "success", "profile": {
         "specialization": doctor.specialization,
         "bio": doctor.bio
@@ -17,6 +17,7 @@ from app.core.encryption import encrypt_data, decrypt_data
 from app.models.medical_record import MedicalRecord
 from app.models.user import User
 from app.models.audit_log import AuditLog
+from app.services import history_digest
 
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -97,6 +98,8 @@ def create_medical_record(
         db.add(mr)
         db.commit()
         db.refresh(mr)
+        # Fold the new record into the cached history digest (no decryption needed)
+        history_digest.cache.record_added(str(current_user.id), mr, diagnosis_json, notes_json or '')
 
         # Audit Log
         audit = AuditLog(
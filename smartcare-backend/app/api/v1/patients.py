@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
@@ -6,10 +7,14 @@ from pydantic import BaseModel
 from app.database import get_db
 from app.models.patient import Patient
 from app.models.user import User
+from app.models.doctor_patient import DoctorPatient
 from app.api.v1.auth import get_current_user
+from app.utils.pagination import decode_cursor, encode_cursor, escape_like, set_next_cursor
 
 router = APIRouter()
 
+ROSTER_PAGE_MAX = 200
+
 class PatientResponse(BaseModel):
     id: int
     user_id: str
@@ -20,35 +25,73 @@ class PatientResponse(BaseModel):
     gender: Optional[str] = None
     blood_group: Optional[str] = None
 
-@router.get("/", response_model=List[PatientResponse])
-def get_patients(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    # Only Admin or Doctors should see the full patient list
-    if current_user.role not in ['admin', 'doctor']:
-        raise HTTPException(status_code=403, detail="Access denied")
 
-    # Find all users with role 'patient' OR entries in 'patients' table
-    # A cleaner way is to look at the User table joined with Patient
-    
-    # 1. Get all users who are 'patient' role
-    # 2. Left join with Patient profile to get extra details
-    
-    query = db.query(User, Patient).outerjoin(Patient, User.id == Patient.user_id).filter(User.role == 'patient')
-    
-    rows = query.all()
+def _patient_rows(db: Session, user_ids: List[str]) -> List[dict]:
+    """Load display rows for one page of patients, preserving the page order."""
+    if not user_ids:
+        return []
+    rows = db.query(User, Patient).outerjoin(Patient, User.id == Patient.user_id).filter(User.id.in_(user_ids)).all()
+    by_id = {u.id: (u, p) for u, p in rows}
     results = []
-    for u, p in rows:
+    for uid in user_ids:
+        if uid not in by_id:
+            continue
+        u, p = by_id[uid]
         results.append({
             "id": p.id if p else 0, # 0 if profile not yet created
             "user_id": u.id,
             "name": u.full_name or u.email.split('@')[0],
             "email": u.email,
-            "avatar": u.avatar,
+            "avatar": getattr(u, 'avatar', None),
             "date_of_birth": p.date_of_birth.isoformat() if p and p.date_of_birth else None,
             "gender": p.gender if p else None,
             "blood_group": p.blood_group if p else None
         })
-        
     return results
+
+
+@router.get("/", response_model=List[PatientResponse])
+def get_patients(
+    response: Response,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=ROSTER_PAGE_MAX),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Doctors see only patients they share an appointment with; admins see everyone.
+    # The next-page cursor is returned in the X-Next-Cursor header.
+    if current_user.role not in ['admin', 'doctor']:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    prefix = escape_like((search or "").strip().lower())
+
+    if current_user.role == 'doctor':
+        # Index-only scan of ix_doctor_patients_roster: (doctor_id, patient_name, patient_id)
+        query = db.query(DoctorPatient.patient_name, DoctorPatient.patient_id).filter(DoctorPatient.doctor_id == str(current_user.id))
+        if prefix:
+            query = query.filter(DoctorPatient.patient_name.like(prefix + "%", escape="\\"))
+        after = decode_cursor(cursor, 2)
+        if after:
+            query = query.filter(or_(
+                DoctorPatient.patient_name > after[0],
+                (DoctorPatient.patient_name == after[0]) & (DoctorPatient.patient_id > after[1]),
+            ))
+        rows = query.order_by(DoctorPatient.patient_name.asc(), DoctorPatient.patient_id.asc()).limit(limit + 1).all()
+        page = rows[:limit]
+        if len(rows) > limit:
+            set_next_cursor(response, encode_cursor(page[-1].patient_name, page[-1].patient_id))
+        return _patient_rows(db, [r.patient_id for r in page])
+
+    # Admin: every patient account, keyset on email
+    query = db.query(User.id, User.email).filter(User.role == 'patient')
+    if prefix:
+        query = query.filter(or_(User.full_name.ilike(prefix + "%", escape="\\"), User.email.like(prefix + "%", escape="\\")))
+    after = decode_cursor(cursor, 1)
+    if after:
+        query = query.filter(User.email > after[0])
+    rows = query.order_by(User.email.asc()).limit(limit + 1).all()
+    page = rows[:limit]
+    if len(rows) > limit:
+        set_next_cursor(response, encode_cursor(page[-1].email))
+    return _patient_rows(db, [r.id for r in page])
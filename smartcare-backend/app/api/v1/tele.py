@@ -1,12 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+import asyncio
 import json
+import logging
 import os
+from typing import Optional
 from sqlalchemy.orm import Session
 from app.services.chatbot import ChatbotService
-from app.database import get_db
-from app.models.medical_record import MedicalRecord
-from app.core.encryption import decrypt_data
+from app.services import history_digest, live_transcript, med_conflicts, response_cache, room_chat, soap_stream
+from app.services.llm import get_provider
+from app.services.transcript_summary import TranscriptJob
+from app.core.config import settings
+from app.database import SessionLocal, get_db
+from app.api.v1.medical_records import get_current_user
+from app.models.user import User
+from app.utils.pagination import decode_cursor, encode_cursor, set_next_cursor
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -17,42 +28,70 @@ class NotesRequest(BaseModel):
     patient_id: str
 
 
-@router.post("/generate-notes")
-async def generate_notes(payload: NotesRequest, db: Session = Depends(get_db)):
+def require_doctor(current_user: User = Depends(get_current_user)) -> User:
+    # Note generation decrypts the patient's history: clinicians only
+    if getattr(current_user, 'role', None) != 'doctor':
+        raise HTTPException(status_code=403, detail="Only doctors can generate clinical notes")
+    return current_user
+
+
+def _history_text(payload: NotesRequest, db: Session) -> str:
     if not payload.transcript or not payload.transcript.strip():
         raise HTTPException(status_code=400, detail="Transcript is required")
     if not payload.patient_id:
         raise HTTPException(status_code=400, detail="patient_id is required for cross-referencing history")
 
-    # Fetch patient's recent medical records to include in the LLM prompt for cross-referencing
+    # Patient's recent history, from the per-patient digest cache when it is still current
     try:
-        records = db.query(MedicalRecord).filter_by(patient_id=payload.patient_id).order_by(MedicalRecord.created_at.desc()).limit(50).all()
+        return history_digest.history_text(db, payload.patient_id)
     except Exception:
-        records = []
-
-    history_lines = []
-    for r in records:
-        try:
-            diag = decrypt_data(r.diagnosis) if r.diagnosis else ''
-        except Exception:
-            diag = '[decryption-error]'
-        try:
-            notes = decrypt_data(r.notes) if getattr(r, 'notes', None) else ''
-        except Exception:
-            notes = '[decryption-error]'
-        history_lines.append(f"- {r.created_at.isoformat() if r.created_at else ''} | {r.title} | Diagnosis: {diag} | Notes: {notes}")
+        logger.error("Patient history lookup failed (redacted)")
+        return history_digest.NO_HISTORY
 
-    history_text = '\n'.join(history_lines) if history_lines else 'No prior records available.'
 
+def _notes_prompt(history_text: str, transcript: str, conflicts: Optional[list] = None) -> str:
+    # safety_alert is requested first so a streamed note can surface it before any section
     system_prompt = (
         "You are a careful medical scribe. Convert the following transcript into a SOAP Note (Subjective, Objective, Assessment, Plan). "
         "CROSS-REFERENCE the patient's existing history provided below. If a NEW medication or intervention is mentioned that conflicts with the patient's history, add a top-level '⚠️ SAFETY ALERT' section explaining the conflict and recommended immediate actions for the clinician. "
-        "Return the result as a JSON object with keys: safety_alert (optional), subjective, objective, assessment, plan. If no safety issues, safety_alert should be null. Be concise, clinical, and cite relevant history lines when noting conflicts.\n\n"
+        "Return the result as a JSON object with keys in this order: safety_alert, subjective, objective, assessment, plan. If no safety issues, safety_alert should be null. Be concise, clinical, and cite relevant history lines when noting conflicts.\n\n"
     )
 
-    prompt = f"{system_prompt}\nPatient History:\n{history_text}\n\nTranscript:\n{payload.transcript}\n\nProvide the SOAP Note (JSON) and include a 'safety_alert' key when applicable."
+    flagged = med_conflicts.prompt_lines(conflicts or [])
+    flagged = f"Interactions already flagged by the local medication check (include them in safety_alert):\n{flagged}\n\n" if flagged else ""
+
+    return f"{system_prompt}\nPatient History:\n{history_text}\n\n{flagged}Transcript:\n{transcript}\n\nProvide the SOAP Note (JSON) and include a 'safety_alert' key when applicable."
+
+
+def _ai_error(exc: HTTPException, conflicts: list) -> JSONResponse:
+    # The model failed (disabled, busy, timed out); the local conflict check still reaches the clinician
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail, "conflicts": conflicts})
+
+
+@router.post("/generate-notes")
+async def generate_notes(payload: NotesRequest, db: Session = Depends(get_db), _doctor: User = Depends(require_doctor)):
+    history_text = _history_text(payload, db)
+    # Deterministic medication-conflict check, before (and regardless of) the model
+    conflicts = med_conflicts.check(payload.transcript, history_text)
+
+    try:
+        # Long transcripts are summarized chunk by chunk first (map-reduce)
+        transcript = payload.transcript
+        job = TranscriptJob(transcript, get_provider())
+        if job.needs_map:
+            try:
+                await job.run()
+            except HTTPException:
+                raise
+            except Exception:
+                logger.error("AI transcript summary error (redacted)")
+                raise HTTPException(status_code=500, detail="AI service error")
+            transcript = job.reduce_input()
 
-    resp_data = await ChatbotService.get_response(prompt)
+        # Identical transcript + history (retries, re-opened consults) is answered from the response cache
+        resp_data = await ChatbotService.get_response(_notes_prompt(history_text, transcript, conflicts), cached=True)
+    except HTTPException as exc:
+        return _ai_error(exc, conflicts)
     resp_text = resp_data.get("text", "") if isinstance(resp_data, dict) else str(resp_data)
 
     # Try to parse response as JSON; if parsing fails, return raw text under 'text'
@@ -60,9 +99,179 @@ async def generate_notes(payload: NotesRequest, db: Session = Depends(get_db)):
         # If the text contains JSON markdown blocks, strip them
         clean_text = resp_text.replace("```json", "").replace("```", "").strip()
         parsed = json.loads(clean_text)
-        return {"notes": parsed}
+        return {"notes": parsed, "conflicts": conflicts}
+    except Exception:
+        return {"notes": {"text": resp_text}, "conflicts": conflicts}
+
+
+@router.post("/generate-notes/stream")
+async def generate_notes_stream(payload: NotesRequest, db: Session = Depends(get_db), _doctor: User = Depends(require_doctor)):
+    """Same note as /generate-notes, sent as Server-Sent Events while the model writes it.
+
+    Events: `conflicts` (always first), `progress` (long transcripts only),
+    `token`, `safety_alert`, `section`, `done` and `error`; see
+    app/services/soap_stream.py.
+    """
+    history_text = _history_text(payload, db)
+    conflicts = med_conflicts.check(payload.transcript, history_text)
+    prelude = [("conflicts", {"conflicts": conflicts})]
+    provider = get_provider()
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    job = TranscriptJob(payload.transcript, provider)
+    if job.needs_map:
+        return StreamingResponse(
+            soap_stream.sse_map_reduce(job, lambda summaries: _notes_prompt(history_text, summaries, conflicts), prelude),
+            media_type="text/event-stream",
+            headers=headers,
+        )
+
+    chunks = response_cache.cache.stream(provider, _notes_prompt(history_text, payload.transcript, conflicts))
+    # Wait for the first chunk here so a disabled, busy or timed-out model is
+    # still an HTTP error rather than an error event
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = ""
+    except HTTPException as exc:
+        return _ai_error(exc, conflicts)
+    except Exception:
+        logger.error("AI stream error (redacted)")
+        return _ai_error(HTTPException(status_code=500, detail="AI service error"), conflicts)
+    return StreamingResponse(soap_stream.sse_events(chunks, first, prelude), media_type="text/event-stream", headers=headers)
+
+
+def _patient_history(patient_id: str) -> str:
+    db = SessionLocal()
+    try:
+        return history_digest.history_text(db, patient_id)
+    except Exception:
+        logger.error("Patient history lookup failed (redacted)")
+        return history_digest.NO_HISTORY
+    finally:
+        db.close()
+
+
+def _socket_doctor(token: str) -> str:
+    """Id of the doctor behind a bearer token; HTTPException as get_current_user raises it."""
+    db = SessionLocal()
+    try:
+        user = require_doctor(get_current_user(authorization=f"Bearer {token}", db=db))
+        return str(user.id)
+    finally:
+        db.close()
+
+
+async def _authenticate_socket(websocket: WebSocket) -> Optional[str]:
+    """The token comes from the `token` query parameter or an {"type": "auth"} first frame."""
+    token = websocket.query_params.get("token")
+    if not token:
+        try:
+            raw = await asyncio.wait_for(websocket.receive_text(), timeout=settings.LIVE_TRANSCRIPT_AUTH_TIMEOUT_SECONDS)
+            msg = json.loads(raw)
+        except (asyncio.TimeoutError, ValueError):
+            return None
+        if isinstance(msg, dict) and msg.get("type") == "auth":
+            token = msg.get("token")
+    if not token or not isinstance(token, str):
+        return None
+    try:
+        return await asyncio.to_thread(_socket_doctor, token)
+    except HTTPException:
+        return None
+
+
+@router.websocket("/live/{session_id}")
+async def live_transcript_socket(websocket: WebSocket, session_id: str, patient_id: str = Query(...)):
+    """Stream transcript segments during the call; finish with the SOAP note.
+
+    Doctors only: pass the access token as `?token=` or send
+    {"type": "auth", "token": "..."} as the first frame. A session id stays
+    with the doctor and patient it was opened for; any other caller is closed
+    with 1008.
+
+    Client frames (JSON):
+    - {"type": "segment", "id": "...", "text": "...", "speaker": "Doctor"}; re-sending an id replaces it
+    - {"type": "finalize"} generates the note
+    Server frames: {"type": "ready", "segments": n} on connect (n > 0 after a
+    reconnect), {"type": "summary", ...} rolling summaries, then the note as
+    the streaming endpoint's events (`conflicts`, `token`, `safety_alert`,
+    `section`, `done`) or {"type": "error", "detail": ...}.
+    """
+    await websocket.accept()
+    try:
+        doctor_id = await _authenticate_socket(websocket)
+    except WebSocketDisconnect:
+        return
+    if doctor_id is None:
+        await websocket.close(code=1008, reason="Doctor authentication required")
+        return
+    try:
+        session, _ = live_transcript.sessions.get(session_id, patient_id, doctor_id)
+    except PermissionError:
+        await websocket.close(code=1008, reason="Session belongs to another call")
+        return
+
+    async def send(msg: dict):
+        await websocket.send_text(json.dumps(msg))
+
+    session.notify = send
+    await send({"type": "ready", "segments": len(session)})
+    try:
+        while True:
+            try:
+                msg = json.loads(await websocket.receive_text())
+            except ValueError:
+                await send({"type": "error", "detail": "invalid JSON"})
+                continue
+            mtype = msg.get("type") if isinstance(msg, dict) else None
+            if mtype == "segment":
+                text = str(msg.get("text") or "").strip()
+                if not text:
+                    continue
+                if msg.get("speaker"):
+                    text = f"{msg['speaker']}: {text}"
+                segment_id = str(msg["id"])[:128] if msg.get("id") is not None else f"#{len(session)}"
+                try:
+                    changed = session.upsert(segment_id, text)
+                except live_transcript.SegmentRejected as exc:
+                    await send({"type": "error", "detail": str(exc)})
+                    continue
+                if changed:
+                    session.schedule()
+            elif mtype == "finalize":
+                await _live_note(session, send)
+            else:
+                await send({"type": "error", "detail": f"unknown frame type {mtype!r}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if session.notify is send:
+            session.notify = None
+
+
+async def _live_note(session: live_transcript.LiveSession, send):
+    if not len(session):
+        await send({"type": "error", "detail": "Transcript is required"})
+        return
+    history_text = await asyncio.to_thread(_patient_history, session.patient_id)
+    conflicts = med_conflicts.check(session.transcript(), history_text)
+    await send({"type": "conflicts", "conflicts": conflicts})
+    note = soap_stream.SoapNoteStream()
+    try:
+        transcript = await session.note_input()
+        async for chunk in response_cache.cache.stream(get_provider(), _notes_prompt(history_text, transcript, conflicts)):
+            for event, data in note.feed(chunk):
+                await send({"type": event, **data})
+        for event, data in note.finish():
+            await send({"type": event, **data})
+    except HTTPException as exc:
+        await send({"type": "error", "detail": exc.detail, "status_code": exc.status_code})
+    except WebSocketDisconnect:
+        raise
     except Exception:
-        return {"notes": {"text": resp_text}}
+        logger.error("AI live note error (redacted)")
+        await send({"type": "error", "detail": "AI service error", "status_code": 500})
 
 
 @router.get("/config/ice-servers")
@@ -105,3 +314,34 @@ def get_ice_credentials():
         ice_servers.append({"urls": [turn_url], "username": turn_user, "credential": turn_pass})
 
     return {"iceServers": ice_servers}
+
+
+@router.get("/rooms/{room_id}/chat")
+def get_room_chat(
+    room_id: str,
+    response: Response,
+    since: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """Paginated in-call chat history for a room.
+
+    Open to the doctor and patient of the appointment whose id is the room id.
+    Without `since`, pages go newest-first. With `since` (the highest `seq` the
+    client already has), only newer messages are returned oldest-first. Either
+    way the cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    if not room_chat.is_participant(db, room_id, str(current_user.id)):
+        raise HTTPException(status_code=403, detail="Not a participant of this room")
+    after = decode_cursor(cursor, 2)
+    if since is None:
+        rows, more = room_chat.history_page(db, room_id, tuple(after) if after else None, limit)
+    elif after:
+        rows, more = room_chat.since_page(db, room_id, after[0], after[1], limit)
+    else:
+        rows, more = room_chat.since_page(db, room_id, since, limit=limit)
+    if more:
+        set_next_cursor(response, encode_cursor(rows[-1].seq, rows[-1].id))
+    return [room_chat.message_row(row) for row in rows]
@@ -60,6 +60,73 @@ class Settings(BaseSettings):
     
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
 
+    # ADMIN STATS: seconds between counter reconciliation runs (0 disables the job)
+    ADMIN_STATS_RECONCILE_SECONDS: int = int(os.getenv("ADMIN_STATS_RECONCILE_SECONDS", "3600"))
+
+    # DOCTOR DIRECTORY CACHE: max cached pages per worker and max age in seconds
+    DOCTOR_DIRECTORY_CACHE_SIZE: int = int(os.getenv("DOCTOR_DIRECTORY_CACHE_SIZE", "256"))
+    DOCTOR_DIRECTORY_CACHE_TTL: int = int(os.getenv("DOCTOR_DIRECTORY_CACHE_TTL", "60"))
+    # Cross-worker invalidation only when REDIS_URL is set explicitly, not from its localhost default
+    DOCTOR_DIRECTORY_BROADCAST: bool = bool(os.getenv("REDIS_URL"))
+
+    # SIGNALING: per-socket outbound queue length and what to do when it fills up
+    # ("drop_oldest" drops queued pings first, "disconnect" closes the socket)
+    SIGNALING_QUEUE_MAX_FRAMES: int = int(os.getenv("SIGNALING_QUEUE_MAX_FRAMES", "256"))
+    SIGNALING_QUEUE_POLICY: str = os.getenv("SIGNALING_QUEUE_POLICY", "drop_oldest")
+    # Sharded pub/sub for room channels: "auto" (Redis 7+), "on" or "off"
+    SIGNALING_PUBSUB_SHARDED: str = os.getenv("SIGNALING_PUBSUB_SHARDED", "auto")
+    # Seconds a room's shared state (roles, hosts, pending joins) outlives its last update
+    SIGNALING_ROOM_STATE_TTL: int = int(os.getenv("SIGNALING_ROOM_STATE_TTL", "21600"))
+    # Keepalive: server ping after this many quiet seconds, reap after SIGNALING_IDLE_TIMEOUT (0 disables)
+    SIGNALING_PING_INTERVAL: int = int(os.getenv("SIGNALING_PING_INTERVAL", "25"))
+    SIGNALING_IDLE_TIMEOUT: int = int(os.getenv("SIGNALING_IDLE_TIMEOUT", "75"))
+    # Merge ICE candidates from one sender into `candidates` frames over this window (0 disables)
+    SIGNALING_CANDIDATE_WINDOW_MS: int = int(os.getenv("SIGNALING_CANDIDATE_WINDOW_MS", "0"))
+    # Inbound token buckets: frames/s and burst per peer and per room (rate 0 disables);
+    # over the peer limit frames are dropped ("drop") or the socket is closed ("disconnect")
+    SIGNALING_PEER_RATE: int = int(os.getenv("SIGNALING_PEER_RATE", "30"))
+    SIGNALING_PEER_BURST: int = int(os.getenv("SIGNALING_PEER_BURST", "60"))
+    SIGNALING_ROOM_RATE: int = int(os.getenv("SIGNALING_ROOM_RATE", "200"))
+    SIGNALING_ROOM_BURST: int = int(os.getenv("SIGNALING_ROOM_BURST", "400"))
+    SIGNALING_RATE_POLICY: str = os.getenv("SIGNALING_RATE_POLICY", "drop")
+    # In-call chat log: batch inserts every SIGNALING_CHAT_FLUSH_MS (0 disables persisting chat)
+    SIGNALING_CHAT_FLUSH_MS: int = int(os.getenv("SIGNALING_CHAT_FLUSH_MS", "250"))
+    SIGNALING_CHAT_BATCH_SIZE: int = int(os.getenv("SIGNALING_CHAT_BATCH_SIZE", "200"))
+
+    # LLM provider for the chatbot and scribe: "gemini" (enterprise/BAA mode only) or "local"
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "gemini")
+    # In-flight call cap, per-call timeout and max wait for a free slot (seconds)
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_TIMEOUT_SECONDS: int = int(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+    LLM_QUEUE_TIMEOUT_SECONDS: int = int(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+    # Local backend latency profile: base + per 1000 prompt chars + deterministic jitter (ms)
+    LLM_LOCAL_BASE_MS: int = int(os.getenv("LLM_LOCAL_BASE_MS", "800"))
+    LLM_LOCAL_PER_KCHAR_MS: int = int(os.getenv("LLM_LOCAL_PER_KCHAR_MS", "20"))
+    LLM_LOCAL_JITTER_MS: int = int(os.getenv("LLM_LOCAL_JITTER_MS", "200"))
+    # Patients whose decrypted history digest is kept in memory for note generation
+    HISTORY_DIGEST_CACHE_SIZE: int = int(os.getenv("HISTORY_DIGEST_CACHE_SIZE", "1024"))
+    # Transcripts longer than this are summarized in overlapping chunks (map-reduce) before the SOAP note
+    TRANSCRIPT_CHUNK_CHARS: int = int(os.getenv("TRANSCRIPT_CHUNK_CHARS", "8000"))
+    TRANSCRIPT_CHUNK_OVERLAP_CHARS: int = int(os.getenv("TRANSCRIPT_CHUNK_OVERLAP_CHARS", "400"))
+    # Chunk summaries in flight per transcript, and chunk summaries kept for retries
+    TRANSCRIPT_MAP_CONCURRENCY: int = int(os.getenv("TRANSCRIPT_MAP_CONCURRENCY", "4"))
+    TRANSCRIPT_SUMMARY_CACHE_SIZE: int = int(os.getenv("TRANSCRIPT_SUMMARY_CACHE_SIZE", "2048"))
+    # Live transcript sessions: quiet period before the rolling summary refreshes (ms),
+    # sessions kept in memory, and idle time before a session is dropped (seconds)
+    LIVE_TRANSCRIPT_DEBOUNCE_MS: int = int(os.getenv("LIVE_TRANSCRIPT_DEBOUNCE_MS", "3000"))
+    LIVE_TRANSCRIPT_MAX_SESSIONS: int = int(os.getenv("LIVE_TRANSCRIPT_MAX_SESSIONS", "256"))
+    LIVE_TRANSCRIPT_IDLE_SECONDS: int = int(os.getenv("LIVE_TRANSCRIPT_IDLE_SECONDS", "3600"))
+    # Per live session: segments kept, and characters per segment
+    LIVE_TRANSCRIPT_MAX_SEGMENTS: int = int(os.getenv("LIVE_TRANSCRIPT_MAX_SEGMENTS", "5000"))
+    LIVE_TRANSCRIPT_MAX_SEGMENT_CHARS: int = int(os.getenv("LIVE_TRANSCRIPT_MAX_SEGMENT_CHARS", "4000"))
+    # Seconds a live transcript socket may take to send its auth frame
+    LIVE_TRANSCRIPT_AUTH_TIMEOUT_SECONDS: int = int(os.getenv("LIVE_TRANSCRIPT_AUTH_TIMEOUT_SECONDS", "10"))
+    # Note-generation responses cached by prompt hash + model (0 TTL keeps only the in-flight dedupe)
+    AI_CACHE_MAX_ENTRIES: int = int(os.getenv("AI_CACHE_MAX_ENTRIES", "512"))
+    AI_CACHE_TTL_SECONDS: int = int(os.getenv("AI_CACHE_TTL_SECONDS", "900"))
+    # Drug-interaction data for the local conflict check (empty: the bundled app/data/drug_interactions.json)
+    MED_INTERACTIONS_PATH: str = os.getenv("MED_INTERACTIONS_PATH", "")
+
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = [
         "http://localhost:5173",
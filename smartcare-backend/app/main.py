@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import Optional
@@ -21,6 +22,12 @@ from app.models.appointment import Appointment
 from app.models.medical_record import MedicalRecord
 from app.models.doctor import Doctor
 from app.models.patient import Patient
+from app.models.admin_stats import AdminStats
+from app.models.doctor_patient import DoctorPatient
+from app.models.room_chat import RoomChatMessage
+from app.services import admin_stats as admin_stats_service
+from app.services import doctor_directory as doctor_directory_service
+from app.services.room_chat import RoomChatLog
 
 # Router Imports
 from app.api.v1 import (
@@ -55,6 +62,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 @app.middleware("http")
@@ -137,6 +145,27 @@ async def global_exception_handler(request: Request, exc: Exception):
 @app.on_event("startup")
 async def startup_event():
     Base.metadata.create_all(bind=engine)
+    # Seed and periodically reconcile the maintained admin counters
+    interval = getattr(settings, "ADMIN_STATS_RECONCILE_SECONDS", 3600)
+    if interval and interval > 0:
+        app.state.admin_stats_task = asyncio.create_task(admin_stats_service.reconcile_periodically(interval))
+    # Drop cached doctor directory pages when another worker publishes a change
+    app.state.doctor_directory_task = asyncio.create_task(doctor_directory_service.listen_for_invalidations())
+    # Persist in-call chat relayed by the signaling server
+    flush_ms = getattr(settings, "SIGNALING_CHAT_FLUSH_MS", 250)
+    if flush_ms and flush_ms > 0:
+        signaling_module.manager.use_chat_log(RoomChatLog(
+            SessionLocal,
+            batch_size=getattr(settings, "SIGNALING_CHAT_BATCH_SIZE", 200),
+            flush_interval=flush_ms / 1000.0,
+        ))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Write out chat still waiting in the batch buffer
+    if signaling_module.manager.chat_log is not None:
+        await signaling_module.manager.chat_log.close()
 
 # --- ROUTER REGISTRATION ---
 app.include_router(signaling_module.router)
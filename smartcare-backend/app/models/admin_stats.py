@@ -0,0 +1,25 @@
+"""
+AdminStats model
+
+Single-row table holding the counters shown on the admin dashboard. The row is
+maintained incrementally by ORM flush events (see app/services/admin_stats.py)
+so `GET /api/v1/admin/stats` reads one row instead of counting whole tables.
+"""
+import sqlalchemy as sa
+from app.database import Base
+
+
+class AdminStats(Base):
+    __tablename__ = "admin_stats"
+    __table_args__ = {"extend_existing": True}
+
+    # Always 1 — the table holds exactly one row.
+    id = sa.Column(sa.Integer, primary_key=True, default=1, autoincrement=False)
+
+    total_users = sa.Column(sa.BigInteger, nullable=False, default=0)
+    doctors = sa.Column(sa.BigInteger, nullable=False, default=0)
+    patients = sa.Column(sa.BigInteger, nullable=False, default=0)
+    appointments = sa.Column(sa.BigInteger, nullable=False, default=0)
+
+    # Last time the counters were recomputed from the source tables.
+    reconciled_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
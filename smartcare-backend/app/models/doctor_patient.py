@@ -0,0 +1,28 @@
+"""
+DoctorPatient link model
+
+One row per (doctor, patient) pair that has an appointment together.
+Maintained incrementally on booking (see app/services/doctor_patients.py) so
+a doctor's roster is an index range scan instead of a join over every patient
+in the system.
+"""
+import sqlalchemy as sa
+from app.database import Base
+
+
+class DoctorPatient(Base):
+    __tablename__ = "doctor_patients"
+    __table_args__ = (
+        # Covering index for the roster: filter by doctor, order/search by name, keyset on patient
+        sa.Index("ix_doctor_patients_roster", "doctor_id", "patient_name", "patient_id"),
+        {"extend_existing": True},
+    )
+
+    doctor_id = sa.Column(sa.String, sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    patient_id = sa.Column(sa.String, sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+    # Lowercased display name, denormalized so roster search never touches `users`
+    patient_name = sa.Column(sa.String, nullable=False, default="")
+
+    first_seen_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now())
+    last_seen_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now())
@@ -0,0 +1,27 @@
+"""
+RoomChatMessage model
+
+Append-only log of in-call chat, one row per `chat` frame relayed by the
+signaling server. Rows are written in batches by app/services/room_chat.py and
+read back newest-first for history or by sequence for replay on reconnect.
+"""
+import sqlalchemy as sa
+from app.database import Base
+
+
+class RoomChatMessage(Base):
+    __tablename__ = "room_chat_messages"
+    __table_args__ = (
+        # History and replay are range scans over one room ordered by sequence
+        sa.Index("ix_room_chat_messages_room_seq", "room_id", "seq", "id"),
+        {"extend_existing": True},
+    )
+
+    id = sa.Column(sa.BigInteger().with_variant(sa.Integer, "sqlite"), primary_key=True, autoincrement=True)
+    room_id = sa.Column(sa.String, nullable=False)
+    # Microsecond timestamp assigned by the relaying instance, strictly increasing per instance
+    seq = sa.Column(sa.BigInteger, nullable=False)
+    sender = sa.Column(sa.String, nullable=False)
+    # The chat frame as delivered to the room (JSON, including `seq`), encrypted with encrypt_data
+    frame = sa.Column(sa.Text, nullable=False)
+    created_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime
+from sqlalchemy import Column, String, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 import uuid
@@ -7,6 +7,12 @@ from datetime import datetime
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Admin listing: filter by role/active and keyset-paginate on email
+        Index("ix_users_role_active_email", "role", "is_active", "email"),
+        # Email prefix search (LIKE 'abc%') on Postgres regardless of collation
+        Index("ix_users_email_pattern", "email", postgresql_ops={"email": "text_pattern_ops"}),
+    )
 
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
     email = Column(String, unique=True, index=True, nullable=False)
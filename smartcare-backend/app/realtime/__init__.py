@@ -0,0 +1 @@
+"""Building blocks for the WebSocket signaling server in app/signaling.py."""
@@ -0,0 +1,89 @@
+"""
+ICE candidate coalescing.
+
+Trickle ICE emits candidates in bursts, and each one used to be published to
+Redis and written to every socket in the room on its own. With a coalescing
+window, candidates from one sender in one room are held for up to
+`window_seconds` and then sent as a single frame:
+
+    {"type": "candidates", "frames": [<candidate frame>, <candidate frame>, ...]}
+
+The original candidate frames are embedded verbatim, so batching needs no
+re-serialization. Only peers that announced protocol >= BATCH_PROTOCOL get the
+batch; older clients are sent the individual frames.
+"""
+import asyncio
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+# First protocol version that understands `candidates` frames
+BATCH_PROTOCOL = 2
+
+Key = Tuple[str, str]
+
+
+def batch_frame(frames: List[str]) -> str:
+    return '{"type": "candidates", "frames": [' + ",".join(frames) + "]}"
+
+
+def split_batch(frame) -> List[str]:
+    """Individual candidate frames from a batch (for old clients behind another instance)."""
+    try:
+        msg = json.loads(frame)
+    except Exception:
+        return []
+    return [json.dumps(f) for f in msg.get("frames") or () if isinstance(f, dict)]
+
+
+class CandidateCoalescer:
+    def __init__(
+        self,
+        window_seconds: float,
+        flush: Callable[[str, str, List[str]], None],
+        max_batch: int = 32,
+    ):
+        self.window_seconds = window_seconds
+        self.flush = flush
+        self.max_batch = max_batch
+        self._pending: Dict[Key, List[str]] = {}
+        self._timers: Dict[Key, asyncio.TimerHandle] = {}
+        self.candidates_in = 0
+        self.batches_out = 0
+
+    def add(self, room_id: str, sender: str, frame: str):
+        key = (room_id, sender)
+        frames = self._pending.get(key)
+        if frames is None:
+            frames = self._pending[key] = []
+            self._timers[key] = asyncio.get_running_loop().call_later(self.window_seconds, self._fire, key)
+        frames.append(frame)
+        self.candidates_in += 1
+        if len(frames) >= self.max_batch:
+            self._fire(key)
+
+    def take(self, room_id: str, sender: str) -> Optional[List[str]]:
+        """Remove and return a sender's buffered candidates (without sending them)."""
+        key = (room_id, sender)
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        return self._pending.pop(key, None)
+
+    def flush_now(self, room_id: str, sender: str):
+        """Send anything buffered for the sender; called before its next non-candidate
+        frame so candidates never overtake (or fall behind) the sender's other frames."""
+        if (room_id, sender) in self._pending:
+            self._fire((room_id, sender))
+
+    def discard_room(self, room_id: str):
+        for key in [k for k in self._pending if k[0] == room_id]:
+            self.take(*key)
+
+    def _fire(self, key: Key):
+        frames = self.take(*key)
+        if frames:
+            self.batches_out += 1
+            self.flush(key[0], key[1], frames)
+
+    def __len__(self) -> int:
+        return len(self._pending)
@@ -0,0 +1,99 @@
+"""
+Cheap inspection of signaling frames.
+
+Relayed frames are forwarded byte-for-byte; the server only needs their
+`type`. Clients build frames as `{type: ..., ...}`, so `type` is the first key
+and can be read from the head of the frame with an anchored match instead of
+a full parse of a multi-kilobyte SDP offer. Because the match is anchored at
+the opening brace, a `type` nested inside the payload can never be mistaken
+for the frame's own.
+
+Binary frames are accepted as UTF-8 JSON or as MessagePack maps whose first
+key is `type` (sniffed from the header bytes, no decoder needed). Frames that
+carry server commands (announce, join_request, ...) are small and are fully
+parsed, with orjson / msgpack when installed.
+"""
+import json
+import re
+from typing import Optional
+
+try:
+    import orjson as _orjson
+except Exception:  # optional: falls back to the stdlib parser
+    _orjson = None
+
+try:
+    import msgpack as _msgpack
+except Exception:  # optional: binary frames can still be relayed, just not parsed
+    _msgpack = None
+
+# Frame types that may be dropped when a slow socket's outbound queue is full.
+# Only idempotent frames qualify: pings repeat. ICE candidates do not; each is
+# trickled once, and losing the only relay/srflx candidate can fail the call.
+DROPPABLE_TYPES = frozenset({"ping"})
+# Frame types the server acts on itself; everything else is relayed untouched.
+CONTROL_TYPES = frozenset({"announce", "join_request", "approve_join", "reject_join", "pong", "chat_sync"})
+
+_LEADING_TYPE_RE = re.compile(r'\s*\{\s*"type"\s*:\s*"([^"\\]{1,64})"')
+_SNIFF_WINDOW = 128
+
+
+def _sniff_msgpack_type(buf) -> Optional[str]:
+    # map header (fixmap / map16 / map32), then fixstr "type", then a str value
+    first = buf[0]
+    if 0x80 <= first <= 0x8F:
+        i = 1
+    elif first == 0xDE:
+        i = 3
+    elif first == 0xDF:
+        i = 5
+    else:
+        return None
+    if buf[i:i + 5] != b"\xa4type" or len(buf) <= i + 5:
+        return None
+    i += 5
+    head = buf[i]
+    if 0xA0 <= head <= 0xBF:
+        size, i = head & 0x1F, i + 1
+    elif head == 0xD9 and len(buf) > i + 1:
+        size, i = buf[i + 1], i + 2
+    else:
+        return None
+    raw = bytes(buf[i:i + size])
+    if len(raw) != size:
+        return None
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def sniff_type(frame) -> Optional[str]:
+    """Return the frame's top-level `type` when it is the first key, else None."""
+    if isinstance(frame, str):
+        match = _LEADING_TYPE_RE.match(frame, 0, _SNIFF_WINDOW)
+        return match.group(1) if match else None
+    if not frame:
+        return None
+    if frame[:1] in (b"{", b" ", b"\n", b"\t", b"\r"):
+        match = _LEADING_TYPE_RE.match(bytes(frame[:_SNIFF_WINDOW]).decode("utf-8", "ignore"))
+        return match.group(1) if match else None
+    return _sniff_msgpack_type(frame)
+
+
+def parse_frame(frame) -> Optional[dict]:
+    """Fully decode a frame into a dict, or None if it is not a JSON/MessagePack object."""
+    try:
+        if isinstance(frame, str) or frame[:1] in (b"{", b" ", b"\n", b"\t", b"\r"):
+            msg = _orjson.loads(frame) if _orjson else json.loads(frame)
+        elif _msgpack is not None:
+            msg = _msgpack.unpackb(frame, raw=False)
+        else:
+            return None
+    except Exception:
+        return None
+    return msg if isinstance(msg, dict) else None
+
+
+def is_critical(frame_type: Optional[str]) -> bool:
+    return frame_type not in DROPPABLE_TYPES
@@ -0,0 +1,50 @@
+"""
+Keepalive scheduling for signaling sockets.
+
+Every socket needs a liveness check at some point in the future, and almost
+every check gets pushed back because the peer said something in the meantime.
+A hashed timing wheel makes both operations O(1): `schedule` drops the key
+into the slot `delay` ticks ahead (moving it if already scheduled) and each
+tick only looks at the one slot that just came due.
+"""
+import math
+from typing import Dict, Hashable, List, Set
+
+# Sent by the server; clients answer with {"type": "pong"}
+PING_FRAME = '{"type": "ping", "from": "server"}'
+
+
+class TimingWheel:
+    def __init__(self, tick_seconds: float, slots: int):
+        self.tick_seconds = tick_seconds
+        self._slots: List[Set[Hashable]] = [set() for _ in range(max(2, slots))]
+        self._where: Dict[Hashable, int] = {}
+        self._cursor = 0
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key) -> bool:
+        return key in self._where
+
+    def schedule(self, key: Hashable, delay: float):
+        """(Re)schedule `key` to come due after `delay` seconds, clamped to the wheel's span."""
+        self.cancel(key)
+        ticks = min(len(self._slots) - 1, max(1, math.ceil(delay / self.tick_seconds)))
+        index = (self._cursor + ticks) % len(self._slots)
+        self._slots[index].add(key)
+        self._where[key] = index
+
+    def cancel(self, key: Hashable):
+        index = self._where.pop(key, None)
+        if index is not None:
+            self._slots[index].discard(key)
+
+    def advance(self) -> List[Hashable]:
+        """Move one tick forward and return the keys that came due."""
+        self._cursor = (self._cursor + 1) % len(self._slots)
+        due = self._slots[self._cursor]
+        self._slots[self._cursor] = set()
+        for key in due:
+            self._where.pop(key, None)
+        return list(due)
@@ -0,0 +1,174 @@
+"""
+Per-socket outbound queues for the signaling server.
+
+Broadcasting used to `await ws.send_text()` for each peer in turn, so one slow
+mobile peer delayed offers and candidates for everyone else in the room. Each
+socket now owns a bounded queue drained by its own writer task; broadcasts only
+enqueue. When a queue is full the configured policy applies:
+
+- "drop_oldest": drop the oldest non-critical frame (a ping) to make room; if
+  everything queued is critical (offers, answers, candidates, chat) the socket
+  cannot keep up and is disconnected rather than silently losing a frame.
+- "disconnect": disconnect the socket immediately.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+Frame = Union[str, bytes]
+
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_DISCONNECT = "disconnect"
+
+
+class OutboundStats:
+    """Counters shared by all writers of one ConnectionManager."""
+
+    __slots__ = ("dropped_frames", "overflow_disconnects", "send_failures")
+
+    def __init__(self):
+        self.dropped_frames = 0
+        self.overflow_disconnects = 0
+        self.send_failures = 0
+
+
+class SocketWriter:
+    __slots__ = (
+        "websocket", "max_frames", "policy", "stats", "on_failure",
+        "queue", "high_water", "closing", "closed", "_ready", "_task",
+        "owner", "last_seen", "protocol",
+    )
+
+    def __init__(
+        self,
+        websocket,
+        max_frames: int = 256,
+        policy: str = POLICY_DROP_OLDEST,
+        stats: Optional[OutboundStats] = None,
+        on_failure: Optional[Callable[["SocketWriter"], None]] = None,
+    ):
+        self.websocket = websocket
+        self.max_frames = max_frames
+        self.policy = policy
+        self.stats = stats or OutboundStats()
+        # Called once if the socket errors or overflows so the owner can clean up
+        self.on_failure = on_failure
+        self.queue: Deque[Tuple[Frame, bool]] = deque()
+        self.high_water = 0
+        self.closing = False
+        self.closed = False
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # (room_id, peer_id) set by the ConnectionManager
+        self.owner: Optional[Tuple[str, str]] = None
+        # monotonic time the peer was last heard from
+        self.last_seen = time.monotonic()
+        # signaling protocol version the client announced
+        self.protocol = 1
+
+    @property
+    def depth(self) -> int:
+        return len(self.queue)
+
+    @property
+    def queued_bytes(self) -> int:
+        return sum(len(frame) for frame, _ in self.queue)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def send(self, frame: Frame, critical: bool = True) -> bool:
+        """Enqueue a frame without waiting on the network. Returns False if not queued."""
+        if self.closed or self.closing:
+            return False
+        if len(self.queue) >= self.max_frames and not self._make_room(critical):
+            return False
+        self.queue.append((frame, critical))
+        if len(self.queue) > self.high_water:
+            self.high_water = len(self.queue)
+        self._ready.set()
+        return True
+
+    def _make_room(self, critical: bool) -> bool:
+        if self.policy == POLICY_DROP_OLDEST:
+            for i, (_, queued_critical) in enumerate(self.queue):
+                if not queued_critical:
+                    del self.queue[i]
+                    self.stats.dropped_frames += 1
+                    return True
+            if not critical:
+                self.stats.dropped_frames += 1
+                return False
+        # Queue is full of frames we must not lose: the consumer is too slow
+        self.stats.overflow_disconnects += 1
+        self._fail()
+        return False
+
+    def close(self):
+        """Send what is already queued, then close the socket."""
+        self.closing = True
+        self._ready.set()
+
+    def abort(self):
+        """Stop immediately, discarding queued frames."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        if self._task and not self._task.done() and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    def terminate(self, code: int = 1011):
+        """Abort and close the underlying socket with `code`."""
+        if self.closed:
+            return
+        self.abort()
+        try:
+            asyncio.get_running_loop().create_task(self._close_socket(code))
+        except RuntimeError:
+            pass
+
+    def _fail(self):
+        if self.closed:
+            return
+        self.terminate(1011)
+        if self.on_failure:
+            self.on_failure(self)
+
+    async def _close_socket(self, code: int = 1000):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _run(self):
+        ws = self.websocket
+        try:
+            while not self.closed:
+                if not self.queue:
+                    if self.closing:
+                        self.closed = True
+                        await self._close_socket()
+                        return
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                frame, _ = self.queue.popleft()
+                if isinstance(frame, (bytes, bytearray)):
+                    await ws.send_bytes(frame)
+                else:
+                    await ws.send_text(frame)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            self.stats.send_failures += 1
+            self._fail()
+
+    async def drain(self):
+        """Wait until every queued frame has been handed to the socket (tests, shutdown)."""
+        while self.queue and not self.closed:
+            await asyncio.sleep(0)
@@ -0,0 +1,256 @@
+"""
+Per-room Redis pub/sub for the signaling server.
+
+The listener used to `psubscribe("room:*")`, so every instance received (and
+parsed) every signaling frame in the cluster. `RoomChannels` subscribes to a
+room's channel only while the instance has a local peer in it: `acquire()` on
+the first socket, `release()` once the room is gone locally.
+
+On Redis 7+ sharded pub/sub (SSUBSCRIBE/SPUBLISH) is used, which in a cluster
+keeps each room's traffic on the shard that owns the channel instead of
+broadcasting it to every node. SIGNALING_PUBSUB_SHARDED forces it on or off.
+
+Peers on the publishing instance are served directly by the caller, so
+published frames are wrapped in a small envelope,
+`<instance id>.<stream>:<seq>|<frame>`, and the listener drops copies that
+originated here. `seq` counts per (instance, room): a receiver only sees the
+rooms it subscribes to, so an instance-wide counter would make other rooms'
+traffic look like loss. `stream` numbers each run of a room's counter, which
+restarts after the instance releases the room. Publishes leave through a
+single outbox task (pipelined when several are queued), which keeps each
+room's frames in `seq` order on the wire; receivers use that to discard
+duplicates and count gaps. Server-to-server commands (see app/signaling.py)
+travel on the same channel with a `:c` header marker; the marker is in the
+server-written header, so client frames can never pose as commands. Binary
+client frames are marked `:b` and carried as base64 (the Redis connection is
+text mode), then handed to local peers as the original bytes.
+"""
+import asyncio
+import base64
+import itertools
+import logging
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "room:"
+# Identifies this process in published envelopes
+INSTANCE_ID = uuid.uuid4().hex[:12]
+OUTBOX_BATCH = 256
+
+
+def room_channel(room_id: str) -> str:
+    return CHANNEL_PREFIX + room_id
+
+
+def _decode(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return value
+
+
+KIND_FRAME = ""
+KIND_CONTROL = "c"
+KIND_BINARY = "b"
+
+
+def encode_envelope(origin: str, seq: int, frame: Union[str, bytes], kind: str = KIND_FRAME) -> str:
+    if isinstance(frame, (bytes, bytearray)):
+        kind, frame = KIND_BINARY, base64.b64encode(frame).decode("ascii")
+    return f"{origin}:{seq}{':' + kind if kind else ''}|{frame}"
+
+
+def decode_envelope(data: str) -> Tuple[Optional[str], int, str, Union[str, bytes]]:
+    """Split an envelope into (origin, seq, kind, frame); foreign payloads pass through untagged."""
+    head, sep, frame = data.partition("|")
+    parts = head.split(":")
+    if not sep or len(parts) not in (2, 3) or not parts[1].isdigit():
+        return None, 0, KIND_FRAME, data
+    kind = parts[2] if len(parts) == 3 else KIND_FRAME
+    if kind == KIND_BINARY:
+        frame = base64.b64decode(frame)
+    return parts[0], int(parts[1]), kind, frame
+
+
+class RoomChannels:
+    def __init__(
+        self,
+        client,
+        on_message: Callable[[str, str], Awaitable[None]],
+        sharded: str = "auto",
+        on_control: Optional[Callable[[str, str], Awaitable[None]]] = None,
+    ):
+        self.client = client
+        self.on_message = on_message
+        self.on_control = on_control
+        self.mode = (sharded or "auto").lower()
+        self.sharded: Optional[bool] = None
+        self.pubsub = None
+        # room ids this instance is currently subscribed to
+        self.rooms: Set[str] = set()
+        self.instance_id = INSTANCE_ID
+        self._stream_ids = itertools.count(1)
+        # room id -> [stream origin "<instance id>.<stream>", last seq published]
+        self._streams: Dict[str, list] = {}
+        # room id -> origin instance -> (stream, last seq delivered from it)
+        self._last_seq: Dict[str, Dict[str, Tuple[str, int]]] = {}
+        self.received = 0
+        self.skipped_own = 0
+        self.duplicates = 0
+        self.gaps = 0
+        self.publish_failures = 0
+        self._lock = asyncio.Lock()
+        self._active = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._outbox_task: Optional[asyncio.Task] = None
+
+    async def _detect_sharded(self) -> bool:
+        if self.mode in ("on", "true", "1"):
+            return True
+        if self.mode in ("off", "false", "0"):
+            return False
+        try:
+            info = await self.client.info("server")
+            return int(str(info.get("redis_version", "0")).split(".")[0]) >= 7
+        except Exception:
+            return False
+
+    async def start(self):
+        if self.pubsub is not None:
+            return
+        if self.sharded is None:
+            self.sharded = await self._detect_sharded()
+        self.pubsub = self.client.pubsub()
+        self._task = asyncio.create_task(self._listen())
+
+    async def acquire(self, room_id: str):
+        """Subscribe to the room's channel (first local peer joined)."""
+        async with self._lock:
+            if room_id in self.rooms:
+                return
+            await self.start()
+            channel = room_channel(room_id)
+            if self.sharded:
+                await self.pubsub.ssubscribe(channel)
+            else:
+                await self.pubsub.subscribe(channel)
+            self.rooms.add(room_id)
+            self._active.set()
+
+    async def release(self, room_id: str, still_needed: Callable[[], bool] = lambda: False):
+        """Unsubscribe unless a peer rejoined while the release was queued."""
+        async with self._lock:
+            if room_id not in self.rooms or still_needed():
+                return
+            channel = room_channel(room_id)
+            if self.sharded:
+                await self.pubsub.sunsubscribe(channel)
+            else:
+                await self.pubsub.unsubscribe(channel)
+            self.rooms.discard(room_id)
+            # a later publish or subscribe for the room starts a new stream
+            self._streams.pop(room_id, None)
+            self._last_seq.pop(room_id, None)
+
+    def publish(self, room_id: str, message: Union[str, bytes], control: bool = False) -> int:
+        """Queue a frame (or command) for other instances without waiting on Redis; returns its room seq."""
+        if self._outbox is None:
+            self._outbox = asyncio.Queue()
+            self._outbox_task = asyncio.create_task(self._drain_outbox())
+        stream = self._streams.get(room_id)
+        if stream is None:
+            stream = self._streams[room_id] = [f"{self.instance_id}.{next(self._stream_ids)}", 0]
+        stream[1] += 1
+        seq = stream[1]
+        envelope = encode_envelope(stream[0], seq, message, KIND_CONTROL if control else KIND_FRAME)
+        self._outbox.put_nowait((room_channel(room_id), envelope))
+        return seq
+
+    async def _drain_outbox(self):
+        outbox = self._outbox
+        while True:
+            batch = [await outbox.get()]
+            while len(batch) < OUTBOX_BATCH and not outbox.empty():
+                batch.append(outbox.get_nowait())
+            try:
+                if self.sharded is None:
+                    self.sharded = await self._detect_sharded()
+                if len(batch) == 1:
+                    channel, data = batch[0]
+                    if self.sharded:
+                        await self.client.spublish(channel, data)
+                    else:
+                        await self.client.publish(channel, data)
+                else:
+                    pipe = self.client.pipeline(transaction=False)
+                    for channel, data in batch:
+                        if self.sharded:
+                            pipe.spublish(channel, data)
+                        else:
+                            pipe.publish(channel, data)
+                    await pipe.execute()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Local peers already have these frames; only remote peers miss them
+                self.publish_failures += len(batch)
+                logger.warning("signaling publish failed for %d frame(s)", len(batch))
+
+    def _accept(self, room_id: str, origin: Optional[str], seq: int) -> bool:
+        if origin is None:
+            return True
+        instance, _, stream = origin.partition(".")
+        if instance == self.instance_id:
+            self.skipped_own += 1
+            return False
+        last_by_origin = self._last_seq.setdefault(room_id, {})
+        last = last_by_origin.get(instance)
+        # a new stream restarts the room's seq: nothing to compare against
+        if last is not None and last[0] == stream:
+            if seq <= last[1]:
+                self.duplicates += 1
+                return False
+            self.gaps += seq - last[1] - 1
+        last_by_origin[instance] = (stream, seq)
+        return True
+
+    async def _listen(self):
+        while True:
+            try:
+                if not self.rooms:
+                    # Nothing subscribed: park instead of polling an idle connection
+                    self._active.clear()
+                    await self._active.wait()
+                    continue
+                msg = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if not msg or msg.get("type") not in ("message", "smessage"):
+                    continue
+                channel = _decode(msg.get("channel"))
+                if not channel or not channel.startswith(CHANNEL_PREFIX):
+                    continue
+                self.received += 1
+                room_id = channel[len(CHANNEL_PREFIX):]
+                origin, seq, kind, frame = decode_envelope(_decode(msg.get("data")))
+                if not self._accept(room_id, origin, seq):
+                    continue
+                if kind != KIND_CONTROL:
+                    await self.on_message(room_id, frame)
+                elif self.on_control:
+                    await self.on_control(room_id, frame)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("signaling pub/sub listener error; retrying in 1s")
+                await asyncio.sleep(1.0)
+
+    async def close(self):
+        for task in (self._task, self._outbox_task):
+            if task:
+                task.cancel()
+        if self.pubsub is not None:
+            try:
+                await self.pubsub.aclose()
+            except Exception:
+                pass
@@ -0,0 +1,67 @@
+"""
+Inbound rate limiting for signaling sockets.
+
+Every relayed frame is published to Redis and written to each peer in the
+room, so one client flooding chat (or anything else) multiplies into work for
+the whole room. Frames are admitted through two token buckets:
+
+- per peer: `peer_rate` frames/s with bursts of `peer_burst`;
+- per room: `room_rate` frames/s with bursts of `room_burst`, shared by
+  everyone in the room.
+
+A bucket is two floats refilled lazily on use (no timers, no per-frame
+allocation), and the rate/burst live on the shared `RateLimit`, so the check
+is a handful of arithmetic operations on the relay path.
+"""
+from typing import Optional
+
+POLICY_DROP = "drop"
+POLICY_DISCONNECT = "disconnect"
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "stamp")
+
+    def __init__(self, tokens: float, stamp: float):
+        self.tokens = tokens
+        self.stamp = stamp
+
+
+class RateLimit:
+    """Rate and burst shared by every bucket of one kind (rate 0 disables)."""
+
+    __slots__ = ("rate", "burst")
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst else max(rate, 1))
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def bucket(self, now: float) -> TokenBucket:
+        return TokenBucket(self.burst, now)
+
+    def allow(self, bucket: TokenBucket, now: float) -> bool:
+        """Take one token from `bucket` if available."""
+        tokens = bucket.tokens + (now - bucket.stamp) * self.rate
+        if tokens > self.burst:
+            tokens = self.burst
+        bucket.stamp = now
+        if tokens < 1.0:
+            bucket.tokens = tokens
+            return False
+        bucket.tokens = tokens - 1.0
+        return True
+
+
+class RateLimitStats:
+    """Totals across all rooms (per-room counts live on each room)."""
+
+    __slots__ = ("peer_limited", "room_limited", "disconnects")
+
+    def __init__(self):
+        self.peer_limited = 0
+        self.room_limited = 0
+        self.disconnects = 0
@@ -0,0 +1,190 @@
+"""
+Cluster-wide signaling room state.
+
+Sockets are necessarily local to one worker, but who is in a room is not:
+roles, hosts, pending join requests (with their intake payloads) and which
+instance holds each peer's socket live in a `RoomStateStore` so a patient
+connected to worker A is visible to a host on worker B.
+
+- `MemoryRoomStateStore`: single node and tests (share one instance between
+  managers to simulate a cluster).
+- `RedisRoomStateStore`: one hash/set per room field, all keys of a room in
+  the same hash slot, expiring SIGNALING_ROOM_STATE_TTL seconds after the last
+  write so rooms abandoned by a crashed worker disappear on their own.
+"""
+import json
+from typing import Dict, Optional, Set
+
+
+class RoomStateStore:
+    """Interface shared by the memory and Redis backends (all methods are async)."""
+
+    async def announce(self, room_id: str, peer_id: str, role: str, instance_id: str):
+        raise NotImplementedError
+
+    async def add_pending(self, room_id: str, peer_id: str, payload: dict, instance_id: str):
+        raise NotImplementedError
+
+    async def take_pending(self, room_id: str, peer_id: str) -> Optional[dict]:
+        """Atomically remove a pending request; None if it was not pending (already handled)."""
+        raise NotImplementedError
+
+    async def pending(self, room_id: str) -> Dict[str, dict]:
+        raise NotImplementedError
+
+    async def hosts(self, room_id: str) -> Set[str]:
+        raise NotImplementedError
+
+    async def locate(self, room_id: str, peer_id: str) -> Optional[str]:
+        """Instance id holding the peer's socket, if any."""
+        raise NotImplementedError
+
+    async def remove_peer(self, room_id: str, peer_id: str, instance_id: Optional[str] = None):
+        """Forget a peer; with `instance_id`, only if it is still registered there
+        (a reconnect to another worker must not be undone by the old worker's cleanup)."""
+        raise NotImplementedError
+
+    def stats(self) -> Optional[dict]:
+        """Size gauges for locally held state; None when it lives elsewhere."""
+        return None
+
+
+class _MemoryRoom:
+    __slots__ = ("roles", "hosts", "pending", "where")
+
+    def __init__(self):
+        self.roles: Dict[str, str] = {}
+        self.hosts: Set[str] = set()
+        self.pending: Dict[str, dict] = {}
+        self.where: Dict[str, str] = {}
+
+
+class MemoryRoomStateStore(RoomStateStore):
+    def __init__(self):
+        self.rooms: Dict[str, _MemoryRoom] = {}
+
+    def _room(self, room_id: str) -> _MemoryRoom:
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.rooms[room_id] = _MemoryRoom()
+        return room
+
+    async def announce(self, room_id, peer_id, role, instance_id):
+        room = self._room(room_id)
+        room.roles[peer_id] = role
+        room.where[peer_id] = instance_id
+        if role == "host":
+            room.hosts.add(peer_id)
+
+    async def add_pending(self, room_id, peer_id, payload, instance_id):
+        room = self._room(room_id)
+        room.roles[peer_id] = "patient"
+        room.where[peer_id] = instance_id
+        room.pending[peer_id] = payload
+
+    async def take_pending(self, room_id, peer_id):
+        room = self.rooms.get(room_id)
+        return room.pending.pop(peer_id, None) if room else None
+
+    async def pending(self, room_id):
+        room = self.rooms.get(room_id)
+        return dict(room.pending) if room else {}
+
+    async def hosts(self, room_id):
+        room = self.rooms.get(room_id)
+        return set(room.hosts) if room else set()
+
+    async def locate(self, room_id, peer_id):
+        room = self.rooms.get(room_id)
+        return room.where.get(peer_id) if room else None
+
+    async def remove_peer(self, room_id, peer_id, instance_id=None):
+        room = self.rooms.get(room_id)
+        if room is None:
+            return
+        if instance_id is not None and room.where.get(peer_id, instance_id) != instance_id:
+            return
+        room.roles.pop(peer_id, None)
+        room.hosts.discard(peer_id)
+        room.pending.pop(peer_id, None)
+        room.where.pop(peer_id, None)
+        if not room.roles and not room.where:
+            del self.rooms[room_id]
+
+    def stats(self):
+        pending = [p for room in self.rooms.values() for p in room.pending.values()]
+        return {
+            "rooms": len(self.rooms),
+            "peers": sum(len(room.where) for room in self.rooms.values()),
+            "pending_requests": len(pending),
+            "pending_payload_bytes": sum(len(json.dumps(p)) for p in pending),
+        }
+
+
+class RedisRoomStateStore(RoomStateStore):
+    def __init__(self, client, ttl_seconds: int = 21600, prefix: str = "signal:room:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def _keys(self, room_id: str):
+        # {room} hash tag keeps a room's keys on one cluster slot so MULTI works
+        base = f"{self.prefix}{{{room_id}}}"
+        return base + ":roles", base + ":hosts", base + ":pending", base + ":where"
+
+    def _touch(self, pipe, keys):
+        for key in keys:
+            pipe.expire(key, self.ttl_seconds)
+
+    async def announce(self, room_id, peer_id, role, instance_id):
+        keys = roles, hosts, _, where = self._keys(room_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(roles, peer_id, role)
+        pipe.hset(where, peer_id, instance_id)
+        if role == "host":
+            pipe.sadd(hosts, peer_id)
+        self._touch(pipe, keys)
+        await pipe.execute()
+
+    async def add_pending(self, room_id, peer_id, payload, instance_id):
+        keys = roles, _, pending, where = self._keys(room_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(roles, peer_id, "patient")
+        pipe.hset(where, peer_id, instance_id)
+        pipe.hset(pending, peer_id, json.dumps(payload))
+        self._touch(pipe, keys)
+        await pipe.execute()
+
+    async def take_pending(self, room_id, peer_id):
+        pending = self._keys(room_id)[2]
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hget(pending, peer_id)
+        pipe.hdel(pending, peer_id)
+        raw, removed = await pipe.execute()
+        # Only the caller whose HDEL removed the field owns the approval/rejection
+        if not removed or raw is None:
+            return None
+        return json.loads(raw)
+
+    async def pending(self, room_id):
+        raw = await self.client.hgetall(self._keys(room_id)[2])
+        return {peer_id: json.loads(value) for peer_id, value in raw.items()}
+
+    async def hosts(self, room_id):
+        return set(await self.client.smembers(self._keys(room_id)[1]))
+
+    async def locate(self, room_id, peer_id):
+        return await self.client.hget(self._keys(room_id)[3], peer_id)
+
+    async def remove_peer(self, room_id, peer_id, instance_id=None):
+        roles, hosts, pending, where = self._keys(room_id)
+        if instance_id is not None:
+            current = await self.client.hget(where, peer_id)
+            if current is not None and current != instance_id:
+                return
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hdel(roles, peer_id)
+        pipe.srem(hosts, peer_id)
+        pipe.hdel(pending, peer_id)
+        pipe.hdel(where, peer_id)
+        await pipe.execute()
@@ -0,0 +1,209 @@
+"""
+Maintained counters for the admin dashboard.
+
+`GET /api/v1/admin/stats` used to run four COUNT(*) queries per call. The
+counts now live in the single `admin_stats` row:
+
+- ORM flush events on User and Appointment apply +/- deltas on the same
+  connection as the write, so the counters commit or roll back with it.
+- Writes that bypass the ORM (raw SQL inserts) call `apply_deltas` directly.
+- `reconcile` recounts the source tables and overwrites the row, correcting any
+  drift. It runs at startup and periodically from `reconcile_periodically`.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict
+
+import sqlalchemy as sa
+from sqlalchemy import event, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.admin_stats import AdminStats
+from app.models.appointment import Appointment
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+STATS_ROW_ID = 1
+COUNTER_COLUMNS = ("total_users", "doctors", "patients", "appointments")
+
+_stats = AdminStats.__table__
+_users = User.__table__
+_appointments = Appointment.__table__
+
+
+def _role_deltas(role: str | None, sign: int) -> Dict[str, int]:
+    if role == "doctor":
+        return {"doctors": sign}
+    if role == "patient":
+        return {"patients": sign}
+    return {}
+
+
+def apply_deltas(connection, **deltas: int) -> None:
+    """Increment/decrement counters on `connection` (inside the caller's transaction)."""
+    values = {name: _stats.c[name] + delta for name, delta in deltas.items() if delta}
+    if not values:
+        return
+    result = connection.execute(
+        sa.update(_stats).where(_stats.c.id == STATS_ROW_ID).values(**values)
+    )
+    if result.rowcount == 0:
+        # Row not seeded yet; the next reconcile will produce correct totals.
+        logger.debug("admin_stats row missing; deltas skipped until reconcile")
+
+
+def _source_counts(connection) -> Dict[str, int]:
+    user_row = connection.execute(
+        sa.select(
+            func.count(),
+            func.coalesce(func.sum(sa.case((_users.c.role == "doctor", 1), else_=0)), 0),
+            func.coalesce(func.sum(sa.case((_users.c.role == "patient", 1), else_=0)), 0),
+        )
+    ).one()
+    appointments = connection.execute(sa.select(func.count()).select_from(_appointments)).scalar_one()
+    return {
+        "total_users": int(user_row[0]),
+        "doctors": int(user_row[1]),
+        "patients": int(user_row[2]),
+        "appointments": int(appointments),
+    }
+
+
+def reconcile(db: Session) -> dict:
+    """Recount the source tables, overwrite the counters row and commit.
+
+    The counters row is locked first (Postgres), so concurrent writers queue
+    their deltas behind the recount instead of being lost or double counted.
+    Returns the fresh counts and the drift that was corrected.
+    """
+    conn = db.connection()
+    columns = [_stats.c[name] for name in COUNTER_COLUMNS]
+    current = conn.execute(
+        sa.select(*columns).where(_stats.c.id == STATS_ROW_ID).with_for_update()
+    ).first()
+    counts = _source_counts(conn)
+    now = datetime.now(timezone.utc)
+
+    drift: Dict[str, int] = {}
+    try:
+        if current is None:
+            conn.execute(sa.insert(_stats).values(id=STATS_ROW_ID, reconciled_at=now, **counts))
+        else:
+            stored = current._mapping
+            drift = {name: stored[name] - counts[name] for name in COUNTER_COLUMNS if stored[name] != counts[name]}
+            conn.execute(
+                sa.update(_stats).where(_stats.c.id == STATS_ROW_ID).values(reconciled_at=now, **counts)
+            )
+        db.commit()
+    except IntegrityError:
+        # Another worker seeded the row between our read and insert; it is correct as of its recount.
+        db.rollback()
+        return {"counts": read_stats(db), "drift": {}}
+
+    if drift:
+        logger.warning("admin_stats drift corrected: %s", drift)
+    return {"counts": counts, "drift": drift}
+
+
+def _planner_estimates(db: Session) -> Dict[str, int]:
+    """Approximate counts from Postgres planner statistics (pg_class / pg_stats).
+
+    Only as fresh as the last ANALYZE, but never touches table data.
+    """
+    reltuples = dict(db.execute(sa.text(
+        "SELECT relname, reltuples::bigint FROM pg_class WHERE relname IN ('users', 'appointments')"
+    )).all())
+    total_users = max(int(reltuples.get("users") or 0), 0)
+    appointments = max(int(reltuples.get("appointments") or 0), 0)
+
+    freqs: Dict[str, float] = {}
+    row = db.execute(sa.text(
+        "SELECT most_common_vals::text, most_common_freqs FROM pg_stats "
+        "WHERE tablename = 'users' AND attname = 'role'"
+    )).first()
+    if row and row[0] and row[1]:
+        values = [v.strip().strip('"') for v in row[0].strip("{}").split(",")]
+        freqs = dict(zip(values, row[1]))
+
+    return {
+        "total_users": total_users,
+        "doctors": round(total_users * freqs.get("doctor", 0.0)),
+        "patients": round(total_users * freqs.get("patient", 0.0)),
+        "appointments": appointments,
+    }
+
+
+def read_stats(db: Session, approximate: bool = False) -> Dict[str, int]:
+    """Return dashboard counters from the maintained row (or planner estimates)."""
+    if approximate and db.get_bind().dialect.name == "postgresql":
+        return _planner_estimates(db)
+    columns = [_stats.c[name] for name in COUNTER_COLUMNS]
+    row = db.execute(sa.select(*columns).where(_stats.c.id == STATS_ROW_ID)).first()
+    if row is None:
+        return reconcile(db)["counts"]
+    return {name: int(value) for name, value in row._mapping.items()}
+
+
+def _reconcile_once() -> dict:
+    db = SessionLocal()
+    try:
+        return reconcile(db)
+    finally:
+        db.close()
+
+
+async def reconcile_periodically(interval_seconds: float) -> None:
+    """Background job: reconcile immediately, then every `interval_seconds`."""
+    while True:
+        try:
+            await asyncio.to_thread(_reconcile_once)
+        except Exception:
+            logger.exception("admin_stats reconciliation failed")
+        await asyncio.sleep(interval_seconds)
+
+
+# --- ORM event hooks -------------------------------------------------------
+
+@event.listens_for(User, "after_insert")
+def _user_inserted(mapper, connection, target):
+    apply_deltas(connection, total_users=1, **_role_deltas(target.role, 1))
+
+
+@event.listens_for(User, "before_delete")
+def _user_deleted(mapper, connection, target):
+    # before_delete: the row (and target.role) can still be loaded here.
+    apply_deltas(connection, total_users=-1, **_role_deltas(target.role, -1))
+
+
+# active_history makes SQLAlchemy load the previous role on assignment so that
+# after_update can see both sides of the change.
+@event.listens_for(User.role, "set", active_history=True)
+def _user_role_set(target, value, oldvalue, initiator):
+    return value
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target):
+    history = sa.inspect(target).attrs.role.history
+    if not history.has_changes():
+        return
+    old = history.deleted[0] if history.deleted else None
+    new = history.added[0] if history.added else None
+    deltas = _role_deltas(old, -1)
+    for name, delta in _role_deltas(new, 1).items():
+        deltas[name] = deltas.get(name, 0) + delta
+    apply_deltas(connection, **deltas)
+
+
+@event.listens_for(Appointment, "after_insert")
+def _appointment_inserted(mapper, connection, target):
+    apply_deltas(connection, appointments=1)
+
+
+@event.listens_for(Appointment, "after_delete")
+def _appointment_deleted(mapper, connection, target):
+    apply_deltas(connection, appointments=-1)
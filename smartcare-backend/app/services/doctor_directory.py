@@ -0,0 +1,219 @@
+"""
+Pre-serialized cache for the public doctor directory (`GET /api/v1/doctors`).
+
+The directory only changes when a doctor updates their profile (or an admin
+removes a user), yet every request used to hit the DB and rebuild dicts. Pages
+are now kept as ready-to-send JSON bytes with an ETag, keyed by the normalized
+filter (search, specialization, facet selections, cursor, limit):
+
+- LRU bounded by DOCTOR_DIRECTORY_CACHE_SIZE, entries expire after
+  DOCTOR_DIRECTORY_CACHE_TTL seconds to bound staleness from other writers.
+- Concurrent misses for the same key are single-flighted: one request builds
+  the page, the others wait for its result.
+- `invalidate()` drops every entry and bumps a generation counter so builds
+  that started before the invalidation are not stored. When REDIS_URL is set
+  explicitly, invalidations are published so other workers drop their copies
+  too. The publish goes through the listener's async client on the event
+  loop, so the request that invalidated never waits on Redis.
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "doctor_directory:invalidate"
+# Identifies this process so it can ignore its own invalidation broadcasts
+INSTANCE_ID = uuid.uuid4().hex
+
+CacheKey = Tuple[Optional[str], Optional[str], Optional[str], int, tuple]
+
+
+class DirectoryPage:
+    __slots__ = ("body", "etag", "next_cursor", "created_at")
+
+    def __init__(self, body: bytes, next_cursor: Optional[str]):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.next_cursor = next_cursor
+        self.created_at = time.monotonic()
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or self.etag in tags or ("W/" + self.etag) in tags
+
+
+class _Flight:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[DirectoryPage] = None
+        self.error: Optional[BaseException] = None
+
+
+class DirectoryCache:
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, DirectoryPage]" = OrderedDict()
+        self._flights: Dict[CacheKey, _Flight] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_build(self, key: CacheKey, build: Callable[[], DirectoryPage]) -> DirectoryPage:
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None and time.monotonic() - page.created_at < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return page
+            self.misses += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                generation = self._generation
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            page = build()
+            flight.result = page
+            with self._lock:
+                # Skip storing a page built from data an invalidation has superseded
+                if generation == self._generation:
+                    self._entries[key] = page
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return page
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+cache = DirectoryCache(
+    max_entries=getattr(settings, "DOCTOR_DIRECTORY_CACHE_SIZE", 256),
+    ttl_seconds=getattr(settings, "DOCTOR_DIRECTORY_CACHE_TTL", 60),
+)
+
+# Set while `listen_for_invalidations` holds a connection; publishes reuse it
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_client: Optional[aioredis.Redis] = None
+
+LISTEN_RETRY_MIN_SECONDS = 1
+LISTEN_RETRY_MAX_SECONDS = 300
+
+
+def make_key(
+    search: Optional[str],
+    specialization: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+    facets: Optional[Dict[str, list]] = None,
+) -> CacheKey:
+    facet_key = tuple(
+        (name, tuple(sorted({v.strip().lower() for v in values})))
+        for name, values in sorted((facets or {}).items()) if values
+    )
+    return (
+        (search or "").strip().lower() or None,
+        (specialization or "").strip().lower() or None,
+        cursor or None,
+        limit,
+        facet_key,
+    )
+
+
+def invalidate(broadcast: bool = True):
+    """Drop all cached pages locally and, if Redis is configured, on other workers.
+
+    Safe to call from sync endpoints (worker threads) and from the event loop.
+    """
+    cache.invalidate()
+    loop, client = _loop, _client
+    if not broadcast or loop is None or client is None:
+        # No broadcast channel: other workers converge within the TTL
+        return
+    try:
+        future = asyncio.run_coroutine_threadsafe(client.publish(INVALIDATION_CHANNEL, INSTANCE_ID), loop)
+    except RuntimeError:
+        # loop already closed (shutdown)
+        return
+    future.add_done_callback(_published)
+
+
+def _published(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("doctor directory invalidation broadcast failed")
+
+
+async def listen_for_invalidations():
+    """Background task: drop local pages when another worker publishes an invalidation.
+
+    Does nothing unless REDIS_URL is set explicitly. Reconnects with
+    exponential backoff and logs an outage once, not on every retry.
+    """
+    global _loop, _client
+    if not getattr(settings, "DOCTOR_DIRECTORY_BROADCAST", False):
+        return
+    delay = LISTEN_RETRY_MIN_SECONDS
+    failing = False
+    while True:
+        client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        try:
+            pubsub = client.pubsub()
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            _loop, _client = asyncio.get_running_loop(), client
+            if failing:
+                logger.info("doctor directory invalidation listener reconnected")
+            delay, failing = LISTEN_RETRY_MIN_SECONDS, False
+            async for msg in pubsub.listen():
+                if msg and msg.get("type") == "message" and msg.get("data") != INSTANCE_ID:
+                    cache.invalidate()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if not failing:
+                logger.warning("doctor directory invalidation listener unavailable; retrying with backoff")
+            failing = True
+        finally:
+            if _client is client:
+                _loop, _client = None, None
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, LISTEN_RETRY_MAX_SECONDS)
@@ -0,0 +1,219 @@
+"""
+Precomputed facets for doctor browsing.
+
+The directory shows specialization, fee-range and availability-day facets with
+counts. Instead of a GROUP BY per request, an in-memory inverted index maps
+every facet value to a bitset (a Python int, bit i = doctor at position i).
+Counts and intersections are then a handful of `&` / `bit_count()` calls.
+
+Selection semantics are the usual ones for faceted search: values within a
+facet are OR'ed, facets are AND'ed, and each facet's counts are computed
+against the selections of the *other* facets so users can see alternatives.
+
+The index is built from the doctors table on first use, rebuilt when older
+than INDEX_MAX_AGE_SECONDS, and updated incrementally on profile changes and
+doctor removal.
+"""
+from __future__ import annotations
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.doctor import Doctor
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAX_AGE_SECONDS = 300
+
+# (label, lower bound inclusive, upper bound exclusive)
+FEE_BUCKETS: Tuple[Tuple[str, float, float], ...] = (
+    ("0-50", 0.0, 50.0),
+    ("50-100", 50.0, 100.0),
+    ("100-200", 100.0, 200.0),
+    ("200-500", 200.0, 500.0),
+    ("500+", 500.0, float("inf")),
+)
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+FACETS = ("specialization", "fee", "day")
+
+
+def fee_bucket(fee: Optional[float]) -> str:
+    value = float(fee or 0.0)
+    for label, low, high in FEE_BUCKETS:
+        if low <= value < high:
+            return label
+    return FEE_BUCKETS[0][0]
+
+
+def _facet_values(specialization: Optional[str], fee: Optional[float], availability) -> Dict[str, Tuple[str, ...]]:
+    spec = (specialization or "").strip()
+    days = ()
+    if isinstance(availability, dict):
+        days = tuple(sorted({str(k).strip().lower()[:3] for k in availability if str(k).strip().lower()[:3] in DAYS}))
+    return {
+        "specialization": (spec.lower(),) if spec else (),
+        "fee": (fee_bucket(fee),),
+        "day": days,
+    }
+
+
+def bitset_positions(bits: int) -> List[int]:
+    """Positions of set bits, ascending (string scan runs in C)."""
+    if not bits:
+        return []
+    digits = bin(bits)[:1:-1]  # little-endian '0'/'1' string without the '0b' prefix
+    positions = []
+    i = digits.find("1")
+    while i != -1:
+        positions.append(i)
+        i = digits.find("1", i + 1)
+    return positions
+
+
+class FacetIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+        self.built_at = 0.0
+
+    def _reset(self):
+        self._bits: Dict[str, Dict[str, int]] = {f: {} for f in FACETS}
+        self._labels: Dict[str, str] = {}  # lowercased specialization -> display label
+        self._position: Dict[int, int] = {}  # doctor id -> bit position
+        self._ids: List[Optional[int]] = []  # bit position -> doctor id
+        self._values: Dict[int, Dict[str, Tuple[str, ...]]] = {}
+        self._all = 0
+
+    def __len__(self) -> int:
+        return len(self._position)
+
+    def _set(self, doctor_id: int, specialization, fee, availability):
+        pos = self._position.get(doctor_id)
+        if pos is None:
+            pos = self._position[doctor_id] = len(self._ids)
+            self._ids.append(doctor_id)
+        bit = 1 << pos
+        values = _facet_values(specialization, fee, availability)
+        self._values[doctor_id] = values
+        for facet, vals in values.items():
+            bits = self._bits[facet]
+            for v in vals:
+                bits[v] = bits.get(v, 0) | bit
+        if values["specialization"] and specialization:
+            self._labels.setdefault(values["specialization"][0], specialization.strip())
+        self._all |= bit
+
+    def _clear(self, doctor_id: int):
+        pos = self._position.get(doctor_id)
+        if pos is None:
+            return
+        mask = ~(1 << pos)
+        for facet, vals in self._values.pop(doctor_id, {}).items():
+            bits = self._bits[facet]
+            for v in vals:
+                remaining = bits.get(v, 0) & mask
+                if remaining:
+                    bits[v] = remaining
+                else:
+                    bits.pop(v, None)
+        self._all &= mask
+
+    def build(self, rows: Iterable[Tuple[int, Optional[str], Optional[float], object]]):
+        """Replace contents with (doctor_id, specialization, consultation_fee, availability) rows."""
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._set(*row)
+            self.built_at = time.monotonic()
+
+    def upsert(self, doctor_id: int, specialization, fee, availability):
+        with self._lock:
+            self._clear(doctor_id)
+            self._set(doctor_id, specialization, fee, availability)
+
+    def remove(self, doctor_id: int):
+        with self._lock:
+            self._clear(doctor_id)
+            pos = self._position.pop(doctor_id, None)
+            if pos is not None:
+                self._ids[pos] = None
+
+    def _selection_bits(self, facet: str, values: Sequence[str]) -> int:
+        bits = self._bits[facet]
+        combined = 0
+        for v in values:
+            key = v.strip().lower()
+            if facet == "day":
+                key = key[:3]
+            combined |= bits.get(key, 0)
+        return combined
+
+    def _filter(self, selected: Mapping[str, Sequence[str]], skip: Optional[str] = None) -> int:
+        result = self._all
+        for facet in FACETS:
+            values = selected.get(facet)
+            if facet != skip and values:
+                result &= self._selection_bits(facet, values)
+        return result
+
+    def counts(self, selected: Mapping[str, Sequence[str]]) -> dict:
+        """Total matches plus per-facet value counts under the given selection."""
+        with self._lock:
+            facets = {}
+            for facet in FACETS:
+                base = self._filter(selected, skip=facet)
+                entries = []
+                for value, bits in self._bits[facet].items():
+                    n = (bits & base).bit_count()
+                    if n:
+                        label = self._labels.get(value, value) if facet == "specialization" else value
+                        entries.append({"value": label, "count": n})
+                if facet == "fee":
+                    order = {label: i for i, (label, _, _) in enumerate(FEE_BUCKETS)}
+                    entries.sort(key=lambda e: order[e["value"]])
+                elif facet == "day":
+                    entries.sort(key=lambda e: DAYS.index(e["value"]))
+                else:
+                    entries.sort(key=lambda e: (-e["count"], e["value"]))
+                facets[facet] = entries
+            return {"total": self._filter(selected).bit_count(), "facets": facets}
+
+    def matching_ids(self, selected: Mapping[str, Sequence[str]]) -> frozenset:
+        with self._lock:
+            bits = self._filter(selected)
+            ids = self._ids
+            return frozenset(ids[p] for p in bitset_positions(bits) if ids[p] is not None)
+
+
+_index = FacetIndex()
+_build_lock = threading.Lock()
+
+
+def _index_fresh() -> bool:
+    return bool(_index.built_at) and time.monotonic() - _index.built_at < INDEX_MAX_AGE_SECONDS
+
+
+def get_index(db: Session) -> FacetIndex:
+    if _index_fresh():
+        return _index
+    with _build_lock:
+        if not _index_fresh():
+            rows = db.query(Doctor.id, Doctor.specialization, Doctor.consultation_fee, Doctor.availability)
+            _index.build(rows.yield_per(5000))
+            logger.info("doctor facet index rebuilt (%d doctors)", len(_index))
+    return _index
+
+
+def index_doctor(doctor: Doctor):
+    """Apply a profile change incrementally (no-op until the index is first built)."""
+    if _index.built_at:
+        _index.upsert(doctor.id, doctor.specialization, doctor.consultation_fee, doctor.availability)
+
+
+def remove_doctor(doctor_id: int):
+    """Drop a deleted doctor from every facet (no-op until the index is first built)."""
+    if _index.built_at:
+        _index.remove(doctor_id)
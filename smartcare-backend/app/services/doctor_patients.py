@@ -0,0 +1,71 @@
+"""
+Maintenance of the doctor -> patient roster index (`doctor_patients`).
+
+A link is recorded whenever a doctor and a patient share an appointment.
+ORM inserts of Appointment are handled by a flush event; raw SQL writers
+(appointment booking) call `link_patient` directly on their own connection so
+the link commits with the write. Medical records carry no doctor id (only the
+free-text `doctor_name`), so they do not create links.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models.appointment import Appointment
+from app.models.doctor_patient import DoctorPatient
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+_links = DoctorPatient.__table__
+_users = User.__table__
+
+
+def name_key(full_name: Optional[str], email: Optional[str]) -> str:
+    """Lowercased display name used for roster ordering and prefix search."""
+    name = full_name or (email or "").split('@')[0]
+    return name.strip().lower()
+
+
+def link_patient(connection, doctor_id, patient_id) -> None:
+    """Insert or refresh the (doctor, patient) link on `connection`."""
+    if not doctor_id or not patient_id:
+        return
+    doctor_id, patient_id = str(doctor_id), str(patient_id)
+    user = connection.execute(
+        sa.select(_users.c.full_name, _users.c.email).where(_users.c.id == patient_id)
+    ).first()
+    now = datetime.now(timezone.utc)
+    values = {
+        "doctor_id": doctor_id,
+        "patient_id": patient_id,
+        "patient_name": name_key(user.full_name, user.email) if user else "",
+        "first_seen_at": now,
+        "last_seen_at": now,
+    }
+
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(_links).values(**values)
+        connection.execute(insert.on_conflict_do_update(
+            index_elements=[_links.c.doctor_id, _links.c.patient_id],
+            set_={"last_seen_at": now, "patient_name": insert.excluded.patient_name},
+        ))
+        return
+
+    updated = connection.execute(
+        sa.update(_links)
+        .where(_links.c.doctor_id == doctor_id, _links.c.patient_id == patient_id)
+        .values(last_seen_at=now, patient_name=values["patient_name"])
+    )
+    if updated.rowcount == 0:
+        connection.execute(sa.insert(_links).values(**values))
+
+
+@event.listens_for(Appointment, "after_insert")
+def _appointment_inserted(mapper, connection, target):
+    link_patient(connection, target.doctor_id, target.patient_id)
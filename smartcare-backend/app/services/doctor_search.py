@@ -0,0 +1,284 @@
+"""
+Trigram search for the public doctor directory.
+
+`GET /api/v1/doctors` used `ILIKE '%term%'`, which cannot use an index. Search
+is now trigram based so it is indexable, ranked and tolerant of typos:
+
+- Postgres: pg_trgm `<%` (word similarity) backed by GIN indexes on
+  users.full_name and doctors.specialization (see the 20261019 migration).
+- Other databases (SQLite in dev/tests): an in-process `TrigramIndex` built
+  from the doctors table, refreshed periodically and on profile updates.
+
+Both paths rank by word similarity (best of name / specialization) and page
+with a keyset cursor over (score desc, doctor id asc).
+"""
+from __future__ import annotations
+import heapq
+import itertools
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy import func, or_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.models.doctor import Doctor
+from app.models.user import User
+from app.utils.pagination import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Minimum word similarity for a match; matches pg_trgm's similarity_threshold default.
+SIMILARITY_THRESHOLD = 0.3
+# In-process index is rebuilt from the DB when older than this.
+INDEX_MAX_AGE_SECONDS = 300
+
+_WORD_RE = re.compile(r"[0-9a-z]+")
+
+
+def trigrams(text: Optional[str]) -> frozenset:
+    """pg_trgm-style trigrams: lowercase words padded with two leading and one trailing blank."""
+    if not text:
+        return frozenset()
+    grams = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return frozenset(grams)
+
+
+def display_name(full_name: Optional[str], email: Optional[str]) -> str:
+    return full_name if full_name else (email or "").split('@')[0]
+
+
+class TrigramIndex:
+    """Inverted trigram index over doctor name and specialization.
+
+    Postings are plain lists of doctor ids (compact; removals only happen on
+    profile updates). Scores approximate pg_trgm's word_similarity: the share
+    of query trigrams present in the field.
+    """
+
+    FIELDS = ("name", "specialization")
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, List[int]]] = {f: defaultdict(list) for f in self.FIELDS}
+        self._docs: Dict[int, Dict[str, frozenset]] = {}
+        self._lock = threading.Lock()
+        self.built_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _add(self, doctor_id: int, fields: Dict[str, Optional[str]]):
+        grams = {f: trigrams(fields.get(f)) for f in self.FIELDS}
+        self._docs[doctor_id] = grams
+        for f in self.FIELDS:
+            postings = self._postings[f]
+            for g in grams[f]:
+                postings[g].append(doctor_id)
+
+    def _remove(self, doctor_id: int):
+        grams = self._docs.pop(doctor_id, None)
+        if not grams:
+            return
+        for f in self.FIELDS:
+            postings = self._postings[f]
+            for g in grams[f]:
+                ids = postings.get(g)
+                if ids:
+                    try:
+                        ids.remove(doctor_id)
+                    except ValueError:
+                        pass
+                    if not ids:
+                        del postings[g]
+
+    def build(self, rows: Iterable[Tuple[int, Optional[str], Optional[str]]]):
+        """Replace the index contents with (doctor_id, name, specialization) rows."""
+        with self._lock:
+            self._postings = {f: defaultdict(list) for f in self.FIELDS}
+            self._docs = {}
+            for doctor_id, name, specialization in rows:
+                self._add(doctor_id, {"name": name, "specialization": specialization})
+            self.built_at = time.monotonic()
+
+    def upsert(self, doctor_id: int, name: Optional[str], specialization: Optional[str]):
+        with self._lock:
+            self._remove(doctor_id)
+            self._add(doctor_id, {"name": name, "specialization": specialization})
+
+    def _field_scores(self, field: str, query_grams: frozenset, threshold: float) -> Dict[int, float]:
+        postings = self._postings[field]
+        # Counter consumes the chained postings in C, far faster than a Python loop
+        hits = Counter(itertools.chain.from_iterable(postings.get(g, ()) for g in query_grams))
+        n = len(query_grams)
+        min_hits = threshold * n
+        return {doctor_id: count / n for doctor_id, count in hits.items() if count >= min_hits}
+
+    def search(
+        self,
+        search: Optional[str] = None,
+        specialization: Optional[str] = None,
+        threshold: float = SIMILARITY_THRESHOLD,
+    ) -> Dict[int, float]:
+        """Return {doctor_id: score} for matches at or above `threshold` (unordered)."""
+        with self._lock:
+            scores: Optional[Dict[int, float]] = None
+            if search:
+                q = trigrams(search)
+                if not q:
+                    return {}
+                scores = self._field_scores("name", q, threshold)
+                for doctor_id, s in self._field_scores("specialization", q, threshold).items():
+                    if s > scores.get(doctor_id, 0.0):
+                        scores[doctor_id] = s
+            if specialization:
+                q = trigrams(specialization)
+                if not q:
+                    return {}
+                spec = self._field_scores("specialization", q, threshold)
+                scores = spec if scores is None else {d: s for d, s in scores.items() if d in spec}
+            if scores is None:
+                scores = dict.fromkeys(self._docs, 1.0)
+        return scores
+
+
+def top_page(scores: Dict[int, float], after: Optional[list], limit: int) -> Tuple[List[int], Optional[str]]:
+    """Select one page ordered by (score desc, id asc) after the cursor position.
+
+    Uses a bounded heap so cost is O(n log limit) rather than sorting all matches.
+    """
+    items: Iterable[Tuple[int, float]] = scores.items()
+    if after:
+        score, last_id = float(after[0]), int(after[1])
+        items = ((d, s) for d, s in items if s < score or (s == score and d > last_id))
+    best = heapq.nsmallest(limit + 1, items, key=lambda item: (-item[1], item[0]))
+    page = best[:limit]
+    next_cursor = encode_cursor(page[-1][1], page[-1][0]) if len(best) > limit else None
+    return [d for d, _ in page], next_cursor
+
+
+_index = TrigramIndex()
+_build_lock = threading.Lock()
+
+
+def _index_fresh() -> bool:
+    return bool(_index.built_at) and time.monotonic() - _index.built_at < INDEX_MAX_AGE_SECONDS
+
+
+def _refresh_index(db: Session) -> TrigramIndex:
+    if _index_fresh():
+        return _index
+    with _build_lock:
+        # Another request may have rebuilt it while we waited
+        if _index_fresh():
+            return _index
+        _rebuild(db)
+    return _index
+
+
+def _rebuild(db: Session):
+    rows = db.query(Doctor.id, User.full_name, User.email, Doctor.specialization).join(User, Doctor.user_id == User.id)
+    _index.build((d_id, display_name(name, email), spec) for d_id, name, email, spec in rows.yield_per(5000))
+    logger.info("doctor trigram index rebuilt (%d doctors)", len(_index))
+
+
+def index_doctor(doctor: Doctor, user: User):
+    """Keep the in-process index current after a profile change (no-op until first build)."""
+    if _index.built_at:
+        _index.upsert(doctor.id, display_name(user.full_name, user.email), doctor.specialization)
+
+
+def _postgres_statement(search, specialization, after, limit, allowed_ids=None):
+    conditions = []
+    if search:
+        conditions.append(or_(
+            sa.literal(search).op("<%")(User.full_name),
+            sa.literal(search).op("<%")(Doctor.specialization),
+        ))
+        score = func.greatest(
+            func.coalesce(func.word_similarity(search, User.full_name), 0),
+            func.coalesce(func.word_similarity(search, Doctor.specialization), 0),
+        )
+    else:
+        score = func.word_similarity(specialization, Doctor.specialization)
+    if specialization:
+        conditions.append(sa.literal(specialization).op("<%")(Doctor.specialization))
+    if allowed_ids is not None:
+        # One array parameter (= ANY) rather than a bind parameter per allowed id
+        ids = sa.bindparam("allowed_ids", sorted(allowed_ids), type_=postgresql.ARRAY(sa.Integer))
+        conditions.append(Doctor.id == sa.any_(ids))
+
+    ranked = (
+        sa.select(Doctor.id.label("id"), score.label("score"))
+        .join(User, Doctor.user_id == User.id)
+        .where(*conditions)
+        .subquery()
+    )
+    stmt = sa.select(ranked.c.score, ranked.c.id)
+    if after:
+        # word_similarity is real (float4); comparing against the cursor as
+        # float8 would skip or repeat rows tied on score across pages
+        last_score = sa.cast(float(after[0]), sa.REAL)
+        stmt = stmt.where(or_(
+            ranked.c.score < last_score,
+            sa.and_(ranked.c.score == last_score, ranked.c.id > int(after[1])),
+        ))
+    return stmt.order_by(ranked.c.score.desc(), ranked.c.id.asc()).limit(limit + 1)
+
+
+def _postgres_page(db: Session, search, specialization, after, limit, allowed_ids=None):
+    # `<%` is the indexable form of word_similarity(q, col) >= threshold
+    db.execute(sa.text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+               {"t": str(SIMILARITY_THRESHOLD)})
+    rows = db.execute(_postgres_statement(search, specialization, after, limit, allowed_ids)).all()
+    page = rows[:limit]
+    # The driver reads float4 as its shortest decimal; cast back to REAL it is the same value
+    next_cursor = encode_cursor(float(page[-1][0]), page[-1][1]) if len(rows) > limit else None
+    return [r[1] for r in page], next_cursor
+
+
+def search_page(
+    db: Session,
+    search: Optional[str],
+    specialization: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+    allowed_ids: Optional[frozenset] = None,
+) -> Tuple[List[int], Optional[str]]:
+    """Return one page of doctor ids (ranked) and the cursor for the next page.
+
+    `allowed_ids` restricts results to a precomputed set (facet selections).
+    """
+    search = (search or "").strip() or None
+    specialization = (specialization or "").strip() or None
+
+    if not search and not specialization:
+        # Unfiltered directory: plain keyset on the primary key
+        after = decode_cursor(cursor, 1)
+        if allowed_ids is not None:
+            ids = sorted(d for d in allowed_ids if not after or d > int(after[0]))[:limit + 1]
+        else:
+            query = db.query(Doctor.id)
+            if after:
+                query = query.filter(Doctor.id > int(after[0]))
+            ids = [row[0] for row in query.order_by(Doctor.id.asc()).limit(limit + 1)]
+        next_cursor = encode_cursor(ids[limit - 1]) if len(ids) > limit else None
+        return ids[:limit], next_cursor
+
+    after = decode_cursor(cursor, 2)
+    if allowed_ids is not None and not allowed_ids:
+        return [], None
+    if db.get_bind().dialect.name == "postgresql":
+        return _postgres_page(db, search, specialization, after, limit, allowed_ids)
+    scores = _refresh_index(db).search(search, specialization)
+    if allowed_ids is not None:
+        scores = {d: s for d, s in scores.items() if d in allowed_ids}
+    return top_page(scores, after, limit)
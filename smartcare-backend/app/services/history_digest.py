@@ -0,0 +1,213 @@
+"""
+Per-patient medical history digest for note generation.
+
+`POST /api/v1/tele/generate-notes` used to load and decrypt the patient's 50
+latest records on every call, although one consult usually generates several
+drafts against the same history. The decrypted history lines are now cached
+per patient:
+
+- An entry is keyed by the patient's latest record version, the
+  (created_at, id) of their newest record, which costs one indexed
+  single-row lookup to check. When the version still matches, nothing is
+  decrypted.
+- When newer records exist (written by another worker), only those are
+  loaded, decrypted and prepended. `record_added` does the same from the
+  plaintext the write path already has, so it decrypts nothing.
+- If the newest record goes away, or `invalidate` is called for another
+  change, the digest is rebuilt from scratch on the next read.
+- Entries live only in process memory. Each one is sealed with a Fernet key
+  generated at startup and never stored, so the digest is ciphertext wherever
+  memory spills (swap, core dumps) and unreadable once the process exits.
+"""
+from __future__ import annotations
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from cryptography.fernet import Fernet
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.encryption import decrypt_data
+from app.models.medical_record import MedicalRecord
+
+logger = logging.getLogger(__name__)
+
+NO_HISTORY = "No prior records available."
+
+Version = Tuple[Optional[datetime], str]
+
+
+def record_line(record, diagnosis: str, prescription: str, notes: str) -> str:
+    """One history line for a MedicalRecord, given its decrypted fields."""
+    when = record.date or record.created_at
+    return (
+        f"- {when.isoformat() if when else ''} | {record.doctor_name or ''} | Diagnosis: {diagnosis}"
+        f" | Prescription: {prescription} | Notes: {notes}"
+    )
+
+
+def _decrypt(value: Optional[str]) -> str:
+    try:
+        return decrypt_data(value) if value else ''
+    except Exception:
+        return '[decryption-error]'
+
+
+def _decrypted_line(record) -> str:
+    return record_line(record, _decrypt(record.diagnosis), _decrypt(record.prescription), _decrypt(record.notes))
+
+
+def _newer(a: Version, b: Version) -> bool:
+    """True when version `a` is strictly newer than `b`."""
+    return (a[0] or datetime.min, a[1]) > (b[0] or datetime.min, b[1])
+
+
+class _Entry:
+    __slots__ = ("version", "sealed", "ids")
+
+    def __init__(self, version: Version, sealed: bytes, ids: List[str]):
+        self.version = version
+        # Fernet token over the JSON list of lines (newest first)
+        self.sealed = sealed
+        # record ids behind the lines, newest first
+        self.ids = ids
+
+
+class HistoryDigestCache:
+    def __init__(self, max_patients: int = 1024, max_records: int = 50):
+        self.max_patients = max_patients
+        self.max_records = max_records
+        self._fernet = Fernet(Fernet.generate_key())
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.incremental = 0
+        self.rebuilds = 0
+        self.decrypted_records = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _seal(self, lines: List[str]) -> bytes:
+        return self._fernet.encrypt(json.dumps(lines).encode())
+
+    def _open(self, entry: _Entry) -> List[str]:
+        return json.loads(self._fernet.decrypt(entry.sealed))
+
+    def _store(self, patient_id: str, version: Version, lines: List[str], ids: List[str]):
+        lines, ids = lines[:self.max_records], ids[:self.max_records]
+        with self._lock:
+            current = self._entries.get(patient_id)
+            # a concurrent reader may already have stored a newer digest
+            if current is not None and _newer(current.version, version):
+                return
+            self._entries[patient_id] = _Entry(version, self._seal(lines), ids)
+            self._entries.move_to_end(patient_id)
+            while len(self._entries) > self.max_patients:
+                self._entries.popitem(last=False)
+
+    def _get(self, patient_id: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(patient_id)
+            if entry is not None:
+                self._entries.move_to_end(patient_id)
+            return entry
+
+    def invalidate(self, patient_id: str):
+        with self._lock:
+            self._entries.pop(patient_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _prepend(self, patient_id: str, entry: _Entry, records: Sequence, lines: List[str]):
+        """Add lines for records newer than `entry` (records and lines newest first)."""
+        fresh = [(r, line) for r, line in zip(records, lines) if str(r.id) not in entry.ids]
+        if not fresh:
+            return self._open(entry)
+        merged = [line for _, line in fresh] + self._open(entry)
+        ids = [str(r.id) for r, _ in fresh] + entry.ids
+        newest = fresh[0][0]
+        self._store(patient_id, (newest.created_at, str(newest.id)), merged, ids)
+        return merged[:self.max_records]
+
+    def lines(self, db: Session, patient_id: str) -> List[str]:
+        """History lines for the patient, newest first (at most `max_records`)."""
+        model = MedicalRecord
+        latest = (
+            db.query(model.created_at, model.id)
+            .filter(model.user_id == patient_id)
+            .order_by(model.created_at.desc(), model.id.desc())
+            .first()
+        )
+        if latest is None:
+            self.invalidate(patient_id)
+            return []
+        version: Version = (latest[0], str(latest[1]))
+        entry = self._get(patient_id)
+        if entry is not None and entry.version == version:
+            self.hits += 1
+            return self._open(entry)
+        if entry is not None and _newer(version, entry.version):
+            # Only the records written since the cached version are decrypted
+            since = entry.version[0]
+            query = db.query(model).filter(model.user_id == patient_id)
+            if since is not None:
+                query = query.filter(model.created_at >= since)
+            records = query.order_by(model.created_at.desc(), model.id.desc()).limit(self.max_records).all()
+            records = [r for r in records if str(r.id) not in entry.ids]
+            self.incremental += 1
+            self.decrypted_records += len(records)
+            return self._prepend(patient_id, entry, records, [_decrypted_line(r) for r in records])
+
+        records = (
+            db.query(model)
+            .filter(model.user_id == patient_id)
+            .order_by(model.created_at.desc(), model.id.desc())
+            .limit(self.max_records)
+            .all()
+        )
+        lines = [_decrypted_line(r) for r in records]
+        self.rebuilds += 1
+        self.decrypted_records += len(records)
+        if records:
+            self._store(patient_id, (records[0].created_at, str(records[0].id)), lines, [str(r.id) for r in records])
+        return lines
+
+    def record_added(self, patient_id: str, record, diagnosis: str, notes: str, prescription: str = ''):
+        """Fold a just-committed record into a cached digest using its plaintext.
+
+        Without a cached digest this is a no-op; the next read builds one.
+        """
+        entry = self._get(patient_id)
+        if entry is None:
+            return
+        if not _newer((record.created_at, str(record.id)), entry.version):
+            # out-of-order write: let the next read rebuild
+            self.invalidate(patient_id)
+            return
+        self._prepend(patient_id, entry, [record], [record_line(record, diagnosis, prescription, notes)])
+
+    def stats(self) -> dict:
+        return {
+            "patients": len(self._entries),
+            "hits": self.hits,
+            "incremental": self.incremental,
+            "rebuilds": self.rebuilds,
+            "decrypted_records": self.decrypted_records,
+        }
+
+
+cache = HistoryDigestCache(
+    max_patients=getattr(settings, "HISTORY_DIGEST_CACHE_SIZE", 1024),
+)
+
+
+def history_text(db: Session, patient_id: str) -> str:
+    lines = cache.lines(db, patient_id)
+    return "\n".join(lines) if lines else NO_HISTORY
@@ -0,0 +1,252 @@
+"""
+Live transcript ingestion with a rolling summary per call.
+
+Instead of POSTing the whole transcript when the call ends, the client streams
+segments to `WS /api/v1/tele/live/{session_id}` as they are transcribed:
+
+- Segments are kept in arrival order. A segment sent again with the same id
+  (a corrected transcription) replaces the earlier text in place.
+- Each segment is assigned to a window when it first arrives. A window closes
+  once it holds `TRANSCRIPT_CHUNK_CHARS`, and later segments go to a new
+  window, so window boundaries never move. Every window also carries the
+  previous window's last segment as overlap.
+- After `LIVE_TRANSCRIPT_DEBOUNCE_MS` without new segments, the closed windows
+  are summarized through `TranscriptJob`. The chunk-summary cache is keyed by
+  window text, so only windows whose segments changed are sent to the model
+  again. The result is pushed to the client as the rolling summary.
+- At the end of the call only the open window is still unsummarized, so the
+  SOAP note takes one chunk summary plus the reduce call, however long the
+  consultation ran. A call that never filled one window uses its raw
+  transcript, as `/generate-notes` does.
+
+A session belongs to the doctor who opened it and to one patient; the
+registry refuses the id to anyone else rather than rebinding it. Segment count
+and length are capped by `LIVE_TRANSCRIPT_MAX_SEGMENTS` and
+`LIVE_TRANSCRIPT_MAX_SEGMENT_CHARS`.
+
+Sessions live in process memory. They are dropped after
+`LIVE_TRANSCRIPT_IDLE_SECONDS` without activity, or the least recently used
+one is dropped beyond `LIVE_TRANSCRIPT_MAX_SESSIONS`.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.llm import get_provider
+from app.services.transcript_summary import TranscriptJob
+
+logger = logging.getLogger(__name__)
+
+Notify = Callable[[dict], Awaitable[None]]
+
+
+class SegmentRejected(ValueError):
+    """A segment over the per-session count or per-segment length cap."""
+
+
+class LiveSession:
+    def __init__(
+        self,
+        session_id: str,
+        patient_id: str,
+        window_chars: int = 8000,
+        debounce: float = 3.0,
+        owner_id: Optional[str] = None,
+        max_segments: int = 5000,
+        max_segment_chars: int = 4000,
+    ):
+        self.session_id = session_id
+        self.patient_id = patient_id
+        self.owner_id = owner_id
+        self.window_chars = window_chars
+        self.debounce = debounce
+        self.max_segments = max_segments
+        self.max_segment_chars = max_segment_chars
+        # segment id -> text, in arrival order
+        self.segments: Dict[str, str] = {}
+        self.window_of: Dict[str, int] = {}
+        # segment ids per window; the last window is the open one
+        self.windows: List[List[str]] = [[]]
+        self._open_chars = 0
+        self.version = 0
+        self.summary: Optional[str] = None
+        self.summarized_windows = 0
+        # pushes rolling summaries to the connected client, if any
+        self.notify: Optional[Notify] = None
+        self.touched = time.monotonic()
+        self._refresh: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def upsert(self, segment_id: str, text: str) -> bool:
+        """Add or replace a segment; False when the text is unchanged.
+
+        Raises SegmentRejected past the length cap, or for a new id once the
+        session holds `max_segments`.
+        """
+        self.touched = time.monotonic()
+        if len(text) > self.max_segment_chars:
+            raise SegmentRejected(f"segment longer than {self.max_segment_chars} characters")
+        if self.segments.get(segment_id) == text:
+            return False
+        if segment_id not in self.segments and len(self.segments) >= self.max_segments:
+            raise SegmentRejected(f"session already holds {self.max_segments} segments")
+        if segment_id not in self.segments:
+            if self.windows[-1] and self._open_chars + len(text) + 1 > self.window_chars:
+                self.windows.append([])
+                self._open_chars = 0
+            self.windows[-1].append(segment_id)
+            self.window_of[segment_id] = len(self.windows) - 1
+            self._open_chars += len(text) + 1
+        elif self.window_of[segment_id] == len(self.windows) - 1:
+            self._open_chars += len(text) - len(self.segments[segment_id])
+        self.segments[segment_id] = text
+        self.version += 1
+        return True
+
+    def transcript(self) -> str:
+        return "\n".join(self.segments.values())
+
+    def window_texts(self) -> List[str]:
+        texts = []
+        for n, ids in enumerate(self.windows):
+            lines = [self.segments[i] for i in ids]
+            if n:
+                lines.insert(0, self.segments[self.windows[n - 1][-1]])
+            texts.append("\n".join(lines))
+        return texts
+
+    def _job(self, texts: List[str]) -> TranscriptJob:
+        return TranscriptJob("", get_provider(), chunks=texts)
+
+    def schedule(self):
+        """Refresh the rolling summary once segments stop arriving for `debounce` seconds."""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while True:
+            version = self.version
+            await asyncio.sleep(self.debounce)
+            if self.version != version:
+                continue
+            closed = self.window_texts()[:-1]
+            if closed:
+                # its own task, so ending the call does not cancel summaries in flight
+                self._inflight = asyncio.ensure_future(self._summarize(closed))
+                await asyncio.shield(self._inflight)
+            if self.version == version:
+                return
+
+    async def _summarize(self, closed: List[str]):
+        job = self._job(closed)
+        try:
+            await job.run()
+        except Exception:
+            # retried on the next change or at the end of the call
+            logger.warning("rolling summary failed for live session (redacted)")
+            return
+        summary = job.reduce_input()
+        if summary == self.summary:
+            return
+        self.summary = summary
+        self.summarized_windows = len(closed)
+        if self.notify is not None:
+            try:
+                await self.notify({"type": "summary", "windows": len(closed), "summary": summary})
+            except Exception:
+                logger.debug("could not push rolling summary")
+
+    async def note_input(self) -> str:
+        """Transcript text for the final note prompt (chunk summaries once past one window)."""
+        if self._refresh is not None:
+            self._refresh.cancel()
+        if self._inflight is not None and not self._inflight.done():
+            # let the rolling summary finish: its chunk summaries are reused below
+            await self._inflight
+        texts = self.window_texts()
+        if len(texts) == 1:
+            return texts[0]
+        job = self._job(texts)
+        await job.run()
+        return job.reduce_input()
+
+    def close(self):
+        for task in (self._refresh, self._inflight):
+            if task is not None:
+                task.cancel()
+
+
+class LiveTranscripts:
+    """Registry of live sessions by id."""
+
+    def __init__(self, max_sessions: int = 256, idle_seconds: float = 3600):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, LiveSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str, patient_id: str, owner_id: str) -> Tuple[LiveSession, bool]:
+        """The session for `session_id`, created if needed; the flag is True when it is new.
+
+        A session is bound to the user who created it and to one patient.
+        Raises PermissionError when the id is held by another user or for
+        another patient; the existing session is left untouched.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                if session.owner_id != owner_id or session.patient_id != patient_id:
+                    raise PermissionError("live session belongs to another user or patient")
+                self._sessions.move_to_end(session_id)
+                session.touched = now
+                return session, False
+            session = LiveSession(
+                session_id,
+                patient_id,
+                window_chars=getattr(settings, "TRANSCRIPT_CHUNK_CHARS", 8000),
+                debounce=getattr(settings, "LIVE_TRANSCRIPT_DEBOUNCE_MS", 3000) / 1000,
+                owner_id=owner_id,
+                max_segments=getattr(settings, "LIVE_TRANSCRIPT_MAX_SEGMENTS", 5000),
+                max_segment_chars=getattr(settings, "LIVE_TRANSCRIPT_MAX_SEGMENT_CHARS", 4000),
+            )
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                evicted.close()
+            return session, True
+
+    def _expire(self, now: float):
+        for session_id in [sid for sid, s in self._sessions.items() if now - s.touched > self.idle_seconds]:
+            self._sessions.pop(session_id).close()
+
+    def drop(self, session_id: str):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+
+    def stats(self) -> dict:
+        sessions = list(self._sessions.values())
+        return {
+            "sessions": len(sessions),
+            "segments": sum(len(s) for s in sessions),
+            "windows": sum(len(s.windows) for s in sessions),
+        }
+
+
+sessions = LiveTranscripts(
+    max_sessions=getattr(settings, "LIVE_TRANSCRIPT_MAX_SESSIONS", 256),
+    idle_seconds=getattr(settings, "LIVE_TRANSCRIPT_IDLE_SECONDS", 3600),
+)
@@ -0,0 +1,336 @@
+"""
+LLM providers behind the chatbot and the tele scribe.
+
+`ChatbotService` and `/api/v1/tele/generate-notes` call `get_provider()`
+instead of Gemini directly. Every provider gets the same guard rails from
+`LLMProvider.complete`: a semaphore capping in-flight calls (503 once a caller
+has waited `queue_timeout` seconds for a slot), a per-call timeout (504), and
+call/latency metrics. `LLMProvider.stream` yields the text as the model
+produces it under the same slot, with `timeout` applied to the wait for each
+chunk instead of to the whole call.
+
+- `GeminiProvider` (LLM_PROVIDER=gemini, the default): one long-lived
+  google-genai client called through its async API, only in enterprise/BAA
+  mode.
+- `LocalProvider` (LLM_PROVIDER=local): no network and no PHI leaves the
+  process. Output is a pure function of the prompt (SOAP-note JSON for scribe
+  prompts), and latency follows a configurable profile
+  (base + per-1000-prompt-chars + deterministic jitter), so the scribe path can
+  be load-tested offline with repeatable results.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, NamedTuple, Optional
+
+from fastapi import HTTPException
+from google import genai
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Completion(NamedTuple):
+    text: str
+    # provider-reported confidence, if any
+    score: Optional[float] = None
+
+
+class LatencyStats:
+    """Call counters plus latency percentiles over the most recent calls."""
+
+    def __init__(self, window: int = 512):
+        self.samples = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 1) if ordered else None
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "max": pct(1.0), "window": len(ordered)},
+        }
+
+
+class LLMProvider:
+    """Base class: subclasses implement `_complete`; callers use `complete`."""
+
+    name = "base"
+
+    def __init__(self, model: str, max_concurrency: int = 8, timeout: float = 30, queue_timeout: float = 10):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.stats = LatencyStats()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _complete(self, prompt: str) -> Completion:
+        raise NotImplementedError
+
+    async def _stream(self, prompt: str) -> AsyncIterator[str]:
+        # Providers without a streaming API deliver the whole text as one chunk
+        yield (await self._complete(prompt)).text
+
+    def check_ready(self):
+        """Raise an HTTPException when the provider must not be called at all."""
+
+    async def _acquire(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats.rejected += 1
+            raise HTTPException(status_code=503, detail="AI service busy, try again shortly")
+        self.stats.calls += 1
+        self.stats.in_flight += 1
+
+    def _release(self, started: float):
+        self.stats.in_flight -= 1
+        self.stats.record(time.perf_counter() - started)
+        self._semaphore.release()
+
+    async def complete(self, prompt: str) -> Completion:
+        self.check_ready()
+        await self._acquire()
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(self._complete(prompt), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            raise HTTPException(status_code=504, detail="AI service timed out")
+        except Exception:
+            self.stats.errors += 1
+            raise
+        finally:
+            self._release(started)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the response text in chunks as the model produces them.
+
+        The concurrency slot is held until the generator finishes or is
+        closed; 504 is raised when no chunk arrives within `timeout` seconds.
+        """
+        self.check_ready()
+        await self._acquire()
+        started = time.perf_counter()
+        chunks = self._stream(prompt).__aiter__()
+        try:
+            while True:
+                try:
+                    text = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    break
+                if text:
+                    yield text
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            raise HTTPException(status_code=504, detail="AI service timed out")
+        except Exception:
+            self.stats.errors += 1
+            raise
+        finally:
+            await chunks.aclose()
+            self._release(started)
+
+    def metrics(self) -> dict:
+        return {
+            "provider": self.name,
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout,
+            **self.stats.snapshot(),
+        }
+
+
+def _enabled(name: str) -> bool:
+    return os.getenv(name, "false").lower() in ("1", "true", "yes")
+
+
+def _normalize(response):
+    """Extract (text, score) from the response shapes different SDK versions return."""
+    text = None
+    score = None
+    try:
+        if hasattr(response, 'candidates') and response.candidates:
+            cand = response.candidates[0]
+            text = getattr(cand, 'content', None) or getattr(cand, 'text', None)
+            score = getattr(cand, 'confidence', None) or getattr(cand, 'score', None)
+        elif isinstance(response, dict):
+            if response.get('candidates'):
+                cand = response['candidates'][0]
+                text = cand.get('content') or cand.get('text')
+                score = cand.get('confidence') or cand.get('score')
+            else:
+                text = response.get('text') or response.get('output') or str(response)
+                score = response.get('confidence') or response.get('score')
+        else:
+            text = getattr(response, 'text', str(response))
+    except Exception:
+        text = str(response)
+    return text, score
+
+
+class GeminiProvider(LLMProvider):
+    """Gemini through one shared client, called with the SDK's async API so the
+    event loop (and every signaling WebSocket) keeps running meanwhile."""
+
+    name = "gemini"
+
+    def __init__(self, model: Optional[str] = None, **limits):
+        super().__init__(model or os.getenv("GEMINI_MODEL", "models/gemini-2.0"), **limits)
+        self._client = None
+        self._api_key = None
+
+    def client(self, api_key: str):
+        # Built once; rebuilt only if the configured key changes
+        if self._client is None or api_key != self._api_key:
+            self._client = genai.Client(api_key=api_key)
+            self._api_key = api_key
+        return self._client
+
+    def check_ready(self):
+        # Safety guard: ensure enterprise/BAA-enabled mode before sending any PHI to external models.
+        # Operators MUST set GEMINI_ENTERPRISE=true and GEMINI_BAA_SIGNED=true when using Google Vertex/Enterprise.
+        if not (_enabled("GEMINI_ENTERPRISE") and _enabled("GEMINI_BAA_SIGNED")):
+            logger.warning("External AI is disabled: enterprise BAA mode not enabled. Request blocked.")
+            raise HTTPException(status_code=503, detail="AI service disabled for PHI protection")
+        if not os.getenv("GEMINI_API_KEY"):
+            logger.error("GEMINI_API_KEY is missing.")
+            raise HTTPException(status_code=500, detail="Configuration Error: API Key Missing")
+
+    async def _complete(self, prompt: str) -> Completion:
+        client = self.client(os.getenv("GEMINI_API_KEY"))
+        # Avoid logging user-provided content (may contain PHI). Log only redacted indicator.
+        logger.info("Sending request to Gemini Enterprise (message redacted)")
+        aio = getattr(client, "aio", None)
+        if aio is not None:
+            response = await aio.models.generate_content(model=self.model, contents=prompt)
+        else:
+            # older SDKs: run the blocking call on a worker thread
+            response = await asyncio.to_thread(client.models.generate_content, model=self.model, contents=prompt)
+        text, score = _normalize(response)
+        return Completion(text, float(score) if score is not None else None)
+
+    async def _stream(self, prompt: str) -> AsyncIterator[str]:
+        client = self.client(os.getenv("GEMINI_API_KEY"))
+        aio = getattr(client, "aio", None)
+        if aio is None or not hasattr(aio.models, "generate_content_stream"):
+            yield (await self._complete(prompt)).text
+            return
+        logger.info("Streaming request to Gemini Enterprise (message redacted)")
+        async for chunk in await aio.models.generate_content_stream(model=self.model, contents=prompt):
+            text = getattr(chunk, "text", None)
+            if text:
+                yield text
+
+
+class LocalProvider(LLMProvider):
+    """Deterministic offline model for development and benchmarks.
+
+    Latency per call is `base_ms + per_kchar_ms * len(prompt) / 1000` plus up
+    to `jitter_ms` derived from the prompt hash, so the same prompt always
+    takes the same time and returns the same text. When streamed, the first
+    chunk arrives after half of that latency and the rest is spread over the
+    remaining chunks.
+    """
+
+    chunk_chars = 24
+
+    name = "local"
+
+    def __init__(self, base_ms: float = 800, per_kchar_ms: float = 20, jitter_ms: float = 200, **limits):
+        super().__init__("local-deterministic", **limits)
+        self.base_ms = base_ms
+        self.per_kchar_ms = per_kchar_ms
+        self.jitter_ms = jitter_ms
+
+    def latency(self, prompt: str) -> float:
+        """Simulated latency in seconds for `prompt`."""
+        digest = hashlib.sha256(prompt.encode()).digest()
+        jitter = int.from_bytes(digest[:4], "big") / 0xFFFFFFFF * self.jitter_ms
+        return (self.base_ms + self.per_kchar_ms * len(prompt) / 1000 + jitter) / 1000
+
+    def render(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        if "SOAP" not in prompt:
+            return f"Local model response {digest}."
+        transcript = prompt.rsplit("Transcript:", 1)[-1].split("\n\nProvide the SOAP Note", 1)[0].strip()
+        lines = [line.strip() for line in transcript.splitlines() if line.strip()]
+        return json.dumps({
+            "safety_alert": None,
+            "subjective": " ".join(lines[:2])[:400] or "No subjective findings reported.",
+            "objective": f"{len(lines)} transcript lines reviewed ({len(transcript)} characters).",
+            "assessment": f"Deterministic local assessment {digest}.",
+            "plan": "Follow up as clinically indicated.",
+        })
+
+    async def _complete(self, prompt: str) -> Completion:
+        await asyncio.sleep(self.latency(prompt))
+        return Completion(self.render(prompt), 0.9)
+
+    async def _stream(self, prompt: str) -> AsyncIterator[str]:
+        text = self.render(prompt)
+        pieces = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+        latency = self.latency(prompt)
+        await asyncio.sleep(latency / 2)
+        for n, piece in enumerate(pieces):
+            if n:
+                await asyncio.sleep(latency / 2 / (len(pieces) - 1))
+            yield piece
+
+
+_provider: Optional[LLMProvider] = None
+
+
+def _limits() -> dict:
+    return {
+        "max_concurrency": getattr(settings, "LLM_MAX_CONCURRENCY", 8),
+        "timeout": getattr(settings, "LLM_TIMEOUT_SECONDS", 30),
+        "queue_timeout": getattr(settings, "LLM_QUEUE_TIMEOUT_SECONDS", 10),
+    }
+
+
+def build_provider(name: Optional[str] = None) -> LLMProvider:
+    name = (name or getattr(settings, "LLM_PROVIDER", "gemini")).lower()
+    if name == "local":
+        return LocalProvider(
+            base_ms=getattr(settings, "LLM_LOCAL_BASE_MS", 800),
+            per_kchar_ms=getattr(settings, "LLM_LOCAL_PER_KCHAR_MS", 20),
+            jitter_ms=getattr(settings, "LLM_LOCAL_JITTER_MS", 200),
+            **_limits(),
+        )
+    if name != "gemini":
+        raise ValueError(f"Unknown LLM_PROVIDER {name!r} (expected 'gemini' or 'local')")
+    return GeminiProvider(**_limits())
+
+
+def get_provider() -> LLMProvider:
+    global _provider
+    if _provider is None:
+        _provider = build_provider()
+    return _provider
+
+
+def set_provider(provider: Optional[LLMProvider]):
+    """Swap the process-wide provider (None rebuilds it from settings on next use)."""
+    global _provider
+    _provider = provider
@@ -0,0 +1,145 @@
+"""
+Local medication-conflict check for note generation.
+
+The SOAP-note prompt asks the model to spot medication conflicts, but that is
+slow, non-deterministic and unavailable when the model is disabled or times
+out. Known conflicts are now found locally, before the model is called:
+
+- `app/data/drug_interactions.json` (or `MED_INTERACTIONS_PATH`) lists the
+  drugs with their brand names and synonyms, drug classes, and interactions
+  between drugs or classes. At load time, class rules are expanded into a
+  pairwise index keyed by the unordered pair of canonical drug names.
+- An Aho-Corasick automaton over every name and synonym finds medication
+  mentions in the transcript and the decrypted history in one pass each.
+- A conflict is reported for each indexed pair where at least one drug is
+  mentioned in the transcript, and the other in the transcript or the
+  history. The history is the same for every note of a consult, so its
+  mentions are memoized, keyed by a SHA-256 of the text rather than the
+  text itself.
+
+Mentions are matched as written; negation ("stopped warfarin") is not
+understood, so results are flags for the clinician to review.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import combinations, product
+from typing import Dict, FrozenSet, List, Optional, Set
+
+from app.core.config import settings
+from app.utils.aho_corasick import AhoCorasick
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "drug_interactions.json")
+
+SEVERITY_RANK = {"contraindicated": 0, "major": 1, "moderate": 2, "minor": 3}
+
+
+class InteractionIndex:
+    def __init__(self, data: dict, memo_size: int = 1024):
+        self.version = data.get("version")
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[bytes, FrozenSet[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        drugs: Dict[str, List[str]] = data["drugs"]
+        classes: Dict[str, List[str]] = data.get("classes", {})
+        for name, members in classes.items():
+            unknown = set(members) - set(drugs)
+            if unknown:
+                raise ValueError(f"class {name!r} lists unknown drugs: {sorted(unknown)}")
+
+        def expand(ref: str) -> List[str]:
+            if ref.startswith("@"):
+                return classes[ref[1:]]
+            if ref not in drugs:
+                raise ValueError(f"interaction references unknown drug {ref!r}")
+            return [ref]
+
+        self.pairs: Dict[FrozenSet[str], dict] = {}
+        for rule in data["interactions"]:
+            for a, b in product(expand(rule["a"]), expand(rule["b"])):
+                if a == b:
+                    continue
+                pair = frozenset((a, b))
+                current = self.pairs.get(pair)
+                # overlapping rules: keep the most severe
+                if current is None or SEVERITY_RANK[rule["severity"]] < SEVERITY_RANK[current["severity"]]:
+                    self.pairs[pair] = {"severity": rule["severity"], "description": rule["description"]}
+
+        self.matcher: AhoCorasick[str] = AhoCorasick(
+            (pattern, name) for name, synonyms in drugs.items() for pattern in [name, *synonyms]
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "InteractionIndex":
+        with open(path, encoding="utf-8") as fh:
+            return cls(json.load(fh))
+
+    def mentions(self, text: str) -> Set[str]:
+        """Canonical names of the drugs mentioned in `text`."""
+        return {name for _, _, name in self.matcher.iter(text)} if text else set()
+
+    def history_mentions(self, history: str) -> FrozenSet[str]:
+        key = hashlib.sha256(history.encode()).digest()
+        with self._lock:
+            found = self._memo.get(key)
+            if found is not None:
+                self._memo.move_to_end(key)
+                return found
+        found = frozenset(self.mentions(history))
+        with self._lock:
+            self._memo[key] = found
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return found
+
+    def check(self, transcript: str, history: str = "") -> List[dict]:
+        """Indexed interactions involving at least one drug from the transcript, most severe first."""
+        new = self.mentions(transcript)
+        if not new:
+            return []
+        known = self.history_mentions(history) - new
+        conflicts = []
+        candidates = list(combinations(sorted(new), 2)) + list(product(sorted(new), sorted(known)))
+        for a, b in candidates:
+            interaction = self.pairs.get(frozenset((a, b)))
+            if interaction is None:
+                continue
+            conflicts.append({
+                "drugs": [a, b],
+                "severity": interaction["severity"],
+                "description": interaction["description"],
+                "found_in": {a: "transcript", b: "transcript" if b in new else "history"},
+            })
+        conflicts.sort(key=lambda c: (SEVERITY_RANK[c["severity"]], c["drugs"]))
+        return conflicts
+
+
+@lru_cache(maxsize=1)
+def get_index() -> InteractionIndex:
+    return InteractionIndex.load(getattr(settings, "MED_INTERACTIONS_PATH", None) or DEFAULT_PATH)
+
+
+def check(transcript: str, history: str = "") -> List[dict]:
+    """Conflicts from the bundled index; an unreadable data file yields none rather than an error."""
+    try:
+        index = get_index()
+    except Exception:
+        logger.exception("medication interaction data could not be loaded")
+        return []
+    return index.check(transcript, history)
+
+
+def prompt_lines(conflicts: List[dict]) -> Optional[str]:
+    """The conflicts as prompt text for the model to cite, or None."""
+    if not conflicts:
+        return None
+    return "\n".join(
+        f"- {c['drugs'][0]} + {c['drugs'][1]} ({c['severity']}; {c['drugs'][1]} from {c['found_in'][c['drugs'][1]]}): {c['description']}"
+        for c in conflicts
+    )
@@ -0,0 +1,217 @@
+"""
+Content-addressed cache for AI note generation.
+
+Retries, double-clicks and re-opened consults send the same transcript and
+history to the model again. Note prompts now go through `cache`:
+
+- The key is a SHA-256 of the provider, the model id and the normalized
+  prompt (Unicode NFC, line endings unified, runs of spaces and blank lines
+  collapsed), so whitespace-only differences still hit.
+- Entries are LRU-bounded (`AI_CACHE_MAX_ENTRIES`) and expire
+  `AI_CACHE_TTL_SECONDS` after they are stored. Values are sealed with a
+  Fernet key generated per process, as in `history_digest`.
+- Single flight: while a prompt is in flight, identical requests wait for
+  that call instead of starting their own. They share its result, or its
+  error. A waiting stream receives the finished text as one chunk. If the
+  leading request is abandoned (its client went away), a waiter makes the
+  call itself.
+
+Streams carry text only, so an entry filled by a stream has no provider
+score. Such entries serve later streams but are misses for `complete`, and
+`complete` callers that waited on a streaming call make their own; the
+scored result then replaces the text-only entry.
+
+Only successful responses are cached. The provider's `check_ready` guard
+(such as the Gemini BAA check) still runs before a cached value is returned.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from cryptography.fernet import Fernet
+
+from app.core.config import settings
+from app.services.llm import Completion, LLMProvider
+
+_SPACES = re.compile(r"[ \t\f\v]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def normalize_prompt(prompt: str) -> str:
+    text = unicodedata.normalize("NFC", prompt).replace("\r\n", "\n").replace("\r", "\n")
+    text = "\n".join(_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+class _Abandoned(Exception):
+    """The leading call was cancelled; waiters should make their own."""
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 900):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._fernet = Fernet(Fernet.generate_key())
+        # key -> (expires at, sealed completion)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._flights: Dict[str, asyncio.Future] = {}
+        # flights led by `stream`: their result has no score
+        self._text_only: Set[asyncio.Future] = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(provider: LLMProvider, prompt: str) -> str:
+        material = f"{provider.name}\0{provider.model}\0{normalize_prompt(prompt)}"
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def get(self, key: str, scored: bool = False) -> Optional[Completion]:
+        """The cached completion; with `scored`, entries filled by a stream count as misses."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, sealed = entry
+            if expires <= now:
+                del self._entries[key]
+                self.expired += 1
+                return None
+            self._entries.move_to_end(key)
+        text, score, text_only = json.loads(self._fernet.decrypt(sealed))
+        if scored and text_only:
+            return None
+        return Completion(text, score)
+
+    def put(self, key: str, completion: Completion, text_only: bool = False):
+        sealed = self._fernet.encrypt(json.dumps([completion.text, completion.score, text_only]).encode())
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, sealed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _lead(self, key: str, text_only: bool = False) -> asyncio.Future:
+        flight = asyncio.get_running_loop().create_future()
+        # a failure nobody waited for must not be logged as "never retrieved"
+        flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._flights[key] = flight
+        if text_only:
+            self._text_only.add(flight)
+        return flight
+
+    def _land(self, key: str, flight: asyncio.Future, result=None, error: Optional[BaseException] = None):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        text_only = flight in self._text_only
+        self._text_only.discard(flight)
+        if flight.done():
+            return
+        if error is None:
+            self.put(key, result, text_only)
+            flight.set_result(result)
+        elif isinstance(error, Exception):
+            flight.set_exception(error)
+        else:
+            # cancelled or closed: let the waiters retry on their own
+            flight.set_exception(_Abandoned())
+
+    async def complete(self, provider: LLMProvider, prompt: str) -> Completion:
+        provider.check_ready()
+        key = self.key(provider, prompt)
+        while True:
+            hit = self.get(key, scored=True)
+            if hit is not None:
+                self.hits += 1
+                return hit
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            # a streaming leader's result has no score: wait for it, then call
+            text_only = flight in self._text_only
+            if not text_only:
+                self.shared += 1
+            try:
+                result = await asyncio.shield(flight)
+            except _Abandoned:
+                continue
+            if text_only:
+                continue
+            return result
+        self.misses += 1
+        flight = self._lead(key)
+        try:
+            result = await provider.complete(prompt)
+        except BaseException as exc:
+            self._land(key, flight, error=exc)
+            raise
+        self._land(key, flight, result)
+        return result
+
+    async def stream(self, provider: LLMProvider, prompt: str) -> AsyncIterator[str]:
+        """`provider.stream` through the cache: a hit or a shared call arrives as one chunk."""
+        provider.check_ready()
+        key = self.key(provider, prompt)
+        while True:
+            hit = self.get(key)
+            if hit is not None:
+                self.hits += 1
+                yield hit.text
+                return
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            self.shared += 1
+            try:
+                completion = await asyncio.shield(flight)
+            except _Abandoned:
+                continue
+            yield completion.text
+            return
+        self.misses += 1
+        flight = self._lead(key, text_only=True)
+        chunks = provider.stream(prompt)
+        parts = []
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        except BaseException as exc:
+            self._land(key, flight, error=exc)
+            raise
+        finally:
+            await chunks.aclose()
+        self._land(key, flight, Completion("".join(parts)))
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._flights),
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "expired": self.expired,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+cache = ResponseCache(
+    max_entries=getattr(settings, "AI_CACHE_MAX_ENTRIES", 512),
+    ttl_seconds=getattr(settings, "AI_CACHE_TTL_SECONDS", 900),
+)
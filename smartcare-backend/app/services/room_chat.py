@@ -0,0 +1,238 @@
+"""
+Persistent in-call chat.
+
+`chat` frames relayed by the signaling server used to be lost once delivered.
+They are now appended to `room_chat_messages`:
+
+- The relay path only calls `RoomChatLog.append`, which stamps the frame with
+  a sequence number and puts the row in an in-memory buffer. A background task
+  inserts the buffer in batches (every `flush_interval` seconds, or sooner
+  once `batch_size` rows are waiting) from a worker thread, so the event loop
+  never waits on the database.
+- Sequence numbers are microsecond timestamps made strictly increasing per
+  instance: ordered across instances up to clock skew, and assigned without a
+  round trip to the database or Redis.
+- Clients that reconnect send `chat_sync` with the highest `seq` they saw and
+  get only newer messages back (`replay`), including rows still buffered here.
+- `history_page` / `since_page` back the paginated REST endpoint, which is
+  open only to the doctor and patient of the appointment the room belongs to
+  (`is_participant`).
+- Frames are chat content (PHI), so they are stored encrypted with
+  `encrypt_data`, on the writer thread, and decrypted when read back.
+
+If the database is unavailable the buffer is kept (up to `max_buffer` rows,
+oldest dropped first) and retried on the next flush.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from app.core.encryption import decrypt_data, encrypt_data
+from app.models.appointment import Appointment
+from app.models.room_chat import RoomChatMessage
+
+logger = logging.getLogger(__name__)
+
+_messages = RoomChatMessage.__table__
+_appointments = Appointment.__table__
+
+DECRYPTION_ERROR = "[decryption-error]"
+
+
+def chat_history_frame(frames: List[str], more: bool) -> str:
+    """Replay frame embedding the original chat frames verbatim."""
+    return '{"type": "chat_history", "more": ' + ("true" if more else "false") + ', "messages": [' + ",".join(frames) + "]}"
+
+
+def is_participant(db: Session, room_id: str, user_id: str) -> bool:
+    """Whether the user is the doctor or the patient of the appointment `room_id` names."""
+    query = sa.select(_appointments.c.id).where(
+        _appointments.c.id == room_id,
+        sa.or_(_appointments.c.doctor_id == user_id, _appointments.c.patient_id == user_id),
+    )
+    return db.execute(query).first() is not None
+
+
+def stored_frame(row) -> Optional[str]:
+    """The plaintext frame of a stored row, or None if it cannot be decrypted."""
+    frame = decrypt_data(row.frame)
+    return None if frame == DECRYPTION_ERROR else frame
+
+
+def message_row(row) -> dict:
+    try:
+        message = json.loads(stored_frame(row) or "")
+    except ValueError:
+        message = None
+    return {
+        "seq": row.seq,
+        "sender": row.sender,
+        "message": message,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+def history_page(db: Session, room_id: str, before: Optional[Tuple[int, int]] = None, limit: int = 50):
+    """Newest-first page of a room's chat; `before` is the (seq, id) of the last row seen."""
+    query = sa.select(_messages).where(_messages.c.room_id == room_id)
+    if before is not None:
+        seq, row_id = before
+        query = query.where(sa.or_(_messages.c.seq < seq, sa.and_(_messages.c.seq == seq, _messages.c.id < row_id)))
+    query = query.order_by(_messages.c.seq.desc(), _messages.c.id.desc()).limit(limit + 1)
+    rows = db.execute(query).all()
+    return rows[:limit], len(rows) > limit
+
+
+def since_page(db: Session, room_id: str, since: int, after_id: Optional[int] = None, limit: int = 50):
+    """Oldest-first page of messages newer than `since` (or than (since, after_id))."""
+    query = sa.select(_messages).where(_messages.c.room_id == room_id)
+    if after_id is None:
+        query = query.where(_messages.c.seq > since)
+    else:
+        query = query.where(sa.or_(_messages.c.seq > since, sa.and_(_messages.c.seq == since, _messages.c.id > after_id)))
+    query = query.order_by(_messages.c.seq.asc(), _messages.c.id.asc()).limit(limit + 1)
+    rows = db.execute(query).all()
+    return rows[:limit], len(rows) > limit
+
+
+class RoomChatLog:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = 200,
+        flush_interval: float = 0.25,
+        max_buffer: int = 10000,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.buffer: Deque[dict] = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._last_seq = 0
+        self.appended = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failures = 0
+
+    def next_seq(self) -> int:
+        seq = time.time_ns() // 1000
+        if seq <= self._last_seq:
+            seq = self._last_seq + 1
+        self._last_seq = seq
+        return seq
+
+    def append(self, room_id: str, seq: int, sender: str, frame: str):
+        """Buffer one chat frame for insertion; never blocks."""
+        if len(self.buffer) >= self.max_buffer:
+            self.buffer.popleft()
+            self.dropped += 1
+        self.buffer.append({
+            "room_id": room_id,
+            "seq": seq,
+            "sender": sender,
+            "frame": frame,
+            "created_at": datetime.now(timezone.utc),
+        })
+        self.appended += 1
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if len(self.buffer) >= self.batch_size:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Insert everything buffered so far (stops at the first failed batch)."""
+        if self._lock is None:
+            return
+        async with self._lock:
+            while self.buffer:
+                batch = [self.buffer[i] for i in range(min(len(self.buffer), self.batch_size))]
+                try:
+                    await asyncio.to_thread(self._insert, batch)
+                except Exception:
+                    self.failures += 1
+                    logger.exception("could not persist %d chat messages; will retry", len(batch))
+                    return
+                self.written += len(batch)
+                self.batches += 1
+                written = {id(row) for row in batch}
+                # rows may have been dropped from the front while the insert ran
+                while self.buffer and id(self.buffer[0]) in written:
+                    self.buffer.popleft()
+
+    def _insert(self, rows: List[dict]):
+        # the buffer keeps plaintext for replay; only the table copy is encrypted
+        sealed = [{**row, "frame": encrypt_data(row["frame"])} for row in rows]
+        db = self.session_factory()
+        try:
+            db.execute(sa.insert(_messages), sealed)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _since(self, room_id: str, since: int, limit: int):
+        db = self.session_factory()
+        try:
+            return since_page(db, room_id, since, limit=limit)
+        finally:
+            db.close()
+
+    async def replay(self, room_id: str, since: int, limit: int = 200) -> Tuple[List[str], bool]:
+        """Frames newer than `since`, oldest first, from the table and this instance's buffer."""
+        buffered = [row for row in self.buffer if row["room_id"] == room_id and row["seq"] > since]
+        try:
+            rows, more = await asyncio.to_thread(self._since, room_id, since, limit)
+        except Exception:
+            logger.exception("could not load chat history for room %s", room_id)
+            rows, more = [], False
+        seen = {(row.seq, row.sender) for row in rows}
+        merged = [(row.seq, frame) for row in rows if (frame := stored_frame(row)) is not None]
+        if not more:
+            # the buffer only continues the table when the table page was complete
+            merged += [(row["seq"], row["frame"]) for row in buffered if (row["seq"], row["sender"]) not in seen]
+        merged.sort(key=lambda item: item[0])
+        return [frame for _, frame in merged[:limit]], more or len(merged) > limit
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self.buffer),
+            "appended": self.appended,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failures": self.failures,
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,197 @@
+"""
+Streaming SOAP-note generation over Server-Sent Events.
+
+`POST /api/v1/tele/generate-notes/stream` forwards the model's text as it is
+produced instead of waiting for the whole note:
+
+- every chunk goes out as a `token` event;
+- `SoapSectionParser` scans the growing JSON object and, as soon as a
+  top-level member is complete, the section goes out as a `section` event
+  (`subjective`, `objective`, `assessment`, `plan`);
+- a non-null `safety_alert` is always sent before any section. The prompt asks
+  for it as the first key; if the model puts it later, completed sections are
+  held back until it has been seen (or the stream ends);
+- `done` carries the full note, parsed the same way as the non-streaming
+  endpoint; `error` reports a failure after the stream has started.
+
+The endpoint sends the local medication-conflict check (`med_conflicts`)
+as a `conflicts` event before anything from the model.
+
+Long transcripts are first summarized chunk by chunk (see
+`transcript_summary`); `sse_map_reduce` reports that phase as `progress`
+events before the note itself streams.
+"""
+import json
+import logging
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from app.services import response_cache
+from app.services.chatbot import DISCLAIMER
+from app.services.transcript_summary import TranscriptJob
+
+logger = logging.getLogger(__name__)
+
+ALERT = "safety_alert"
+
+Event = Tuple[str, dict]
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class SoapSectionParser:
+    """Incremental scanner for one top-level JSON object.
+
+    Text before the first '{' (such as a markdown fence) and after the closing
+    '}' is ignored. `feed` returns the (key, value) members completed by the
+    new text; each member is decoded once, when its terminating ',' or '}'
+    arrives.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start: Optional[int] = None
+        self.started = False
+        self.complete = False
+
+    def feed(self, text: str) -> List[Tuple[str, object]]:
+        members = []
+        if self.complete:
+            return members
+        self.buffer += text
+        buf = self.buffer
+        while self._pos < len(buf):
+            i, ch = self._pos, buf[self._pos]
+            self._pos += 1
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self._depth = 1
+                    self._member_start = self._pos
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end_member(i, members)
+                    self.complete = True
+                    break
+            elif ch == "," and self._depth == 1:
+                self._end_member(i, members)
+                self._member_start = self._pos
+        return members
+
+    def _end_member(self, end: int, members: list):
+        member = self.buffer[self._member_start:end].strip()
+        if not member:
+            return
+        try:
+            members.extend(json.loads("{" + member + "}").items())
+        except ValueError:
+            # malformed member: the final parse in `SoapNoteStream.finish` decides
+            logger.debug("Skipping unparseable SOAP member")
+
+
+class SoapNoteStream:
+    """Turns model text chunks into ordered SSE events."""
+
+    def __init__(self):
+        self.parser = SoapSectionParser()
+        self.text = ""
+        self.note: dict = {}
+        self._alert_seen = False
+        self._held: List[Event] = []
+
+    def feed(self, chunk: str) -> List[Event]:
+        self.text += chunk
+        events: List[Event] = [("token", {"text": chunk})]
+        for key, value in self.parser.feed(chunk):
+            self.note[key] = value
+            if key == ALERT:
+                self._alert_seen = True
+                if value:
+                    events.append((ALERT, {"value": value}))
+                events.extend(self._held)
+                self._held = []
+            else:
+                section = ("section", {"name": key, "value": value})
+                (events if self._alert_seen else self._held).append(section)
+        return events
+
+    def finish(self) -> List[Event]:
+        events = self._held
+        self._held = []
+        if self.parser.complete:
+            notes = self.note
+        else:
+            # Not a complete JSON object: same fallback as /generate-notes
+            try:
+                notes = json.loads(self.text.replace("```json", "").replace("```", "").strip())
+            except ValueError:
+                notes = {"text": self.text}
+        events.append(("done", {"notes": notes, "disclaimer": DISCLAIMER}))
+        return events
+
+
+def _error(exc: Exception) -> str:
+    if isinstance(exc, HTTPException):
+        return sse("error", {"detail": exc.detail, "status_code": exc.status_code})
+    # Avoid logging exception details that may include PHI
+    logger.error("SOAP note stream failed (redacted)")
+    return sse("error", {"detail": "AI service error", "status_code": 500})
+
+
+async def sse_events(chunks: AsyncIterator[str], first: str = "", prelude: Sequence[Event] = ()) -> AsyncIterator[str]:
+    """Render `prelude`, then the provider's chunks (with an already-received `first`) as SSE."""
+    note = SoapNoteStream()
+    try:
+        for event in prelude:
+            yield sse(*event)
+        if first:
+            for event in note.feed(first):
+                yield sse(*event)
+        async for chunk in chunks:
+            for event in note.feed(chunk):
+                yield sse(*event)
+        for event in note.finish():
+            yield sse(*event)
+    except Exception as exc:
+        yield _error(exc)
+    finally:
+        await chunks.aclose()
+
+
+async def sse_map_reduce(job: TranscriptJob, prompt: Callable[[str], str], prelude: Sequence[Event] = ()) -> AsyncIterator[str]:
+    """Summarize a long transcript with progress events, then stream the note.
+
+    `prompt` builds the note prompt from the ordered chunk summaries.
+    """
+    for event in prelude:
+        yield sse(*event)
+    try:
+        async for progress in job.progress():
+            yield sse("progress", progress)
+    except Exception as exc:
+        yield _error(exc)
+        return
+    yield sse("progress", {"stage": "reduce"})
+    async for event in sse_events(response_cache.cache.stream(job.provider, prompt(job.reduce_input()))):
+        yield event
@@ -0,0 +1,207 @@
+"""
+Map-reduce summarization of long consultation transcripts.
+
+An hour-long transcript no longer goes into the SOAP-note prompt whole:
+
+- map: `chunk_transcript` splits it on line boundaries into chunks of at most
+  `TRANSCRIPT_CHUNK_CHARS`, each repeating the last
+  `TRANSCRIPT_CHUNK_OVERLAP_CHARS` of the previous one so nothing said across
+  a boundary is lost. Chunks are summarized in parallel, at most
+  `TRANSCRIPT_MAP_CONCURRENCY` at a time per transcript (on top of the
+  provider's own cap).
+- reduce: the ordered chunk summaries replace the transcript in the usual
+  note prompt, which still cross-references the patient's history.
+
+Each finished chunk summary is cached under a hash of the model and the chunk
+text, so when one chunk fails (timeout, busy model) the request fails, and a
+retry only summarizes the chunks that are missing. Cached summaries are sealed
+with a per-process Fernet key, as in `history_digest`.
+"""
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, List, Optional, Tuple
+
+from cryptography.fernet import Fernet
+
+from app.core.config import settings
+from app.services.llm import LLMProvider
+
+MAP_PROMPT = (
+    "You are a careful medical scribe. Summarize this excerpt of a doctor-patient consultation transcript. "
+    "Keep every symptom, finding, vital sign, medication (with dose), allergy, decision and follow-up item that is mentioned, "
+    "and who said it. Do not add anything that is not in the excerpt. The excerpt may start or end mid-conversation.\n\n"
+    "Excerpt:\n{chunk}\n\nProvide the summary as concise plain-text bullet points."
+)
+
+
+def chunk_transcript(text: str, max_chars: int, overlap_chars: int = 0) -> List[str]:
+    """Split `text` into line-aligned chunks of at most `max_chars`.
+
+    Each chunk after the first starts with the trailing lines of the previous
+    one, up to `overlap_chars`. Lines longer than `max_chars` are hard-split.
+    """
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        while len(line) > max_chars:
+            lines.append(line[:max_chars])
+            line = line[max_chars:]
+        if line:
+            lines.append(line)
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        if current and size + len(line) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            carry: List[str] = []
+            carried = 0
+            for prev in reversed(current):
+                if carried + len(prev) + 1 > overlap_chars:
+                    break
+                carry.insert(0, prev)
+                carried += len(prev) + 1
+            current, size = carry, carried
+            # the overlap must still leave room for the new line
+            while current and size + len(line) + 1 > max_chars:
+                size -= len(current.pop(0)) + 1
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class ChunkSummaryCache:
+    """Bounded LRU of chunk summaries keyed by model and chunk text."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._fernet = Fernet(Fernet.generate_key())
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(provider: LLMProvider, chunk: str) -> str:
+        return hashlib.sha256(f"{provider.name}\0{provider.model}\0{chunk}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            sealed = self._entries.get(key)
+            if sealed is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self._fernet.decrypt(sealed).decode()
+
+    def put(self, key: str, summary: str):
+        sealed = self._fernet.encrypt(summary.encode())
+        with self._lock:
+            self._entries[key] = sealed
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+cache = ChunkSummaryCache(max_entries=getattr(settings, "TRANSCRIPT_SUMMARY_CACHE_SIZE", 2048))
+
+
+class TranscriptJob:
+    """Map phase for one transcript; iterate `progress()` or await `run()`."""
+
+    def __init__(
+        self,
+        transcript: str,
+        provider: LLMProvider,
+        chunk_chars: Optional[int] = None,
+        overlap_chars: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        summary_cache: Optional[ChunkSummaryCache] = None,
+        chunks: Optional[List[str]] = None,
+    ):
+        self.provider = provider
+        chunk_chars = chunk_chars or getattr(settings, "TRANSCRIPT_CHUNK_CHARS", 8000)
+        if overlap_chars is None:
+            overlap_chars = getattr(settings, "TRANSCRIPT_CHUNK_OVERLAP_CHARS", 400)
+        self.concurrency = concurrency or getattr(settings, "TRANSCRIPT_MAP_CONCURRENCY", 4)
+        self.cache = summary_cache if summary_cache is not None else cache
+        # callers that already keep the transcript in chunks pass them as is
+        self.chunks = chunks if chunks is not None else chunk_transcript(transcript, chunk_chars, overlap_chars)
+        self.summaries: List[Optional[str]] = [None] * len(self.chunks)
+        self.cached = 0
+        self.failed = 0
+
+    @property
+    def needs_map(self) -> bool:
+        return len(self.chunks) > 1
+
+    async def _summarize(self, index: int, semaphore: asyncio.Semaphore) -> Tuple[int, Optional[Exception]]:
+        chunk = self.chunks[index]
+        key = self.cache.key(self.provider, chunk)
+        summary = self.cache.get(key)
+        if summary is not None:
+            self.cached += 1
+        else:
+            async with semaphore:
+                try:
+                    summary = (await self.provider.complete(MAP_PROMPT.format(chunk=chunk))).text.strip()
+                except Exception as exc:
+                    return index, exc
+            self.cache.put(key, summary)
+        self.summaries[index] = summary
+        return index, None
+
+    async def progress(self) -> AsyncIterator[dict]:
+        """Summarize all chunks, yielding a progress dict as each one finishes.
+
+        Raises the first chunk error once every chunk has finished, so the
+        successful ones are cached for a retry.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.ensure_future(self._summarize(i, semaphore)) for i in range(len(self.chunks))]
+        errors = []
+        done = 0
+        try:
+            for future in asyncio.as_completed(tasks):
+                _, error = await future
+                done += 1
+                if error is not None:
+                    self.failed += 1
+                    errors.append(error)
+                yield {"stage": "map", "done": done, "total": len(tasks), "cached": self.cached, "failed": self.failed}
+        finally:
+            # the caller went away: stop summarizing
+            for task in tasks:
+                task.cancel()
+        if errors:
+            raise errors[0]
+
+    async def run(self) -> List[str]:
+        async for _ in self.progress():
+            pass
+        return self.summaries
+
+    def reduce_input(self) -> str:
+        """Ordered chunk summaries, in place of the transcript in the note prompt."""
+        total = len(self.summaries)
+        parts = [f"[Part {i + 1} of {total}]\n{summary}" for i, summary in enumerate(self.summaries)]
+        return (
+            "(Summaries of consecutive, slightly overlapping parts of a long consultation, in order.)\n\n"
+            + "\n\n".join(parts)
+        )
@@ -1,114 +1,552 @@
 import json
 import asyncio
+import logging
+import time
 import redis.asyncio as redis
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
 from app.core.config import settings
+from app.realtime.coalesce import BATCH_PROTOCOL, CandidateCoalescer, batch_frame, split_batch
+from app.realtime.frames import CONTROL_TYPES, is_critical, parse_frame, sniff_type
+from app.realtime.heartbeat import PING_FRAME, TimingWheel
+from app.realtime.outbound import OutboundStats, SocketWriter
+from app.realtime.pubsub import INSTANCE_ID, RoomChannels
+from app.realtime.ratelimit import POLICY_DISCONNECT, RateLimit, RateLimitStats, TokenBucket
+from app.realtime.room_state import MemoryRoomStateStore, RedisRoomStateStore, RoomStateStore
+from app.services.room_chat import RoomChatLog, chat_history_frame
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+class RoomState:
+    """This instance's sockets in one room.
+
+    Who else is in the room (roles, hosts, pending join requests) lives in the
+    cluster-wide RoomStateStore; only what needs a local socket is kept here,
+    per room, so every lookup is O(1) and never scans other rooms.
+    """
+
+    __slots__ = ("room_id", "sockets", "peers", "buckets", "bucket", "limited", "limit_disconnects")
+
+    def __init__(self, room_id: str):
+        self.room_id = room_id
+        # peer_id -> SocketWriter for every connected socket (approved or not)
+        self.sockets: dict[str, SocketWriter] = {}
+        # local active participants (hosts and approved patients) receiving broadcasts
+        self.peers: set[str] = set()
+        # inbound rate limiting: peer_id -> bucket, the room's shared bucket, and
+        # frames dropped / sockets closed by the limiter in this room
+        self.buckets: dict[str, TokenBucket] = {}
+        self.bucket: TokenBucket | None = None
+        self.limited = 0
+        self.limit_disconnects = 0
+
+    def is_empty(self) -> bool:
+        return not self.sockets
+
+
 class ConnectionManager:
     def __init__(self):
-        # map room_id -> list of peer_id (active participants / hosts)
-        self.rooms: dict[str, list[str]] = {}
-        # map (room_id, peer_id) -> WebSocket
-        self.sockets: dict[tuple[str, str], WebSocket] = {}
-        # pending join requests: (room_id, peer_id) -> WebSocket
-        self.pending: dict[tuple[str, str], WebSocket] = {}
-        # store payloads for pending join requests so hosts can see intake data
-        self.pending_payloads: dict[tuple[str, str], dict] = {}
-        # roles: (room_id, peer_id) -> 'host' | 'patient'
-        self.roles: dict[tuple[str, str], str] = {}
+        # room_id -> RoomState
+        self.rooms: dict[str, RoomState] = {}
+        self.queue_max_frames = getattr(settings, "SIGNALING_QUEUE_MAX_FRAMES", 256)
+        self.queue_policy = getattr(settings, "SIGNALING_QUEUE_POLICY", "drop_oldest")
+        self.outbound = OutboundStats()
+        self.ping_interval = getattr(settings, "SIGNALING_PING_INTERVAL", 25)
+        self.idle_timeout = getattr(settings, "SIGNALING_IDLE_TIMEOUT", 75)
+        self.heartbeat_tick = 1.0
+        self.wheel: TimingWheel | None = None
+        self._heartbeat: asyncio.Task | None = None
+        # reason ('closed' | 'error' | 'idle' | 'replaced' | 'rejected' | 'rate_limited') -> sockets reaped
+        self.reaped: dict[str, int] = {}
+        self.peer_limit = RateLimit(getattr(settings, "SIGNALING_PEER_RATE", 30), getattr(settings, "SIGNALING_PEER_BURST", 60))
+        self.room_limit = RateLimit(getattr(settings, "SIGNALING_ROOM_RATE", 200), getattr(settings, "SIGNALING_ROOM_BURST", 400))
+        self.rate_policy = getattr(settings, "SIGNALING_RATE_POLICY", "drop")
+        self.rate_stats = RateLimitStats()
+        # persisted chat (attached at startup, see use_chat_log)
+        self.chat_log: RoomChatLog | None = None
+        self.chat_replay_limit = 200
+        self.coalescer: CandidateCoalescer | None = None
+        self.set_candidate_window(getattr(settings, "SIGNALING_CANDIDATE_WINDOW_MS", 0))
+        self.instance_id = INSTANCE_ID
+        self.store: RoomStateStore = MemoryRoomStateStore()
         self.redis = None
+        # per-room subscriptions, created with the Redis client
+        self.channels: RoomChannels | None = None
         if getattr(settings, "REDIS_URL", None):
             try:
-                self.redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
+                self.use_redis(redis.from_url(settings.REDIS_URL, decode_responses=True))
             except Exception:
                 self.redis = None
 
-    async def connect(self, websocket: WebSocket, room_id: str, peer_id: str):
+    def use_redis(self, client, store: RoomStateStore | None = None):
+        """Attach (or with None, detach) the Redis client used for cross-instance fan-out.
+
+        Room state moves to Redis too unless another `store` is given.
+        """
+        self.redis = client
+        self.channels = None
+        if client is None:
+            self.store = store or MemoryRoomStateStore()
+            return
+        self.store = store or RedisRoomStateStore(client, ttl_seconds=getattr(settings, "SIGNALING_ROOM_STATE_TTL", 21600))
+        self.channels = RoomChannels(
+            client,
+            self._broadcast_to_room,
+            sharded=getattr(settings, "SIGNALING_PUBSUB_SHARDED", "auto"),
+            on_control=self._on_control,
+        )
+        self.channels.instance_id = self.instance_id
+
+    def use_chat_log(self, chat_log: RoomChatLog | None):
+        """Persist relayed `chat` frames to `chat_log` (None stops persisting)."""
+        self.chat_log = chat_log
+
+    def set_candidate_window(self, window_ms: int):
+        """Enable ICE candidate coalescing with the given window (0 disables it)."""
+        self.coalescer = CandidateCoalescer(window_ms / 1000.0, self._emit_candidates) if window_ms > 0 else None
+
+    def room(self, room_id: str) -> RoomState:
+        state = self.rooms.get(room_id)
+        if state is None:
+            state = self.rooms[room_id] = RoomState(room_id)
+        return state
+
+    async def connect(self, websocket: WebSocket, room_id: str, peer_id: str) -> SocketWriter:
         # Accept and register socket but DO NOT add patient to active room until approved
         await websocket.accept()
-        self.sockets[(room_id, peer_id)] = websocket
-
-    def disconnect(self, websocket: WebSocket, room_id: str, peer_id: str):
-        # remove from sockets, pending, roles and rooms
-        self.sockets.pop((room_id, peer_id), None)
-        self.pending.pop((room_id, peer_id), None)
-        self.roles.pop((room_id, peer_id), None)
-        peer_list = self.rooms.get(room_id) or []
+        writer = SocketWriter(
+            websocket,
+            max_frames=self.queue_max_frames,
+            policy=self.queue_policy,
+            stats=self.outbound,
+            on_failure=lambda w: self.disconnect(w.websocket, room_id, peer_id, reason="error"),
+        )
+        writer.owner = (room_id, peer_id)
+        writer.start()
+        first_local = room_id not in self.rooms
+        state = self.room(room_id)
+        previous = state.sockets.get(peer_id)
+        if previous is not None:
+            # same peer reconnected: the old socket is stale
+            previous.terminate(1000)
+            self._count_reaped("replaced")
+            if self.wheel:
+                self.wheel.cancel(previous)
+        state.sockets[peer_id] = writer
+        self._watch(writer)
+        if first_local and self.channels:
+            try:
+                await self.channels.acquire(room_id)
+            except Exception:
+                # Redis unavailable: the room still works for peers on this instance
+                logger.warning("could not subscribe to signaling room %s", room_id)
+        return writer
+
+    def disconnect(self, websocket: WebSocket, room_id: str, peer_id: str, reason: str = "closed"):
+        state = self.rooms.get(room_id)
+        if state is None:
+            return
+        writer = state.sockets.get(peer_id)
+        if writer is None or (websocket is not None and writer.websocket is not websocket):
+            # already reaped, or a late disconnect from a replaced socket that must not evict the new one
+            return
+        self._reap(state, peer_id, writer, reason)
+
+    def _reap(self, state: RoomState, peer_id: str, writer: SocketWriter, reason: str):
+        """Release everything held for one peer: socket writer, keepalive timer,
+        room membership and (asynchronously) its shared room state, including
+        any pending join request and intake payload. Every exit path ends here."""
+        writer.abort()
+        if self.wheel:
+            self.wheel.cancel(writer)
+        if state.sockets.get(peer_id) is writer:
+            del state.sockets[peer_id]
+        state.peers.discard(peer_id)
+        state.buckets.pop(peer_id, None)
+        if self.coalescer:
+            self.coalescer.take(state.room_id, peer_id)
+        self._count_reaped(reason)
+        self._spawn(self._forget(state.room_id, peer_id))
+        self._discard_if_empty(state)
+
+    def _count_reaped(self, reason: str):
+        self.reaped[reason] = self.reaped.get(reason, 0) + 1
+
+    async def _forget(self, room_id: str, peer_id: str):
+        try:
+            await self.store.remove_peer(room_id, peer_id, self.instance_id)
+        except Exception:
+            # entries expire with the room's TTL
+            logger.warning("could not clear signaling state for %s in room %s", peer_id, room_id)
+
+    def admit(self, room_id: str, peer_id: str, now: float) -> bool:
+        """Charge one inbound frame to the peer's token bucket.
+
+        Over the limit the frame is dropped, or with the "disconnect" policy the
+        socket is closed (1008) and reaped.
+        """
+        limit = self.peer_limit
+        if limit.rate <= 0:
+            return True
+        state = self.rooms.get(room_id)
+        if state is None:
+            return False
+        bucket = state.buckets.get(peer_id)
+        if bucket is None:
+            bucket = state.buckets[peer_id] = limit.bucket(now)
+        if limit.allow(bucket, now):
+            return True
+        state.limited += 1
+        self.rate_stats.peer_limited += 1
+        if self.rate_policy == POLICY_DISCONNECT:
+            writer = state.sockets.get(peer_id)
+            if writer is not None:
+                writer.terminate(1008)
+                state.limit_disconnects += 1
+                self.rate_stats.disconnects += 1
+                self._reap(state, peer_id, writer, "rate_limited")
+        return False
+
+    def _admit_to_room(self, state: RoomState) -> bool:
+        """Charge one fan-out to the room's shared bucket (excess is always dropped)."""
+        limit = self.room_limit
+        if limit.rate <= 0:
+            return True
+        now = time.monotonic()
+        if state.bucket is None:
+            state.bucket = limit.bucket(now)
+        if limit.allow(state.bucket, now):
+            return True
+        state.limited += 1
+        self.rate_stats.room_limited += 1
+        return False
+
+    def send_to(self, room_id: str, peer_id: str, frame, critical: bool = True) -> bool:
+        """Queue a frame for one peer without waiting on the network."""
+        state = self.rooms.get(room_id)
+        writer = state.sockets.get(peer_id) if state else None
+        return bool(writer) and writer.send(frame, critical)
+
+    def _discard_if_empty(self, state: RoomState):
+        if state.is_empty() and self.rooms.get(state.room_id) is state:
+            del self.rooms[state.room_id]
+            if self.coalescer:
+                self.coalescer.discard_room(state.room_id)
+            if self.channels and state.room_id in self.channels.rooms:
+                self._spawn(self.channels.release(state.room_id, lambda: state.room_id in self.rooms))
+
+    def _watch(self, writer: SocketWriter):
+        """Put a socket under keepalive supervision (no-op when disabled)."""
+        if not (self.ping_interval or self.idle_timeout):
+            return
+        if self._heartbeat is None or self._heartbeat.done():
+            horizon = max(self.ping_interval, self.idle_timeout)
+            self.wheel = TimingWheel(self.heartbeat_tick, int(horizon / self.heartbeat_tick) + 2)
+            self._heartbeat = asyncio.create_task(self._run_heartbeat())
+        self.wheel.schedule(writer, self.ping_interval or self.idle_timeout)
+
+    async def _run_heartbeat(self):
+        wheel = self.wheel
+        while True:
+            await asyncio.sleep(wheel.tick_seconds)
+            for writer in wheel.advance():
+                try:
+                    self._check_liveness(writer)
+                except Exception:
+                    logger.exception("signaling keepalive check failed")
+
+    def _check_liveness(self, writer: SocketWriter):
+        if writer.closed or writer.closing or writer.owner is None:
+            return
+        room_id, peer_id = writer.owner
+        idle = time.monotonic() - writer.last_seen
+        if self.idle_timeout and idle >= self.idle_timeout:
+            writer.terminate(1001)
+            state = self.rooms.get(room_id)
+            if state is not None:
+                self._reap(state, peer_id, writer, "idle")
+            return
+        delays = []
+        if self.ping_interval:
+            if idle >= self.ping_interval:
+                writer.send(PING_FRAME, critical=False)
+                delays.append(self.ping_interval)
+            else:
+                delays.append(self.ping_interval - idle)
+        if self.idle_timeout:
+            delays.append(self.idle_timeout - idle)
+        self.wheel.schedule(writer, min(delays))
+
+    @staticmethod
+    def _spawn(coro):
         try:
-            if peer_id in peer_list:
-                peer_list.remove(peer_id)
+            asyncio.get_running_loop().create_task(coro)
+        except RuntimeError:
+            coro.close()
+
+    def _command(self, room_id: str, op: str, **fields):
+        """Send a command to the other instances serving this room."""
+        if self.channels:
+            self.channels.publish(room_id, json.dumps({"op": op, **fields}), control=True)
+
+    async def _on_control(self, room_id: str, raw: str):
+        state = self.rooms.get(room_id)
+        if state is None:
+            return
+        try:
+            cmd = json.loads(raw)
         except ValueError:
-            pass
-        if not peer_list:
-            self.rooms.pop(room_id, None)
-
-    async def _broadcast_to_room(self, room_id: str, message: str):
-        peer_ids = list(self.rooms.get(room_id, []))
-        for pid in peer_ids:
-            ws = self.sockets.get((room_id, pid))
-            if not ws:
+            return
+        op = cmd.get("op")
+        if op == "deliver":
+            for pid in cmd.get("to") or ():
+                writer = state.sockets.get(pid)
+                if writer:
+                    writer.send(cmd.get("frame"))
+        elif op == "grant":
+            self._grant_local(state, cmd.get("target"), cmd.get("from"))
+        elif op == "reject":
+            self._reject_local(state, cmd.get("target"), cmd.get("from"), cmd.get("reason"))
+
+    @staticmethod
+    def _join_request_frame(peer_id: str, payload: dict) -> str:
+        return json.dumps({"type": "join_request", "from": peer_id, "name": payload.get("name") or "Patient", "intake": payload.get("intake")})
+
+    async def announce(self, websocket: WebSocket, room_id: str, peer_id: str, role: str | None, protocol=None):
+        state = self.room(room_id)
+        role = role or "patient"
+        writer = state.sockets.get(peer_id)
+        if writer and isinstance(protocol, int) and not isinstance(protocol, bool):
+            writer.protocol = protocol
+        await self.store.announce(room_id, peer_id, role, self.instance_id)
+        if role == "host":
+            # add host to active room
+            state.peers.add(peer_id)
+            # inform this host of pending requests for this room only, wherever the patients are connected
+            if writer:
+                for pid, payload in (await self.store.pending(room_id)).items():
+                    writer.send(self._join_request_frame(pid, payload))
+
+    async def join_request(self, websocket: WebSocket, room_id: str, peer_id: str, msg: dict):
+        state = self.room(room_id)
+        if peer_id not in state.sockets:
+            return
+        # store incoming payload so hosts can preview intake/transcript
+        payload = {"name": msg.get("name"), "intake": msg.get("intake")}
+        await self.store.add_pending(room_id, peer_id, payload, self.instance_id)
+        frame = self._join_request_frame(peer_id, payload)
+        remote_hosts = []
+        for hid in await self.store.hosts(room_id):
+            hws = state.sockets.get(hid)
+            if hws:
+                hws.send(frame)
+            else:
+                remote_hosts.append(hid)
+        if remote_hosts:
+            self._command(room_id, "deliver", to=remote_hosts, frame=frame)
+
+    def _grant_local(self, state: RoomState, target: str, host_id: str):
+        writer = state.sockets.get(target)
+        if writer is None:
+            return
+        writer.send(json.dumps({"type": "connection_granted", "from": host_id}))
+        # move pending into active room
+        state.peers.add(target)
+
+    def _reject_local(self, state: RoomState, target: str, host_id: str, reason=None):
+        writer = state.sockets.pop(target, None)
+        if writer is None:
+            return
+        state.peers.discard(target)
+        state.buckets.pop(target, None)
+        if self.wheel:
+            self.wheel.cancel(writer)
+        self._count_reaped("rejected")
+        # the writer closes the socket once the rejection has been sent
+        writer.send(json.dumps({"type": "connection_rejected", "from": host_id, "reason": reason}))
+        writer.close()
+        self._discard_if_empty(state)
+
+    async def approve_join(self, room_id: str, host_id: str, target: str):
+        # take_pending is atomic, so only one host (on any instance) approves a request
+        if not target or await self.store.take_pending(room_id, target) is None:
+            return
+        state = self.rooms.get(room_id)
+        if state is not None and target in state.sockets:
+            self._grant_local(state, target, host_id)
+        elif await self.store.locate(room_id, target):
+            self._command(room_id, "grant", target=target, **{"from": host_id})
+
+    async def reject_join(self, room_id: str, host_id: str, target: str, reason=None):
+        if not target or await self.store.take_pending(room_id, target) is None:
+            return
+        remote = await self.store.locate(room_id, target) not in (None, self.instance_id)
+        await self.store.remove_peer(room_id, target)
+        state = self.rooms.get(room_id)
+        if state is not None and target in state.sockets:
+            self._reject_local(state, target, host_id, reason)
+        elif remote:
+            self._command(room_id, "reject", target=target, reason=reason, **{"from": host_id})
+
+    def is_active(self, room_id: str, peer_id: str) -> bool:
+        state = self.rooms.get(room_id)
+        return bool(state) and peer_id in state.sockets and peer_id in state.peers
+
+    async def _broadcast_to_room(self, room_id: str, message: str | bytes, critical: bool | None = None):
+        self._deliver_local(room_id, message, critical)
+
+    def _deliver_local(self, room_id: str, message: str | bytes, critical: bool | None = None, singles=None):
+        # Only enqueues: each socket's writer task does the network I/O, so a
+        # slow peer cannot hold up the rest of the room.
+        state = self.rooms.get(room_id)
+        if state is None:
+            return
+        mtype = sniff_type(message)
+        if critical is None:
+            critical = is_critical(mtype)
+        for pid in list(state.peers):
+            writer = state.sockets.get(pid)
+            if not writer:
                 continue
+            if mtype == "candidates" and writer.protocol < BATCH_PROTOCOL:
+                # old client: unpack the batch (once per message, only if needed)
+                if singles is None:
+                    singles = split_batch(message)
+                for single in singles:
+                    writer.send(single, critical)
+            else:
+                writer.send(message, critical)
+
+    async def relay(self, room_id: str, sender: str, frame: str | bytes, mtype: str | None):
+        """Forward a client frame to the room, coalescing ICE candidates when enabled."""
+        state = self.rooms.get(room_id)
+        if state is None or not self._admit_to_room(state):
+            return
+        coalescer = self.coalescer
+        if coalescer is not None:
+            if mtype == "candidate" and isinstance(frame, str) and parse_frame(frame) is not None:
+                coalescer.add(room_id, sender, frame)
+                return
+            # keep the sender's order: buffered candidates go out before its next frame
+            coalescer.flush_now(room_id, sender)
+        if mtype == "chat" and self.chat_log is not None:
+            frame = self._log_chat(room_id, sender, frame)
+        await self.publish(room_id, frame)
+
+    def _log_chat(self, room_id: str, sender: str, frame: str | bytes) -> str | bytes:
+        # Chat frames are small and rate limited, so unlike offers/candidates they
+        # are re-serialized: the server's `seq` must override anything the client sent.
+        msg = parse_frame(frame)
+        if msg is None:
+            return frame
+        msg["seq"] = self.chat_log.next_seq()
+        frame = json.dumps(msg)
+        self.chat_log.append(room_id, msg["seq"], sender, frame)
+        return frame
+
+    async def chat_sync(self, room_id: str, peer_id: str, since):
+        """Replay chat newer than `since` (the highest seq the client has) to one active peer."""
+        if self.chat_log is None or not self.is_active(room_id, peer_id):
+            return
+        since = since if isinstance(since, int) and not isinstance(since, bool) else 0
+        frames, more = await self.chat_log.replay(room_id, since, self.chat_replay_limit)
+        self.send_to(room_id, peer_id, chat_history_frame(frames, more))
+
+    def _emit_candidates(self, room_id: str, sender: str, frames: list[str]):
+        if len(frames) == 1:
+            message, singles = frames[0], None
+        else:
+            message, singles = batch_frame(frames), frames
+        self._deliver_local(room_id, message, singles=singles)
+        if self.channels:
             try:
-                await ws.send_text(message)
+                self.channels.publish(room_id, message)
             except Exception:
-                # on failure, clean up
-                self.disconnect(ws, room_id, pid)
+                logger.warning("could not queue signaling frame for room %s", room_id)
+
+    def metrics(self) -> dict:
+        writers = [w for state in self.rooms.values() for w in state.sockets.values()]
+        depths = [w.depth for w in writers]
+        channels = self.channels
+        return {
+            "gauges": {
+                "live_sockets": len(writers),
+                "active_peers": sum(len(state.peers) for state in self.rooms.values()),
+                "watched_sockets": len(self.wheel) if self.wheel else 0,
+                "queued_bytes": sum(w.queued_bytes for w in writers),
+                # pending requests / intake payload bytes (None when held in Redis)
+                "room_state": self.store.stats(),
+            },
+            "reaped": dict(self.reaped),
+            "coalescing": None if self.coalescer is None else {
+                "window_ms": round(self.coalescer.window_seconds * 1000),
+                "candidates_in": self.coalescer.candidates_in,
+                "batches_out": self.coalescer.batches_out,
+                "buffered_senders": len(self.coalescer),
+            },
+            "rate_limit": {
+                "policy": self.rate_policy,
+                "peer_rate": self.peer_limit.rate,
+                "peer_burst": self.peer_limit.burst,
+                "room_rate": self.room_limit.rate,
+                "room_burst": self.room_limit.burst,
+                "peer_limited": self.rate_stats.peer_limited,
+                "room_limited": self.rate_stats.room_limited,
+                "disconnects": self.rate_stats.disconnects,
+                # live rooms that hit a limit, busiest first
+                "rooms": {
+                    state.room_id: {"limited": state.limited, "disconnects": state.limit_disconnects}
+                    for state in sorted(self.rooms.values(), key=lambda s: s.limited, reverse=True)[:20]
+                    if state.limited
+                },
+            },
+            "chat_log": None if self.chat_log is None else self.chat_log.stats(),
+            "pubsub": None if channels is None else {
+                "instance_id": self.instance_id,
+                "sharded": channels.sharded,
+                "subscribed_rooms": len(channels.rooms),
+                "received": channels.received,
+                "skipped_own": channels.skipped_own,
+                "duplicates": channels.duplicates,
+                "gaps": channels.gaps,
+                "publish_failures": channels.publish_failures,
+            },
+            "rooms": len(self.rooms),
+            "sockets": len(depths),
+            "queue": {
+                "max_frames": self.queue_max_frames,
+                "policy": self.queue_policy,
+                "queued_frames": sum(depths),
+                "max_depth": max(depths, default=0),
+                "sockets_backlogged": sum(1 for d in depths if d >= self.queue_max_frames // 2),
+                "dropped_frames": self.outbound.dropped_frames,
+                "overflow_disconnects": self.outbound.overflow_disconnects,
+                "send_failures": self.outbound.send_failures,
+            },
+        }
 
-    async def publish(self, room_id: str, message: str):
-        # When Redis is configured, publish so other instances receive the message
-        if self.redis:
+    async def publish(self, room_id: str, message: str | bytes):
+        # Local peers first: the common case (both peers on this instance) never
+        # waits for a Redis round trip. Other instances get the frame through
+        # the room channel; our own copy is dropped by the listener.
+        await self._broadcast_to_room(room_id, message)
+        if self.channels:
             try:
-                await self.redis.publish(f"room:{room_id}", message)
-                return
+                self.channels.publish(room_id, message)
             except Exception:
-                # fall back to local broadcast
-                pass
-        await self._broadcast_to_room(room_id, message)
+                logger.warning("could not queue signaling frame for room %s", room_id)
 
     async def start_redis_listener(self):
-        if not self.redis:
-            return
-        pubsub = self.redis.pubsub()
-        # Subscribe to all room channels
-        await pubsub.psubscribe("room:*")
-
-        async def _listener():
-            # Use event-driven pubsub listen() iterator instead of polling
+        # Optional warm-up: rooms subscribe on demand in connect(), this just
+        # resolves sharded-vs-classic pub/sub and starts the listener early.
+        if self.channels:
             try:
-                async for msg in pubsub.listen():
-                    try:
-                        if not msg:
-                            continue
-                        # Only handle actual messages
-                        if msg.get("type") != "message":
-                            continue
-                        channel = msg.get("channel")
-                        data = msg.get("data")
-                        if isinstance(channel, bytes):
-                            channel = channel.decode()
-                        if isinstance(data, bytes):
-                            try:
-                                data = data.decode()
-                            except Exception:
-                                data = str(data)
-                        if channel and channel.startswith("room:"):
-                            room_id = channel.split(":", 1)[1]
-                            await self._broadcast_to_room(room_id, data)
-                    except Exception:
-                        # Continue processing subsequent messages on error
-                        continue
+                await self.channels.start()
             except Exception:
-                # If the pubsub listener fails, retry after a short delay
-                await asyncio.sleep(1.0)
-                if getattr(self, 'redis', None):
-                    # spawn a new listener task
-                    asyncio.create_task(self.start_redis_listener())
-
-        asyncio.create_task(_listener())
+                logger.warning("signaling pub/sub unavailable; serving local rooms only")
 
 
 manager = ConnectionManager()
@@ -116,106 +554,76 @@ manager = ConnectionManager()
 
 @router.websocket("/ws/{room_id}/{peer_id}")
 async def websocket_endpoint(websocket: WebSocket, room_id: str, peer_id: str):
+    await serve_socket(manager, websocket, room_id, peer_id)
+
+
+async def serve_socket(manager: ConnectionManager, websocket: WebSocket, room_id: str, peer_id: str):
+    """Run one signaling connection against `manager` until it closes."""
     # Register socket (but do not add to active room until approved)
-    await manager.connect(websocket, room_id, peer_id)
+    writer = await manager.connect(websocket, room_id, peer_id)
     try:
         while True:
-            data = await websocket.receive_text()
-            try:
-                msg = json.loads(data)
-            except Exception:
-                # non-json payload -> broadcast to room
-                await manager.publish(room_id, data)
-                continue
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            # text or binary (UTF-8 JSON / MessagePack) frame, relayed as received
+            frame = message.get("text")
+            if frame is None:
+                frame = message.get("bytes")
+                if not frame:
+                    continue
+            now = writer.last_seen = time.monotonic()
 
-            mtype = msg.get("type")
-
-            # Handle role announcement from clients
-            if mtype == "announce":
-                role = msg.get("role")
-                manager.roles[(room_id, peer_id)] = role or "patient"
-                if role == "host":
-                    # add host to active room
-                    manager.rooms.setdefault(room_id, []).append(peer_id)
-                    # inform this host of any pending requests
-                    for (r, pid), ws in list(manager.pending.items()):
-                        if r == room_id:
-                            payload = manager.pending_payloads.get((r, pid), {})
-                            try:
-                                await websocket.send_text(json.dumps({"type": "join_request", "from": pid, "name": payload.get("name") or "Patient", "intake": payload.get("intake")}))
-                            except Exception:
-                                pass
+            mtype = sniff_type(frame)
+            if mtype == "pong":
+                # Keepalive answer: liveness already recorded above
                 continue
-
-            # Patient requests to join -> notify hosts, keep in pending
-            if mtype == "join_request":
-                # mark role as patient
-                manager.roles[(room_id, peer_id)] = "patient"
-                manager.pending[(room_id, peer_id)] = websocket
-                # store incoming payload so hosts can preview intake/transcript
-                try:
-                    manager.pending_payloads[(room_id, peer_id)] = {"name": msg.get("name"), "intake": msg.get("intake")}
-                except Exception:
-                    manager.pending_payloads[(room_id, peer_id)] = {"name": msg.get("name")}
-                # notify hosts in room
-                hosts = [pid for pid in manager.rooms.get(room_id, []) if manager.roles.get((room_id, pid)) == "host"]
-                payload = json.dumps({"type": "join_request", "from": peer_id, "name": msg.get("name") or "Patient", "intake": msg.get("intake")})
-                for hid in hosts:
-                    hws = manager.sockets.get((room_id, hid))
-                    if hws:
-                        try:
-                            await hws.send_text(payload)
-                        except Exception:
-                            pass
+            if not manager.admit(room_id, peer_id, now):
+                if writer.closed:
+                    break
                 continue
+            if mtype is None or mtype in CONTROL_TYPES:
+                # Only server commands (and frames we cannot sniff) are fully parsed
+                msg = parse_frame(frame)
+                if msg is None:
+                    # non-json payload -> broadcast to room
+                    await manager.relay(room_id, peer_id, frame, None)
+                    continue
+                mtype = msg.get("type")
+                if mtype in CONTROL_TYPES:
+                    await _handle_control(manager, websocket, room_id, peer_id, mtype, msg)
+                    continue
 
-            # Host approves a pending join
-            if mtype == "approve_join":
-                target = msg.get("target")
-                pending_ws = manager.pending.get((room_id, target))
-                if pending_ws:
-                    try:
-                        await pending_ws.send_text(json.dumps({"type": "connection_granted", "from": peer_id}))
-                    except Exception:
-                        pass
-                    # move pending into active room
-                    manager.pending.pop((room_id, target), None)
-                    manager.pending_payloads.pop((room_id, target), None)
-                    manager.rooms.setdefault(room_id, []).append(target)
-                    manager.roles[(room_id, target)] = "patient"
-                continue
-
-            # Host rejects a pending join
-            if mtype == "reject_join":
-                target = msg.get("target")
-                pending_ws = manager.pending.get((room_id, target))
-                if pending_ws:
-                    try:
-                        await pending_ws.send_text(json.dumps({"type": "connection_rejected", "from": peer_id, "reason": msg.get("reason")}))
-                        await pending_ws.close()
-                    except Exception:
-                        pass
-                    manager.pending.pop((room_id, target), None)
-                    manager.pending_payloads.pop((room_id, target), None)
-                    manager.roles.pop((room_id, target), None)
-                    manager.sockets.pop((room_id, target), None)
-                continue
-
-            # Otherwise, only allow broadcast if the sender is active in the room
-            if (room_id, peer_id) in manager.sockets and peer_id in manager.rooms.get(room_id, []):
-                # Allow common WebRTC signaling types plus chat and ping
-                # (chat messages must be relayed so in-call chat works)
-                allowed_signal_types = ['offer', 'answer', 'candidate', 'chat', 'ping']
-                if mtype in allowed_signal_types:
-                    await manager.publish(room_id, json.dumps(msg))
-                else:
-                    # Preserve existing behaviour for any other payloads by forwarding
-                    await manager.publish(room_id, json.dumps(msg))
+            # Otherwise, only allow broadcast if the sender is active in the room.
+            # offer/answer/candidate/chat/ping and any other payloads are
+            # forwarded as the original bytes, never re-serialized.
+            if manager.is_active(room_id, peer_id):
+                await manager.relay(room_id, peer_id, frame, mtype)
             else:
                 # ignore signaling from non-approved participants
-                try:
-                    await websocket.send_text(json.dumps({"type": "error", "message": "not_approved"}))
-                except Exception:
-                    pass
+                manager.send_to(room_id, peer_id, json.dumps({"type": "error", "message": "not_approved"}))
     except WebSocketDisconnect:
+        pass
+    except Exception:
+        logger.exception("signaling socket %s/%s failed", room_id, peer_id)
+    finally:
+        # Runs for clean closes, errors and cancellation alike so nothing leaks
         manager.disconnect(websocket, room_id, peer_id)
+
+
+async def _handle_control(manager: ConnectionManager, websocket: WebSocket, room_id: str, peer_id: str, mtype: str, msg: dict):
+    # Handle role announcement from clients
+    if mtype == "announce":
+        await manager.announce(websocket, room_id, peer_id, msg.get("role"), msg.get("protocol"))
+    # Patient requests to join -> notify hosts, keep in pending
+    elif mtype == "join_request":
+        await manager.join_request(websocket, room_id, peer_id, msg)
+    # Host approves a pending join
+    elif mtype == "approve_join":
+        await manager.approve_join(room_id, peer_id, msg.get("target"))
+    # Host rejects a pending join
+    elif mtype == "reject_join":
+        await manager.reject_join(room_id, peer_id, msg.get("target"), msg.get("reason"))
+    # Reconnected participant asks for the chat it missed
+    elif mtype == "chat_sync":
+        await manager.chat_sync(room_id, peer_id, msg.get("since"))
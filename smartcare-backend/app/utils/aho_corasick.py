@@ -0,0 +1,73 @@
+"""
+Aho-Corasick multi-pattern matcher.
+
+Builds one automaton over all patterns, so a text is scanned once no matter
+how many patterns there are, rather than once per pattern.
+"""
+from collections import deque
+from typing import Dict, Generic, Iterable, Iterator, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class AhoCorasick(Generic[T]):
+    """Matches lower-cased patterns as whole words (not inside a longer word)."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, T]]):
+        # trie: per-state transitions, failure links and (pattern length, value) outputs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, T]]] = [[]]
+        for pattern, value in patterns:
+            self._add(pattern.lower(), value)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def _add(self, pattern: str, value: T):
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(pattern), value))
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                # inherit the outputs of the longest proper suffix that is also a pattern
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, T]]:
+        """Yield (start, end, value) for each whole-word match, as offsets into `text.lower()`."""
+        text = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = i + 1
+            if end < len(text) and text[end].isalnum():
+                continue
+            for length, value in out[state]:
+                start = end - length
+                if start == 0 or not text[start - 1].isalnum():
+                    yield start, end, value
@@ -0,0 +1,170 @@
+"""Shared test doubles for signaling benchmarks."""
+import os
+
+os.environ.setdefault("PRIVATE_KEY", "bench")
+os.environ.setdefault("PUBLIC_KEY", "bench")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("REDIS_URL", "")
+
+
+class FakeWebSocket:
+    """Minimal stand-in for starlette's WebSocket: records sent frames."""
+
+    def __init__(self):
+        self.sent = 0
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.sent += 1
+
+    async def send_bytes(self, data):
+        self.sent += 1
+
+    async def close(self, code=1000):
+        self.closed = True
+
+
+class FakeRedisBroker:
+    """In-process stand-in for a Redis server: pub/sub (classic and sharded)
+    plus the hash/set commands used by RedisRoomStateStore.
+
+    Supports the subset the signaling server uses. Each `client()` behaves
+    like a separate redis.asyncio connection to the same server. Pipelines
+    run their commands back to back, which is what MULTI/EXEC guarantees.
+    """
+
+    def __init__(self, version: str = "7.2.0"):
+        self.version = version
+        self.data = {}  # key -> dict (hash) or set
+        self.subscribers = {}  # channel -> set of FakePubSub
+        self.patterns = {}  # prefix (pattern without '*') -> set of FakePubSub
+        self.published = 0
+
+    def client(self):
+        return FakeRedis(self)
+
+    def deliver(self, channel, data, kind="message"):
+        self.published += 1
+        receivers = 0
+        for ps in self.subscribers.get(channel, ()):
+            ps.queue.put_nowait({"type": kind, "channel": channel, "data": data, "pattern": None})
+            receivers += 1
+        for prefix, subs in self.patterns.items():
+            if channel.startswith(prefix):
+                for ps in subs:
+                    ps.queue.put_nowait({"type": "pmessage", "channel": channel, "data": data, "pattern": prefix + "*"})
+                    receivers += 1
+        return receivers
+
+
+class FakeRedis:
+    def __init__(self, broker: FakeRedisBroker):
+        self.broker = broker
+
+    async def info(self, section=None):
+        return {"redis_version": self.broker.version}
+
+    async def publish(self, channel, data):
+        return self.broker.deliver(channel, data)
+
+    async def spublish(self, channel, data):
+        return self.broker.deliver(channel, data, kind="smessage")
+
+    async def hset(self, key, field, value):
+        h = self.broker.data.setdefault(key, {})
+        added = field not in h
+        h[field] = value
+        return int(added)
+
+    async def hget(self, key, field):
+        return self.broker.data.get(key, {}).get(field)
+
+    async def hdel(self, key, field):
+        return 1 if self.broker.data.get(key, {}).pop(field, None) is not None else 0
+
+    async def hgetall(self, key):
+        return dict(self.broker.data.get(key, {}))
+
+    async def sadd(self, key, member):
+        s = self.broker.data.setdefault(key, set())
+        added = member not in s
+        s.add(member)
+        return int(added)
+
+    async def srem(self, key, member):
+        s = self.broker.data.get(key, set())
+        removed = member in s
+        s.discard(member)
+        return int(removed)
+
+    async def smembers(self, key):
+        return set(self.broker.data.get(key, set()))
+
+    async def expire(self, key, seconds):
+        return int(key in self.broker.data)
+
+    def pubsub(self):
+        return FakePubSub(self.broker)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        return lambda *args: self.commands.append((method, args))
+
+    async def execute(self):
+        return [await method(*args) for method, args in self.commands]
+
+
+class FakePubSub:
+    def __init__(self, broker: FakeRedisBroker):
+        import asyncio
+
+        self.broker = broker
+        self.queue = asyncio.Queue()
+        self.channels = set()
+
+    async def subscribe(self, *channels):
+        for ch in channels:
+            self.broker.subscribers.setdefault(ch, set()).add(self)
+            self.channels.add(ch)
+
+    ssubscribe = subscribe
+
+    async def unsubscribe(self, *channels):
+        for ch in channels:
+            self.broker.subscribers.get(ch, set()).discard(self)
+            self.channels.discard(ch)
+
+    sunsubscribe = unsubscribe
+
+    async def psubscribe(self, *patterns):
+        for p in patterns:
+            self.broker.patterns.setdefault(p.rstrip("*"), set()).add(self)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        import asyncio
+
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self):
+        await self.unsubscribe(*list(self.channels))
@@ -0,0 +1,107 @@
+"""Benchmark: doctor directory search over 100k synthetic doctors.
+
+Compares the in-process trigram index (SQLite fallback path of
+app/services/doctor_search.py) against a linear case-insensitive substring
+scan, which is what `ILIKE '%term%'` does without an index.
+
+Run from smartcare-backend/:
+
+    python -m benchmarks.bench_doctor_search [--doctors 100000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("PRIVATE_KEY", "bench")
+os.environ.setdefault("PUBLIC_KEY", "bench")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("REDIS_URL", "")
+
+from app.services.doctor_search import TrigramIndex, top_page  # noqa: E402
+
+FIRST = ["James", "Maria", "Wei", "Aisha", "Carlos", "Olga", "Rahul", "Fatima", "John", "Yuki",
+         "Ahmed", "Elena", "Kwame", "Sofia", "Liam", "Priya", "Mateo", "Hana", "Omar", "Grace"]
+# Surnames are assembled from syllables so the directory has realistic name cardinality
+SYLLABLES = ["ka", "ro", "mi", "len", "dor", "sa", "vik", "tan", "bel", "gu", "ne", "shi", "mor",
+             "pa", "li", "chen", "zu", "ra", "ost", "wen", "ha", "din", "qu", "el", "ton", "ari"]
+SPECIALTIES = ["Cardiology", "Dermatology", "Neurology", "Pediatrics", "Oncology", "Orthopedics",
+               "Psychiatry", "Radiology", "Endocrinology", "Gastroenterology", "General Practice"]
+
+
+def _surname(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def _rows(n, rng):
+    for i in range(1, n + 1):
+        yield i, f"{rng.choice(FIRST)} {_surname(rng)}", rng.choice(SPECIALTIES)
+
+
+def _queries(rows, rng, n):
+    """Mix of exact surnames, surnames with a transposition typo, and specialties."""
+    queries = []
+    for _ in range(n):
+        kind = rng.random()
+        surname = rng.choice(rows)[1].split()[1].lower()
+        if kind < 0.4:
+            queries.append(surname)
+        elif kind < 0.8 and len(surname) > 3:
+            i = rng.randrange(1, len(surname) - 2)
+            queries.append(surname[:i] + surname[i + 1] + surname[i] + surname[i + 2:])
+        else:
+            queries.append(rng.choice(SPECIALTIES)[:6].lower())
+    return queries
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _time(fn, queries):
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), _percentile(samples, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--doctors", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    rows = list(_rows(args.doctors, rng))
+    queries = _queries(rows, rng, args.queries)
+
+    idx = TrigramIndex()
+    start = time.perf_counter()
+    idx.build(rows)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    def scan(q):
+        q = q.lower()
+        return [d for d, name, spec in rows if q in name.lower() or q in spec.lower()]
+
+    def trigram(q):
+        return top_page(idx.search(q), None, 50)
+
+    scan_p50, scan_p99 = _time(scan, queries)
+    trgm_p50, trgm_p99 = _time(trigram, queries)
+
+    print(f"doctors={args.doctors} queries={args.queries}")
+    print(f"index build: {build_ms:.0f} ms")
+    print(f"linear ILIKE-style scan: p50={scan_p50:.2f} ms p99={scan_p99:.2f} ms")
+    print(f"trigram index (ranked, top 50): p50={trgm_p50:.2f} ms p99={trgm_p99:.2f} ms")
+    typos = [q for q in queries if not scan(q)][:5]
+    for q in typos:
+        print(f"typo {q!r}: scan hits=0 trigram hits={len(idx.search(q))}")
+
+
+if __name__ == "__main__":
+    main()
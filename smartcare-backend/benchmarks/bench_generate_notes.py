@@ -0,0 +1,109 @@
+"""Benchmark: end-to-end throughput of POST /api/v1/tele/generate-notes.
+
+Serves the tele router in-process (httpx ASGI transport, in-memory SQLite)
+with the deterministic local LLM provider, so the whole scribe path runs with
+no network and repeatable latency. For each client concurrency level it
+reports requests/sec and p50/p99 request latency; with the provider's
+concurrency cap below the client concurrency the queueing shows up in p99
+(and as 503s once callers wait longer than the queue timeout).
+
+Run from smartcare-backend/:
+
+    python -m benchmarks.bench_generate_notes [--requests 200] [--concurrency 1 8 32]
+        [--base-ms 800] [--per-kchar-ms 20] [--jitter-ms 200] [--max-concurrency 8]
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+from benchmarks import _fakes  # noqa: F401  (env defaults)
+import httpx
+import sqlalchemy as sa
+from fastapi import FastAPI
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1 import tele
+from app.database import Base, get_db
+from app.services import llm
+
+PHRASES = [
+    "Patient reports a dry cough for three days.", "No fever or chills.", "Mild headache in the evenings.",
+    "Taking ibuprofen 400mg as needed.", "Denies chest pain.", "Sleeping poorly.", "Appetite is normal.",
+    "Started lisinopril last month.", "Blood pressure at home around 135 over 85.", "Allergic to penicillin.",
+]
+
+
+def _app():
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)
+
+    def db():
+        s = session()
+        try:
+            yield s
+        finally:
+            s.close()
+
+    app = FastAPI()
+    app.include_router(tele.router, prefix="/api/v1/tele")
+    app.dependency_overrides[get_db] = db
+    return app
+
+
+def _transcript(rng):
+    return "\n".join(f"{rng.choice(('Doctor', 'Patient'))}: {rng.choice(PHRASES)}" for _ in range(rng.randint(10, 60)))
+
+
+async def _run(client, payloads, concurrency):
+    latencies, statuses = [], {}
+    queue = list(payloads)
+
+    async def worker():
+        while queue:
+            payload = queue.pop()
+            started = time.perf_counter()
+            resp = await client.post("/api/v1/tele/generate-notes", json=payload)
+            latencies.append(time.perf_counter() - started)
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1], statuses
+
+
+async def main(args):
+    # app.services.chatbot configures INFO logging; keep per-request lines out of the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("app").setLevel(logging.WARNING)
+    rng = random.Random(11)
+    payloads = [{"transcript": _transcript(rng), "patient_id": f"patient-{i % 20}"} for i in range(args.requests)]
+    transport = httpx.ASGITransport(app=_app())
+    print(f"local provider: base {args.base_ms} ms + {args.per_kchar_ms} ms/1000 chars + <= {args.jitter_ms} ms jitter, "
+          f"cap {args.max_concurrency} in flight; {args.requests} requests per level")
+    print(f"{'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}  statuses")
+    for concurrency in args.concurrency:
+        llm.set_provider(llm.LocalProvider(
+            base_ms=args.base_ms, per_kchar_ms=args.per_kchar_ms, jitter_ms=args.jitter_ms,
+            max_concurrency=args.max_concurrency, timeout=60, queue_timeout=60,
+        ))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            rps, p50, p99, statuses = await _run(client, payloads, concurrency)
+        print(f"{concurrency:>7} {rps:>8.1f} {p50 * 1e3:>8.0f} {p99 * 1e3:>8.0f}  {statuses}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--base-ms", type=float, default=800)
+    parser.add_argument("--per-kchar-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,63 @@
+"""Benchmark: local medication-conflict check on transcripts of growing length.
+
+Times `InteractionIndex.check` (one Aho-Corasick pass over the transcript and
+one over the history, then pairwise index lookups) against scanning the same
+text once per drug name with a word-boundary regex, the straightforward
+alternative.
+
+Run from smartcare-backend/:
+
+    python -m benchmarks.bench_med_conflicts [--sizes 1000 10000 100000] [--number 50]
+"""
+import argparse
+import json
+import random
+import re
+import timeit
+
+from benchmarks import _fakes  # noqa: F401  (env defaults)
+from app.services import med_conflicts
+
+FILLER = [
+    "Patient reports a dry cough for three days.", "No fever or chills.", "Sleeping poorly.",
+    "Blood pressure at home around 135 over 85.", "Appetite is normal.", "Denies chest pain.",
+]
+MEDS = ["ibuprofen 400mg", "Coumadin", "sertraline", "omeprazole", "lisinopril 10mg", "metformin"]
+HISTORY = "\n".join(f"- 2026-0{n % 9 + 1}-01 | Visit | Diagnosis: follow-up | Notes: continue warfarin and clopidogrel" for n in range(50))
+
+
+def _transcript(rng, size):
+    lines = []
+    while sum(len(line) + 1 for line in lines) < size:
+        speaker = rng.choice(("Doctor", "Patient"))
+        text = rng.choice(FILLER) if rng.random() > 0.1 else f"Taking {rng.choice(MEDS)} daily."
+        lines.append(f"{speaker}: {text}")
+    return "\n".join(lines)
+
+
+def main(args):
+    index = med_conflicts.get_index()
+    with open(med_conflicts.DEFAULT_PATH, encoding="utf-8") as fh:
+        drugs = json.load(fh)["drugs"]
+    names = sorted({p for name, synonyms in drugs.items() for p in (name, *synonyms)})
+    patterns = [(re.compile(rf"(?<![a-z0-9]){re.escape(p)}(?![a-z0-9])"), p) for p in names]
+
+    def regex_mentions(text):
+        lowered = text.lower()
+        return {p for pattern, p in patterns if pattern.search(lowered)}
+
+    rng = random.Random(5)
+    print(f"{len(names)} drug names, {len(index.pairs)} indexed pairs, history {len(HISTORY)} chars")
+    print(f"{'chars':>8} {'check us':>10} {'regex-per-name us':>18} {'conflicts':>10}")
+    for size in args.sizes:
+        text = _transcript(rng, size)
+        check = timeit.timeit(lambda: index.check(text, HISTORY), number=args.number) / args.number * 1e6
+        naive = timeit.timeit(lambda: (regex_mentions(text), regex_mentions(HISTORY)), number=args.number) / args.number * 1e6
+        print(f"{len(text):>8} {check:>10.0f} {naive:>18.0f} {len(index.check(text, HISTORY)):>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--number", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,79 @@
+"""Benchmark: messages per call setup with ICE candidate coalescing.
+
+Replays trickle ICE for a number of 1:1 call setups (doctor + patient on one
+instance, Redis pub/sub stand-in attached). Each peer gathers candidates in
+bursts (host candidates at once, then srflx, then relay), the pattern browsers
+produce. For each coalescing window we count socket writes and Redis
+publishes per call setup, for protocol-2 clients (batched `candidates`) and
+protocol-1 clients (individual frames, only Redis traffic shrinks).
+
+Run from smartcare-backend/:
+
+    python -m benchmarks.bench_signaling_candidates [--calls 200] [--windows 0 10 20 50]
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from benchmarks._fakes import FakeRedisBroker, FakeWebSocket
+from app.realtime.room_state import MemoryRoomStateStore
+from app.signaling import ConnectionManager
+
+# (candidates in burst, ms before the next burst)
+BURSTS = ((6, 40), (3, 120), (2, 0))
+
+
+async def _trickle(manager, room, peer, rng):
+    n = 0
+    for size, gap_ms in BURSTS:
+        for _ in range(size):
+            frame = json.dumps({"type": "candidate", "payload": {
+                "candidate": f"candidate:{rng.randrange(1 << 30)} 1 udp 2122260223 10.0.{n}.1 5{n:04d} typ host",
+                "sdpMid": "0", "sdpMLineIndex": 0}})
+            await manager.relay(room, peer, frame, "candidate")
+            n += 1
+            await asyncio.sleep(rng.uniform(0, 0.002))
+        await asyncio.sleep(gap_ms / 1000)
+
+
+async def _run(calls, window_ms, protocol):
+    broker = FakeRedisBroker()
+    manager = ConnectionManager()
+    manager.use_redis(broker.client(), store=MemoryRoomStateStore())
+    manager.set_candidate_window(window_ms)
+    sockets, rng = [], random.Random(7)
+    setups = []
+    for c in range(calls):
+        room = f"call-{c}"
+        for peer in ("doctor", "patient"):
+            ws = FakeWebSocket()
+            sockets.append(ws)
+            await manager.connect(ws, room, peer)
+            await manager.announce(ws, room, peer, "host", protocol)
+            setups.append(_trickle(manager, room, peer, rng))
+    await asyncio.gather(*setups)
+    await asyncio.sleep(window_ms / 1000 + 0.05)
+    await asyncio.sleep(0.01)  # let socket writers drain
+    writes = sum(ws.sent for ws in sockets) / calls
+    publishes = broker.published / calls
+    await manager.channels.close()
+    return writes, publishes
+
+
+async def main(calls, windows):
+    candidates = 2 * sum(size for size, _ in BURSTS)
+    print(f"{calls} call setups, {candidates} candidates each (both peers)")
+    print(f"{'window ms':>9} {'protocol':>8}  {'socket writes/call':>18} {'redis publishes/call':>20}")
+    for window in windows:
+        for protocol in (2, 1):
+            writes, publishes = await _run(calls, window, protocol)
+            print(f"{window:>9} {protocol:>8}  {writes:>18.1f} {publishes:>20.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--windows", type=int, nargs="+", default=[0, 10, 20, 50])
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.windows))
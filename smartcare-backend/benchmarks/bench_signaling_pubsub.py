@@ -0,0 +1,124 @@
+"""Benchmark: per-instance signaling pub/sub load vs. cluster size.
+
+N signaling instances share one (in-process) Redis. Every instance hosts the
+same number of local rooms and every room sends the same number of frames, so
+total cluster traffic grows with N. With the old global `psubscribe room:*`
+each instance receives every frame in the cluster; with per-room
+subscriptions it only receives frames for its own rooms, so per-instance work
+should stay flat as N grows.
+
+Run from smartcare-backend/:
+
+    python -m benchmarks.bench_signaling_pubsub [--instances 2 4 8 16] [--rooms 50] [--frames 20]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks._fakes import FakeRedisBroker, FakeWebSocket
+from app.realtime.room_state import MemoryRoomStateStore
+from app.signaling import ConnectionManager
+
+
+class _LegacyListener:
+    """The previous listener: one pattern subscription for every room."""
+
+    def __init__(self, manager, client):
+        self.manager = manager
+        self.client = client
+        self.pubsub = client.pubsub()
+        self.received = 0
+
+    async def start(self):
+        await self.pubsub.psubscribe("room:*")
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        async for msg in self.pubsub.listen():
+            if msg.get("type") not in ("message", "pmessage"):
+                continue
+            self.received += 1
+            await self.manager._broadcast_to_room(msg["channel"].split(":", 1)[1], msg["data"])
+
+
+async def _settle(broker, managers):
+    # Wait until every subscriber queue and socket writer has drained
+    while True:
+        await asyncio.sleep(0)
+        queues = [ps.queue for subs in list(broker.subscribers.values()) + list(broker.patterns.values()) for ps in subs]
+        writers = [w for m in managers for s in m.rooms.values() for w in s.sockets.values()]
+        if all(q.empty() for q in queues) and all(not w.queue for w in writers):
+            # let listeners finish the frame they just dequeued
+            for _ in range(5):
+                await asyncio.sleep(0)
+            return
+
+
+async def _run(instances, rooms, frames, legacy):
+    broker = FakeRedisBroker()
+    store = MemoryRoomStateStore()
+    managers, listeners = [], []
+    for n in range(instances):
+        manager = ConnectionManager()
+        client = broker.client()
+        if legacy:
+            manager.use_redis(None)
+            listener = _LegacyListener(manager, client)
+            await listener.start()
+            listeners.append(listener)
+        else:
+            manager.use_redis(client, store=store)
+        for r in range(rooms):
+            room = f"i{n}-r{r}"
+            for peer in ("host", "patient"):
+                ws = FakeWebSocket()
+                await manager.connect(ws, room, peer)
+                await manager.announce(ws, room, peer, "host")
+        managers.append((manager, client))
+
+    frame = json.dumps({"type": "candidate", "candidate": "candidate:1 1 udp 2122260223 10.0.0.1 50000 typ host"})
+    cpu = time.process_time()
+    for _ in range(frames):
+        for n, (manager, client) in enumerate(managers):
+            for r in range(rooms):
+                if legacy:
+                    await client.publish(f"room:i{n}-r{r}", frame)
+                else:
+                    await manager.publish(f"i{n}-r{r}", frame)
+        await _settle(broker, [m for m, _ in managers])
+    cpu = time.process_time() - cpu
+
+    for manager, _ in managers:
+        for room in list(manager.rooms.values()):
+            for peer, writer in list(room.sockets.items()):
+                manager.disconnect(writer.websocket, room.room_id, peer)
+    await asyncio.sleep(0)
+
+    if legacy:
+        received = [l.received for l in listeners]
+        for l in listeners:
+            l.task.cancel()
+    else:
+        received = [m.channels.received for m, _ in managers]
+        for m, _ in managers:
+            await m.channels.close()
+    return sum(received) / instances, cpu * 1e3 / instances
+
+
+async def main(instance_counts, rooms, frames):
+    print(f"{rooms} local rooms per instance, {frames} frames per room")
+    print(f"{'instances':>9}  {'psubscribe msgs/inst':>20} {'ms cpu/inst':>11}  {'per-room msgs/inst':>18} {'ms cpu/inst':>11}")
+    for n in instance_counts:
+        legacy_msgs, legacy_cpu = await _run(n, rooms, frames, legacy=True)
+        room_msgs, room_cpu = await _run(n, rooms, frames, legacy=False)
+        print(f"{n:>9}  {legacy_msgs:>20.0f} {legacy_cpu:>11.2f}  {room_msgs:>18.0f} {room_cpu:>11.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--instances", type=int, nargs="+", default=[2, 4, 8, 16])
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.instances, args.rooms, args.frames))
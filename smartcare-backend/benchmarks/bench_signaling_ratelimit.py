@@ -0,0 +1,56 @@
+"""Benchmark: cost of the inbound rate limiter on the signaling relay path.
+
+Times `ConnectionManager.admit` (per-peer bucket) and the per-room bucket
+check for a peer under its limit and for a flooding peer whose frames are
+being dropped, against a no-op baseline with limiting disabled.
+
+Run from smartcare-backend/:
+
+    python -m benchmarks.bench_signaling_ratelimit [--number 200000]
+"""
+import argparse
+import asyncio
+import time
+import timeit
+
+from benchmarks._fakes import FakeWebSocket
+from app.signaling import ConnectionManager
+from app.realtime.ratelimit import RateLimit
+
+
+async def _manager(rate, burst):
+    manager = ConnectionManager()
+    manager.use_redis(None)
+    manager.peer_limit = RateLimit(rate, burst)
+    manager.room_limit = RateLimit(rate * 4, burst * 4)
+    ws = FakeWebSocket()
+    await manager.connect(ws, "room", "peer")
+    await manager.announce(ws, "room", "peer", "host")
+    return manager
+
+
+def _time(manager, number):
+    state = manager.rooms["room"]
+    monotonic = time.monotonic
+
+    def frame():
+        if manager.admit("room", "peer", monotonic()):
+            manager._admit_to_room(state)
+
+    return timeit.timeit(frame, number=number) / number * 1e6
+
+
+async def main(number):
+    print(f"{'case':>12} {'us/frame':>9}")
+    for name, rate, burst in (("disabled", 0, 0), ("under limit", 1e9, 1e9), ("flooding", 1, 1)):
+        manager = await _manager(rate, burst)
+        cost = _time(manager, number)
+        print(f"{name:>12} {cost:>9.3f}")
+        for pid in list(manager.rooms["room"].sockets):
+            manager.disconnect(None, "room", pid)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200000)
+    asyncio.run(main(parser.parse_args().number))
@@ -0,0 +1,71 @@
+"""Benchmark: per-message CPU on the signaling relay path.
+
+Compares what the endpoint spends deciding how to route one inbound frame:
+the old path (json.loads, read `type`, json.dumps again) against the
+zero-reparse path (anchored type sniff, original frame forwarded), for a
+typical ICE candidate, chat message and multi-kilobyte SDP offer, plus the
+MessagePack header sniff for binary frames.
+
+Run from smartcare-backend/:
+
+    python -m benchmarks.bench_signaling_relay [--number 20000]
+"""
+import argparse
+import json
+import timeit
+
+from benchmarks import _fakes  # noqa: F401  (env defaults)
+from app.realtime.frames import _orjson, sniff_type
+
+SDP_LINES = [
+    "v=0", "o=- 4611731400430051336 2 IN IP4 127.0.0.1", "s=-", "t=0 0",
+    "a=group:BUNDLE 0 1", "a=extmap-allow-mixed", "a=msid-semantic: WMS stream",
+] + [f"a=candidate:{i} 1 udp 2122260223 192.168.1.{i} 5{i:04d} typ host generation 0" for i in range(40)] + [
+    f"a=rtpmap:{96 + i} VP8/90000" for i in range(20)
+]
+
+FRAMES = {
+    "candidate": json.dumps({"type": "candidate", "candidate": {
+        "candidate": "candidate:842163049 1 udp 1677729535 203.0.113.7 61456 typ srflx raddr 0.0.0.0 rport 0",
+        "sdpMid": "0", "sdpMLineIndex": 0}}),
+    "chat": json.dumps({"type": "chat", "sender": "Dr. Rao", "text": "Can you hear me clearly now?"}),
+    "offer": json.dumps({"type": "offer", "sdp": {"type": "offer", "sdp": "\r\n".join(SDP_LINES)}}),
+}
+
+
+def _legacy(frame):
+    msg = json.loads(frame)
+    msg.get("type")
+    return json.dumps(msg)
+
+
+def _orjson_parse(frame):
+    return _orjson.loads(frame).get("type")
+
+
+def _msgpack_candidate() -> bytes:
+    key, value = b"type", b"candidate"
+    body = b"candidate:842163049 1 udp 1677729535 203.0.113.7 61456 typ srflx"
+    return (bytes([0x82, 0xA0 | len(key)]) + key + bytes([0xA0 | len(value)]) + value
+            + bytes([0xA0 | len(b"candidate")]) + b"candidate" + bytes([0xD9, len(body)]) + body)
+
+
+def main(number):
+    print(f"{'frame':>10} {'bytes':>6}  {'loads+dumps us':>14} {'orjson loads us':>15} {'sniff us':>9} {'speedup':>8}")
+    for name, frame in FRAMES.items():
+        legacy = timeit.timeit(lambda: _legacy(frame), number=number) / number * 1e6
+        fast = timeit.timeit(lambda: sniff_type(frame), number=number) / number * 1e6
+        if _orjson:
+            parsed = f"{timeit.timeit(lambda: _orjson_parse(frame), number=number) / number * 1e6:>15.2f}"
+        else:
+            parsed = f"{'n/a':>15}"
+        print(f"{name:>10} {len(frame):>6}  {legacy:>14.2f} {parsed} {fast:>9.2f} {legacy / fast:>7.1f}x")
+    binary = _msgpack_candidate()
+    fast = timeit.timeit(lambda: sniff_type(binary), number=number) / number * 1e6
+    print(f"{'msgpack':>10} {len(binary):>6}  {'-':>14} {'-':>15} {fast:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20000)
+    main(parser.parse_args().number)
@@ -0,0 +1,75 @@
+"""Benchmark: announce / disconnect cost vs. total number of signaling rooms.
+
+Each room holds one connected host and one pending patient. For growing room
+counts we time `announce` (host joins, is told about its room's pending
+requests) and `disconnect`. With per-room state both should stay flat; the
+"flat dicts" column replays the old announce, which scanned every pending
+request in every room.
+
+Run from smartcare-backend/:
+
+    python -m benchmarks.bench_signaling_rooms [--rooms 100 1000 10000]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks._fakes import FakeWebSocket
+from app.signaling import ConnectionManager
+
+
+async def _populate(manager, rooms):
+    for i in range(rooms):
+        room = f"room-{i}"
+        host, patient = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(host, room, "host")
+        await manager.announce(host, room, "host", "host")
+        await manager.connect(patient, room, "patient")
+        await manager.join_request(patient, room, "patient", {"name": "Pat"})
+
+
+def _legacy_announce_scan(pending, room_id):
+    # Old handler: iterate manager.pending across every room to find this room's requests
+    return [pid for (r, pid) in list(pending.items()) if r == room_id]
+
+
+async def _measure(rooms, samples):
+    manager = ConnectionManager()
+    manager.use_redis(None)
+    await _populate(manager, rooms)
+    legacy_pending = {(f"room-{i}", "patient"): None for i in range(rooms)}
+
+    announce, disconnect, legacy = 0.0, 0.0, 0.0
+    for n in range(samples):
+        room = f"room-{n % rooms}"
+        ws = FakeWebSocket()
+        await manager.connect(ws, room, "cohost")
+        start = time.perf_counter()
+        await manager.announce(ws, room, "cohost", "host")
+        announce += time.perf_counter() - start
+
+        start = time.perf_counter()
+        manager.disconnect(ws, room, "cohost")
+        disconnect += time.perf_counter() - start
+
+        start = time.perf_counter()
+        _legacy_announce_scan(legacy_pending, room)
+        legacy += time.perf_counter() - start
+    to_us = 1e6 / samples
+    return announce * to_us, disconnect * to_us, legacy * to_us
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'rooms':>8} {'announce us':>12} {'disconnect us':>14} {'flat-dict announce us':>22}")
+    for rooms in args.rooms:
+        a, d, legacy = asyncio.run(_measure(rooms, args.samples))
+        print(f"{rooms:>8} {a:>12.2f} {d:>14.2f} {legacy:>22.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Load test: signaling server over real WebSocket connections.
+
+Starts the signaling endpoint under uvicorn on 127.0.0.1 and drives N rooms
+of M peers each through real WebSocket clients:
+
+1. every room's first peer announces as host, the others announce as
+   patients, send join_request and are approved by the host;
+2. the host sends an offer (multi-kilobyte SDP), every patient answers, then
+   every peer trickles ICE candidates and sends chat messages.
+
+Every frame carries the sender's send time; receivers record fan-out latency
+(send -> receive on each other peer in the room). Reported per mode:
+p50/p99 fan-out latency, delivered messages/sec, and server-side memory per
+room (tracemalloc over app/ code, measured in a separate pass because tracing
+slows everything down).
+
+Modes:
+- local: one instance, no Redis.
+- redis: two instances (separate ConnectionManagers and uvicorn servers)
+  sharing the in-process Redis stand-in from benchmarks/_fakes.py; peers of
+  each room are spread across both, so fan-out crosses pub/sub and the room
+  state lives in RedisRoomStateStore.
+
+Run from smartcare-backend/:
+
+    python -m benchmarks.loadtest_signaling [--rooms 50] [--peers 3] [--candidates 10] [--chats 5] [--modes local redis]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+from benchmarks._fakes import FakeRedisBroker
+from fastapi import FastAPI, WebSocket
+import uvicorn
+from websockets.asyncio.client import connect
+
+from app.signaling import ConnectionManager, serve_socket
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+SDP = "\r\n".join(
+    ["v=0", "o=- 4611731400430051336 2 IN IP4 127.0.0.1", "s=-", "t=0 0", "a=group:BUNDLE 0 1"]
+    + [f"a=candidate:{i} 1 udp 2122260223 192.168.1.{i} 5{i:04d} typ host generation 0" for i in range(40)]
+    + [f"a=rtpmap:{96 + i} VP8/90000" for i in range(20)]
+)
+
+
+class Instance:
+    """One signaling worker: its own ConnectionManager behind its own uvicorn server."""
+
+    def __init__(self, name, broker=None):
+        self.manager = ConnectionManager()
+        self.manager.instance_id = name
+        self.manager.use_redis(broker.client() if broker else None)
+        app = FastAPI()
+
+        @app.websocket("/ws/{room_id}/{peer_id}")
+        async def endpoint(websocket: WebSocket, room_id: str, peer_id: str):
+            await serve_socket(self.manager, websocket, room_id, peer_id)
+
+        config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+        self.server = uvicorn.Server(config)
+        self.server.install_signal_handlers = lambda: None
+
+    async def start(self):
+        self.task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+        self.port = self.server.servers[0].sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.should_exit = True
+        await self.task
+        if self.manager.channels:
+            await self.manager.channels.close()
+
+
+class Peer:
+    def __init__(self, room, peer_id, role):
+        self.room = room
+        self.peer_id = peer_id
+        self.role = role
+        self.latencies = []
+        self.granted = asyncio.Event()
+        self.knocks = asyncio.Queue()
+
+    async def open(self, port):
+        self.ws = await connect(f"ws://127.0.0.1:{port}/ws/{self.room}/{self.peer_id}", max_size=None, ping_interval=None)
+        self.reader = asyncio.create_task(self._read())
+        await self.ws.send(json.dumps({"type": "announce", "role": self.role, "protocol": 2}))
+
+    async def send(self, mtype, **fields):
+        await self.ws.send(json.dumps({"type": mtype, "from": self.peer_id, "ts": time.perf_counter(), **fields}))
+
+    async def _read(self):
+        async for raw in self.ws:
+            now = time.perf_counter()
+            msg = json.loads(raw)
+            mtype = msg.get("type")
+            if mtype == "connection_granted":
+                self.granted.set()
+            elif mtype == "join_request":
+                self.knocks.put_nowait(msg["from"])
+            elif mtype == "candidates":
+                for frame in msg["frames"]:
+                    if frame.get("from") != self.peer_id:
+                        self.latencies.append(now - frame["ts"])
+            elif "ts" in msg and msg.get("from") != self.peer_id:
+                self.latencies.append(now - msg["ts"])
+
+    async def close(self):
+        await self.ws.close()
+        self.reader.cancel()
+
+
+async def _setup_room(r, peers_per_room, instances):
+    room = f"room-{r}"
+    host = Peer(room, "host", "host")
+    patients = [Peer(room, f"patient-{i}", "patient") for i in range(1, peers_per_room)]
+    await host.open(instances[r % len(instances)].port)
+    for i, p in enumerate(patients, start=1):
+        await p.open(instances[(r + i) % len(instances)].port)
+        await p.ws.send(json.dumps({"type": "join_request", "name": p.peer_id}))
+    for _ in patients:
+        target = await host.knocks.get()
+        await host.ws.send(json.dumps({"type": "approve_join", "target": target}))
+    await asyncio.gather(*(p.granted.wait() for p in patients))
+    return [host] + patients
+
+
+async def _traffic(peers, candidates, chats):
+    host, patients = peers[0], peers[1:]
+    await host.send("offer", payload={"type": "offer", "sdp": SDP})
+    for p in patients:
+        await p.send("answer", payload={"type": "answer", "sdp": SDP})
+    for n in range(max(candidates, chats)):
+        for p in peers:
+            if n < candidates:
+                await p.send("candidate", payload={"candidate": f"candidate:{n} 1 udp 2122260223 10.0.0.{n} 5{n:04d} typ host",
+                                                   "sdpMid": "0", "sdpMLineIndex": 0})
+            if n < chats:
+                await p.send("chat", sender=p.peer_id, text=f"message {n}")
+        await asyncio.sleep(0)
+    return 1 + len(patients) + len(peers) * (candidates + chats)
+
+
+async def run(mode, rooms, peers_per_room, candidates, chats, trace_memory=False):
+    broker = FakeRedisBroker() if mode == "redis" else None
+    instances = [Instance(f"node-{i}", broker) for i in range(2 if broker else 1)]
+    for inst in instances:
+        await inst.start()
+    if trace_memory:
+        tracemalloc.start()
+        baseline = tracemalloc.take_snapshot()
+
+    rooms_peers = await asyncio.gather(*(_setup_room(r, peers_per_room, instances) for r in range(rooms)))
+    start = time.perf_counter()
+    sent = await asyncio.gather(*(_traffic(peers, candidates, chats) for peers in rooms_peers))
+    expected = sum(n * (peers_per_room - 1) for n in sent)
+    all_peers = [p for peers in rooms_peers for p in peers]
+    deadline = time.monotonic() + 60
+    while sum(len(p.latencies) for p in all_peers) < expected and time.monotonic() < deadline:
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - start
+
+    app_kb = None
+    if trace_memory:
+        snapshot = tracemalloc.take_snapshot()
+        only_app = [tracemalloc.Filter(True, os.path.join(APP_DIR, "*"))]
+        grown = snapshot.filter_traces(only_app).compare_to(baseline.filter_traces(only_app), "filename")
+        app_kb = sum(stat.size_diff for stat in grown) / 1024 / rooms
+        tracemalloc.stop()
+
+    latencies = sorted(l for p in all_peers for l in p.latencies)
+    for p in all_peers:
+        await p.close()
+    for inst in instances:
+        await inst.stop()
+    if not latencies:
+        return None
+    return {
+        "delivered": len(latencies),
+        "expected": expected,
+        "msgs_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1e3,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3,
+        "app_kb_per_room": app_kb,
+    }
+
+
+async def main(args):
+    print(f"{args.rooms} rooms x {args.peers} peers, {args.candidates} candidates + {args.chats} chats per peer")
+    print(f"{'mode':>6} {'delivered':>10} {'msgs/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'app KB/room':>12}")
+    for mode in args.modes:
+        result = await run(mode, args.rooms, args.peers, args.candidates, args.chats)
+        memory = await run(mode, args.rooms, args.peers, args.candidates, args.chats, trace_memory=True) if args.memory else None
+        if result is None:
+            print(f"{mode:>6} no frames delivered")
+            continue
+        kb = f"{memory['app_kb_per_room']:>12.1f}" if memory else f"{'-':>12}"
+        delivered = f"{result['delivered']}/{result['expected']}"
+        print(f"{mode:>6} {delivered:>10} {result['msgs_per_sec']:>9.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {kb}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--peers", type=int, default=3)
+    parser.add_argument("--candidates", type=int, default=10)
+    parser.add_argument("--chats", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", default=["local", "redis"], choices=["local", "redis"])
+    parser.add_argument("--no-memory", dest="memory", action="store_false")
+    asyncio.run(main(parser.parse_args()))
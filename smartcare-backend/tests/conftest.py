@@ -0,0 +1,8 @@
+import os
+
+# app.core.config reads settings at import time. Provide throwaway values so
+# modules that import it can be loaded without real keys, Postgres or Redis.
+os.environ.setdefault("PRIVATE_KEY", "test-private-key")
+os.environ.setdefault("PUBLIC_KEY", "test-public-key")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("REDIS_URL", "")
@@ -0,0 +1,137 @@
+import csv
+import io
+
+import sqlalchemy as sa
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1 import admin
+from app.database import Base, get_db
+from app.models.user import User
+from app.models.appointment import Appointment
+from app.models.medical_record import MedicalRecord  # noqa: F401  (User relationship target)
+from app.models.doctor import Doctor  # noqa: F401  (User.doctor_profile backref)
+from app.models.patient import Patient  # noqa: F401  (User.patient_profile backref)
+from app.models.admin_stats import AdminStats
+from app.services import admin_stats
+from app.utils.pagination import encode_cursor
+from datetime import datetime, timezone
+
+
+def _session():
+    engine = sa.create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_counters_follow_inserts_role_changes_and_deletes():
+    db = _session()
+    assert admin_stats.read_stats(db) == {"total_users": 0, "doctors": 0, "patients": 0, "appointments": 0}
+
+    doc = User(email="d@x.io", hashed_password="h", role="doctor")
+    pat = User(email="p@x.io", hashed_password="h")
+    db.add_all([doc, pat])
+    db.commit()
+    db.add(Appointment(doctor_id=doc.id, patient_id=pat.id, appointment_time=datetime.now(timezone.utc)))
+    db.commit()
+    assert admin_stats.read_stats(db) == {"total_users": 2, "doctors": 1, "patients": 1, "appointments": 1}
+
+    pat.role = "doctor"
+    db.commit()
+    assert admin_stats.read_stats(db)["patients"] == 0
+    assert admin_stats.read_stats(db)["doctors"] == 2
+
+    db.delete(doc)
+    db.commit()
+    assert admin_stats.read_stats(db)["total_users"] == 1
+    assert admin_stats.read_stats(db)["doctors"] == 1
+
+
+def test_reconcile_corrects_drift():
+    db = _session()
+    db.add(User(email="a@x.io", hashed_password="h"))
+    db.commit()
+    admin_stats.read_stats(db)
+    # Simulate a write that bypassed the ORM hooks
+    db.execute(sa.text("INSERT INTO users (id, email, hashed_password, role) VALUES ('raw', 'r@x.io', 'h', 'patient')"))
+    db.commit()
+
+    result = admin_stats.reconcile(db)
+    assert result["drift"] == {"total_users": -1, "patients": -1}
+    assert admin_stats.read_stats(db)["total_users"] == 2
+
+
+def _admin_client(monkeypatch):
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    # the CSV export opens its own session
+    monkeypatch.setattr(admin, "SessionLocal", factory)
+
+    def override_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/v1/admin")
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[admin.require_admin] = lambda: {"role": "admin"}
+    return TestClient(app), factory
+
+
+def test_stats_endpoint_follows_inserts_and_deletes(monkeypatch):
+    client, factory = _admin_client(monkeypatch)
+    db = factory()
+    admin_stats.reconcile(db)
+    doc = User(email="d@x.io", hashed_password="h", role="doctor")
+    pats = [User(email=f"p{n}@x.io", hashed_password="h") for n in range(2)]
+    db.add_all([doc, *pats])
+    db.commit()
+    db.add(Appointment(doctor_id=doc.id, patient_id=pats[0].id, appointment_time=datetime.now(timezone.utc)))
+    db.commit()
+    assert client.get("/api/v1/admin/stats").json() == {"total_users": 3, "doctors": 1, "patients": 2, "appointments": 1}
+
+    assert client.delete(f"/api/v1/admin/users/{pats[1].id}").status_code == 200
+    assert client.get("/api/v1/admin/stats").json() == {"total_users": 2, "doctors": 1, "patients": 1, "appointments": 1}
+    assert client.delete("/api/v1/admin/users/missing").status_code == 404
+
+
+def test_csv_export_streams_header_and_filtered_rows(monkeypatch):
+    client, factory = _admin_client(monkeypatch)
+    monkeypatch.setattr(admin, "EXPORT_BATCH_SIZE", 2)
+    db = factory()
+    db.add_all([User(email=f"p{n}@x.io", hashed_password="h", full_name=f"P {n}") for n in range(5)])
+    db.add(User(email="d@x.io", hashed_password="h", role="doctor", is_active=False))
+    db.commit()
+
+    resp = client.get("/api/v1/admin/users/export.csv", params={"role": "patient"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert resp.headers["content-disposition"] == 'attachment; filename="users.csv"'
+    rows = list(csv.reader(io.StringIO(resp.text)))
+    assert rows[0] == ["id", "full_name", "email", "role", "is_active", "created_at"]
+    # batches of two, keyset on email, no row repeated or skipped
+    assert [(r[1], r[2], r[3], r[4]) for r in rows[1:]] == [(f"P {n}", f"p{n}@x.io", "patient", "True") for n in range(5)]
+
+    rows = list(csv.reader(io.StringIO(client.get("/api/v1/admin/users/export.csv", params={"is_active": "false"}).text)))
+    assert [r[2] for r in rows[1:]] == ["d@x.io"]
+
+
+def test_user_listing_rejects_cursors_that_are_not_an_email(monkeypatch):
+    client, factory = _admin_client(monkeypatch)
+    db = factory()
+    db.add_all([User(email=f"p{n}@x.io", hashed_password="h") for n in range(3)])
+    db.commit()
+
+    first = client.get("/api/v1/admin/users", params={"limit": 2})
+    assert [u["email"] for u in first.json()] == ["p0@x.io", "p1@x.io"]
+    rest = client.get("/api/v1/admin/users", params={"cursor": first.headers["X-Next-Cursor"]})
+    assert [u["email"] for u in rest.json()] == ["p2@x.io"]
+    for values in ([7], [["p1@x.io"]], [None]):
+        resp = client.get("/api/v1/admin/users", params={"cursor": encode_cursor(*values)})
+        assert resp.status_code == 400 and resp.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from app.services.doctor_directory import DirectoryCache, DirectoryPage, make_key
+
+
+def test_hit_after_build_and_etag_match():
+    cache = DirectoryCache()
+    key = make_key(" Smith ", None, None, 50)
+    assert key == make_key("smith", "", None, 50)
+    page = cache.get_or_build(key, lambda: DirectoryPage(b"[]", None))
+    assert cache.get_or_build(key, lambda: DirectoryPage(b"[1]", None)) is page
+    assert page.matches(page.etag) and page.matches("*") and not page.matches('"other"')
+
+
+def test_concurrent_misses_build_once():
+    cache = DirectoryCache()
+    calls = []
+
+    def build():
+        calls.append(1)
+        time.sleep(0.05)
+        return DirectoryPage(b"[]", None)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_build(("k", None, None, 1, ()), build))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert len({id(r) for r in results}) == 1
+
+
+def test_invalidate_discards_in_flight_build_and_lru_evicts():
+    cache = DirectoryCache(max_entries=2)
+
+    def build_then_invalidate():
+        cache.invalidate()
+        return DirectoryPage(b"stale", None)
+
+    cache.get_or_build(("a", None, None, 1, ()), build_then_invalidate)
+    assert len(cache) == 0
+
+    for name in ("a", "b", "c"):
+        cache.get_or_build((name, None, None, 1, ()), lambda: DirectoryPage(b"[]", None))
+    assert len(cache) == 2
+
+
+def test_invalidate_publishes_on_the_listener_loop_without_blocking(monkeypatch):
+    import asyncio
+    from app.services import doctor_directory
+
+    published = []
+
+    class FakeClient:
+        async def publish(self, channel, message):
+            published.append((channel, message, threading.current_thread()))
+
+    # no listener connected (REDIS_URL unset or Redis down): local only
+    doctor_directory.invalidate()
+    assert published == []
+
+    async def scenario():
+        monkeypatch.setattr(doctor_directory, "_loop", asyncio.get_running_loop())
+        monkeypatch.setattr(doctor_directory, "_client", FakeClient())
+        # a sync endpoint invalidates from a worker thread
+        await asyncio.to_thread(doctor_directory.invalidate)
+        await asyncio.sleep(0.01)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(scenario())
+    assert published == [(doctor_directory.INVALIDATION_CHANNEL, doctor_directory.INSTANCE_ID, loop_thread)]
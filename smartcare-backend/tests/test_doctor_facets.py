@@ -0,0 +1,96 @@
+import sqlalchemy as sa
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1 import admin
+from app.database import Base, get_db
+from app.models.doctor import Doctor
+from app.models.medical_record import MedicalRecord  # noqa: F401  (User relationship target)
+from app.models.patient import Patient  # noqa: F401  (User.patient_profile backref)
+from app.models.user import User
+from app.services import doctor_facets
+from app.services.doctor_facets import FacetIndex, bitset_positions, fee_bucket
+from app.services.doctor_search import _postgres_statement
+
+
+def _index():
+    idx = FacetIndex()
+    idx.build([
+        (10, "Cardiology", 80.0, {"mon": ["09:00", "17:00"], "wed": ["09:00", "12:00"]}),
+        (11, "cardiology ", 150.0, {"tue": ["10:00", "14:00"]}),
+        (12, "Dermatology", 40.0, {"mon": ["09:00", "17:00"]}),
+        (13, None, 600.0, None),
+    ])
+    return idx
+
+
+def _counts(result, facet):
+    return {e["value"]: e["count"] for e in result["facets"][facet]}
+
+
+def test_bitset_positions():
+    assert bitset_positions(0) == []
+    assert bitset_positions(0b101001) == [0, 3, 5]
+
+
+def test_fee_buckets():
+    assert fee_bucket(None) == "0-50"
+    assert fee_bucket(100) == "100-200"
+    assert fee_bucket(10_000) == "500+"
+
+
+def test_counts_are_disjunctive_within_and_conjunctive_across_facets():
+    idx = _index()
+    all_counts = idx.counts({})
+    assert all_counts["total"] == 4
+    assert _counts(all_counts, "specialization") == {"Cardiology": 2, "Dermatology": 1}
+
+    selected = idx.counts({"specialization": ["cardiology"], "day": ["Monday"]})
+    assert selected["total"] == 1
+    # Specialization counts ignore the specialization selection itself
+    assert _counts(selected, "specialization") == {"Cardiology": 1, "Dermatology": 1}
+    assert _counts(selected, "day") == {"mon": 1, "tue": 1, "wed": 1}
+    assert idx.matching_ids({"fee": ["0-50", "50-100"]}) == {10, 12}
+
+
+def test_upsert_moves_doctor_between_values():
+    idx = _index()
+    idx.upsert(12, "Cardiology", 250.0, {"fri": []})
+    assert _counts(idx.counts({}), "specialization") == {"Cardiology": 3}
+    assert idx.matching_ids({"day": ["fri"]}) == {12}
+    idx.remove(12)
+    assert idx.counts({})["total"] == 3
+
+
+def test_deleting_a_doctor_drops_it_from_the_facets(monkeypatch):
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    users = [User(email=f"d{n}@x.io", hashed_password="h", role="doctor") for n in range(2)]
+    db.add_all(users)
+    db.commit()
+    doctors = [Doctor(user_id=u.id, specialization="Cardiology", consultation_fee=80.0) for u in users]
+    db.add_all(doctors)
+    db.commit()
+    monkeypatch.setattr(doctor_facets, "_index", FacetIndex())
+    assert doctor_facets.get_index(db).counts({})["total"] == 2
+
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/v1/admin")
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[admin.require_admin] = lambda: {"role": "admin"}
+    assert TestClient(app).delete(f"/api/v1/admin/users/{users[0].id}").status_code == 200
+
+    index = doctor_facets.get_index(db)
+    assert index.counts({})["total"] == 1
+    assert index.matching_ids({"specialization": ["cardiology"]}) == {doctors[1].id}
+    assert db.query(Doctor).count() == 1
+
+
+def test_postgres_search_sends_allowed_ids_as_one_array():
+    compiled = _postgres_statement("smith", None, None, 10, frozenset(range(500))).compile(dialect=postgresql.dialect())
+    assert "= ANY (%(allowed_ids)s::INTEGER[])" in str(compiled)
+    assert compiled.params["allowed_ids"] == list(range(500))
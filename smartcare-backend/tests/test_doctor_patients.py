@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1 import auth, patients
+from app.database import Base, get_db
+from app.models.user import User
+from app.models.appointment import Appointment
+from app.models.medical_record import MedicalRecord  # noqa: F401  (User relationship target)
+from app.models.doctor import Doctor  # noqa: F401  (User.doctor_profile backref)
+from app.models.patient import Patient  # noqa: F401  (User.patient_profile backref)
+from app.models.doctor_patient import DoctorPatient
+from app.services.doctor_patients import link_patient, name_key
+
+
+def _session():
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_name_key_falls_back_to_email():
+    assert name_key(" Ada Lovelace ", "a@x.io") == "ada lovelace"
+    assert name_key(None, "Grace@x.io") == "grace"
+
+
+def test_booking_links_patient_once():
+    db = _session()
+    doc = User(email="doc@x.io", hashed_password="h", role="doctor")
+    pat = User(email="pat@x.io", hashed_password="h", full_name="Zoe Park")
+    other = User(email="other@x.io", hashed_password="h")
+    db.add_all([doc, pat, other])
+    db.commit()
+
+    for hour in (9, 10):
+        db.add(Appointment(doctor_id=doc.id, patient_id=pat.id, appointment_time=datetime(2026, 1, 1, hour, tzinfo=timezone.utc)))
+        db.commit()
+    link_patient(db.connection(), doc.id, pat.id)
+    link_patient(db.connection(), doc.id, None)
+    db.commit()
+
+    links = db.query(DoctorPatient).all()
+    assert [(l.doctor_id, l.patient_id, l.patient_name) for l in links] == [(doc.id, pat.id, "zoe park")]
+
+
+def test_roster_endpoint_is_scoped_to_the_doctor_and_paged_by_name():
+    db = _session()
+    doc = User(email="doc@x.io", hashed_password="h", role="doctor")
+    other_doc = User(email="doc2@x.io", hashed_password="h", role="doctor")
+    pats = [User(email=f"p{n}@x.io", hashed_password="h", full_name=name)
+            for n, name in enumerate(["Zoe Park", "Adam Li", "Zack Moss", "Bea Kim"])]
+    admin_user = User(email="admin@x.io", hashed_password="h", role="admin")
+    db.add_all([doc, other_doc, admin_user, *pats])
+    db.commit()
+    for hour, pat in enumerate(pats[:3]):
+        db.add(Appointment(doctor_id=doc.id, patient_id=pat.id, appointment_time=datetime(2026, 1, 1, 9 + hour, tzinfo=timezone.utc)))
+    db.add(Appointment(doctor_id=other_doc.id, patient_id=pats[3].id, appointment_time=datetime(2026, 1, 1, 9, tzinfo=timezone.utc)))
+    db.commit()
+
+    app = FastAPI()
+    app.include_router(patients.router, prefix="/api/v1/patients")
+    app.dependency_overrides[get_db] = lambda: db
+    client = TestClient(app)
+
+    def as_user(user):
+        app.dependency_overrides[auth.get_current_user] = lambda: user
+
+    as_user(doc)
+    first = client.get("/api/v1/patients/", params={"limit": 2})
+    assert [p["name"] for p in first.json()] == ["Adam Li", "Zack Moss"]
+    second = client.get("/api/v1/patients/", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert [p["name"] for p in second.json()] == ["Zoe Park"]
+    assert "X-Next-Cursor" not in second.headers
+    assert [p["name"] for p in client.get("/api/v1/patients/", params={"search": "z"}).json()] == ["Zack Moss", "Zoe Park"]
+
+    as_user(other_doc)
+    assert [p["name"] for p in client.get("/api/v1/patients/").json()] == ["Bea Kim"]
+
+    as_user(admin_user)
+    assert len(client.get("/api/v1/patients/").json()) == 4
+
+    as_user(pats[0])
+    assert client.get("/api/v1/patients/").status_code == 403
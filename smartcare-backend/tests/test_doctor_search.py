@@ -0,0 +1,56 @@
+from sqlalchemy.dialects import postgresql
+
+from app.models.medical_record import MedicalRecord  # noqa: F401  (User relationship target)
+from app.models.patient import Patient  # noqa: F401  (User.patient_profile backref)
+from app.services.doctor_search import TrigramIndex, _postgres_statement, top_page, trigrams
+from app.utils.pagination import decode_cursor
+
+
+def _index():
+    idx = TrigramIndex()
+    idx.build([
+        (1, "Jonathan Smith", "Cardiology"),
+        (2, "Maria Garcia", "Dermatology"),
+        (3, "John Smithers", "Cardiac Surgery"),
+        (4, "Ana Lopez", "Pediatrics"),
+    ])
+    return idx
+
+
+def _ranked(scores):
+    return [d for d, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))]
+
+
+def test_trigrams_are_padded_per_word():
+    assert trigrams("Al") == {"  a", " al", "al "}
+    assert trigrams(None) == frozenset()
+
+
+def test_search_ranks_and_tolerates_typos():
+    idx = _index()
+    ranked = _ranked(idx.search("smith"))
+    assert ranked[0] == 1 and 3 in ranked
+    # Transposed letters still find the doctor
+    assert _ranked(idx.search("garica"))[0] == 2
+    cardio = _ranked(idx.search(specialization="cardio"))
+    assert cardio[0] == 1 and 2 not in cardio
+
+
+def test_upsert_replaces_previous_terms():
+    idx = _index()
+    idx.upsert(4, "Ana Lopez", "Cardiology")
+    assert 4 in idx.search(specialization="cardiology")
+    assert idx.search(specialization="pediatrics") == {}
+
+
+def test_cursor_pages_cover_all_matches_once():
+    scores = _index().search("smith")
+    ids, cursor = top_page(scores, None, 1)
+    rest, last = top_page(scores, decode_cursor(cursor, 2), 10)
+    assert ids + rest == _ranked(scores)
+    assert last is None
+
+
+def test_postgres_cursor_compares_scores_as_real():
+    sql = str(_postgres_statement("smith", None, [0.4285714, 7], 10).compile(dialect=postgresql.dialect()))
+    assert sql.count("AS REAL)") == 2
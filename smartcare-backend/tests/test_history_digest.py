@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+from cryptography.fernet import Fernet
+from sqlalchemy.orm import sessionmaker
+
+from app.core.encryption import encrypt_data
+from app.database import Base
+from app.models.doctor import Doctor  # noqa: F401  (User.doctor_profile backref)
+from app.models.medical_record import MedicalRecord
+from app.models.patient import Patient  # noqa: F401  (User.patient_profile backref)
+from app.models.user import User
+from app.services import history_digest
+from app.services.history_digest import HistoryDigestCache
+
+
+T0 = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setenv("ENCRYPTION_KEY", Fernet.generate_key().decode())
+    engine = sa.create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([User(id=pid, email=f"{pid}@x.io", hashed_password="h") for pid in ("p1", "other")])
+    session.commit()
+    return session
+
+
+def _add(db, n, patient="p1", doctor=None):
+    record = MedicalRecord(id=f"r{n}", user_id=patient, doctor_name=doctor or f"Dr {n}",
+                           diagnosis=encrypt_data(f"dx {n}"), prescription=encrypt_data(f"rx {n}"),
+                           notes=encrypt_data(f"notes {n}"), created_at=T0 + timedelta(days=n))
+    db.add(record)
+    db.commit()
+    return record
+
+
+def test_digest_is_reused_until_a_newer_record_appears(db):
+    cache = HistoryDigestCache()
+    for n in range(3):
+        _add(db, n)
+    _add(db, 9, patient="other")
+
+    lines = cache.lines(db, "p1")
+    assert [line.split(" | ")[1] for line in lines] == ["Dr 2", "Dr 1", "Dr 0"]
+    assert "Diagnosis: dx 2 | Prescription: rx 2 | Notes: notes 2" in lines[0]
+    assert cache.lines(db, "p1") == lines
+    assert (cache.rebuilds, cache.hits, cache.decrypted_records) == (1, 1, 3)
+
+    # written by another worker: only the new record is decrypted
+    _add(db, 3)
+    lines = cache.lines(db, "p1")
+    assert lines[0].split(" | ")[1] == "Dr 3" and len(lines) == 4
+    assert (cache.incremental, cache.decrypted_records) == (1, 4)
+
+
+def test_record_added_folds_plaintext_without_decrypting(db):
+    cache = HistoryDigestCache()
+    _add(db, 0)
+    cache.lines(db, "p1")
+    record = _add(db, 1)
+    cache.record_added("p1", record, "dx 1", "notes 1", "rx 1")
+    lines = cache.lines(db, "p1")
+    assert lines[0].endswith("Diagnosis: dx 1 | Prescription: rx 1 | Notes: notes 1") and len(lines) == 2
+    assert (cache.hits, cache.decrypted_records) == (1, 1)
+
+
+def test_removed_newest_record_forces_rebuild_and_entries_are_sealed(db):
+    cache = HistoryDigestCache(max_records=2)
+    for n in range(3):
+        _add(db, n, doctor="Dr Asthma")
+    assert len(cache.lines(db, "p1")) == 2
+    entry = cache._entries["p1"]
+    assert b"Asthma" not in entry.sealed and b"dx 2" not in entry.sealed
+
+    db.query(MedicalRecord).filter(MedicalRecord.id == "r2").delete()
+    db.commit()
+    lines = cache.lines(db, "p1")
+    assert [line.split("Diagnosis: ")[1].split(" |")[0] for line in lines] == ["dx 1", "dx 0"]
+    assert cache.rebuilds == 2
+
+    db.query(MedicalRecord).delete()
+    db.commit()
+    assert cache.lines(db, "p1") == [] and len(cache) == 0
+
+
+def test_history_text_reads_the_real_model(db, monkeypatch):
+    monkeypatch.setattr(history_digest, "cache", HistoryDigestCache())
+    assert history_digest.history_text(db, "p1") == history_digest.NO_HISTORY
+    db.add(MedicalRecord(id="rx", user_id="p1", doctor_name="Dr Kim", diagnosis=encrypt_data("atrial fibrillation"),
+                         prescription=encrypt_data("warfarin 5mg daily"), date=T0, created_at=T0))
+    db.commit()
+    assert history_digest.history_text(db, "p1") == (
+        "- 2026-01-01T00:00:00 | Dr Kim | Diagnosis: atrial fibrillation | Prescription: warfarin 5mg daily | Notes: "
+    )
@@ -0,0 +1,176 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.services import live_transcript, llm, transcript_summary
+from app.services.live_transcript import LiveSession, LiveTranscripts, SegmentRejected
+from app.services.llm import Completion, LocalProvider
+
+
+class CountingProvider(LocalProvider):
+    def __init__(self):
+        super().__init__(base_ms=0, per_kchar_ms=0, jitter_ms=0)
+        self.excerpts = []
+
+    async def _complete(self, prompt):
+        excerpt = prompt.split("Excerpt:\n", 1)[-1].split("\n\nProvide", 1)[0]
+        self.excerpts.append(excerpt)
+        return Completion(f"summary of {excerpt.splitlines()[0]}")
+
+
+def _session(window_chars=60):
+    return LiveSession("s1", "p1", window_chars=window_chars, debounce=0.01)
+
+
+def test_windows_are_stable_and_corrections_stay_in_place():
+    session = _session()
+    for n in range(6):
+        session.upsert(str(n), f"Patient: segment {n} text")
+    assert [len(ids) for ids in session.windows] == [2, 2, 2]
+    before = session.window_texts()
+    assert not session.upsert("3", "Patient: segment 3 text")
+    assert session.upsert("3", "Patient: segment 3 corrected to a much longer text")
+    after = session.window_texts()
+    # the window keeps its segments; only it and the overlap of the next one change
+    assert [len(ids) for ids in session.windows] == [2, 2, 2]
+    assert after[0] == before[0] and after[1] != before[1] and after[2] != before[2]
+    assert after[2].startswith("Patient: segment 3 corrected")
+    assert session.transcript().splitlines()[3].endswith("much longer text")
+
+
+def test_rolling_summary_only_resummarizes_changed_windows():
+    transcript_summary.cache.clear()
+    provider = CountingProvider()
+    llm.set_provider(provider)
+
+    async def scenario():
+        session = _session()
+        pushed = []
+
+        async def notify(msg):
+            pushed.append(msg)
+
+        session.notify = notify
+        for n in range(7):
+            session.upsert(str(n), f"Patient: segment {n} text")
+            session.schedule()
+        await asyncio.sleep(0.05)
+        # three closed windows summarized, the open one left for the end of the call
+        assert len(provider.excerpts) == 3 and pushed[-1]["windows"] == 3
+        assert "summary of Patient: segment 3 text" in session.summary
+
+        session.upsert("0", "Patient: segment 0 corrected")
+        session.schedule()
+        await asyncio.sleep(0.05)
+        assert len(provider.excerpts) == 4 and len(pushed) == 2
+        assert "summary of Patient: segment 0 corrected" in pushed[-1]["summary"]
+
+        text = await session.note_input()
+        assert len(provider.excerpts) == 5 and provider.excerpts[-1].endswith("segment 6 text")
+        assert text.count("[Part ") == 4
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        llm.set_provider(None)
+
+
+def test_segments_are_capped_by_count_and_length():
+    session = LiveSession("s1", "p1", max_segments=2, max_segment_chars=20)
+    session.upsert("1", "Patient: cough")
+    session.upsert("2", "Doctor: fever?")
+    with pytest.raises(SegmentRejected):
+        session.upsert("3", "Patient: no")
+    with pytest.raises(SegmentRejected):
+        session.upsert("1", "Patient: " + "x" * 20)
+    # corrections to held segments are still accepted
+    assert session.upsert("1", "Patient: dry cough")
+    assert len(session) == 2
+
+
+def test_registry_binds_sessions_to_an_owner_and_patient_and_evicts():
+    registry = LiveTranscripts(max_sessions=2)
+    first, created = registry.get("a", "p1", "d1")
+    assert created and registry.get("a", "p1", "d1") == (first, False)
+    first.upsert("1", "Patient: cough")
+    for patient_id, owner_id in (("p2", "d1"), ("p1", "d2")):
+        with pytest.raises(PermissionError):
+            registry.get("a", patient_id, owner_id)
+    # the refused caller did not replace or reset the session
+    assert registry.get("a", "p1", "d1") == (first, False) and len(first) == 1
+    registry.get("b", "p1", "d1")
+    registry.get("c", "p1", "d1")
+    assert len(registry) == 2 and registry.stats()["sessions"] == 2
+
+
+def _socket_app(monkeypatch):
+    from app.api.v1 import tele
+    from app.models.user import User
+
+    users = {"doc-token": User(id="d1", role="doctor"), "doc2-token": User(id="d2", role="doctor"), "pat-token": User(id="p1", role="patient")}
+
+    def fake_current_user(authorization, db):
+        user = users.get(authorization.split(" ", 1)[1])
+        if user is None:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        return user
+
+    monkeypatch.setattr(tele, "get_current_user", fake_current_user)
+    monkeypatch.setattr(live_transcript, "sessions", LiveTranscripts())
+    app = FastAPI()
+    app.include_router(tele.router, prefix="/api/v1/tele")
+    return app
+
+
+def test_socket_requires_a_doctor_and_keeps_sessions_with_their_owner(monkeypatch):
+    app = _socket_app(monkeypatch)
+    with TestClient(app) as client:
+        for url in ("/api/v1/tele/live/call-1?patient_id=p1", "/api/v1/tele/live/call-1?patient_id=p1&token=pat-token"):
+            with client.websocket_connect(url) as ws:
+                if "token" not in url:
+                    ws.send_json({"type": "segment", "id": 1, "text": "no auth frame"})
+                with pytest.raises(WebSocketDisconnect) as closed:
+                    ws.receive_json()
+                assert closed.value.code == 1008
+
+        with client.websocket_connect("/api/v1/tele/live/call-1?patient_id=p1") as ws:
+            ws.send_json({"type": "auth", "token": "doc-token"})
+            assert ws.receive_json() == {"type": "ready", "segments": 0}
+            ws.send_json({"type": "segment", "id": 1, "text": "Dry cough."})
+            ws.send_json({"type": "segment", "id": 2, "text": "x" * 5000})
+            assert ws.receive_json()["type"] == "error"
+            # another doctor, or the same id for another patient, cannot take the session over
+            for url in ("/api/v1/tele/live/call-1?patient_id=p1&token=doc2-token", "/api/v1/tele/live/call-1?patient_id=p2&token=doc-token"):
+                with client.websocket_connect(url) as intruder:
+                    with pytest.raises(WebSocketDisconnect) as closed:
+                        intruder.receive_json()
+                    assert closed.value.code == 1008
+            session, _ = live_transcript.sessions.get("call-1", "p1", "d1")
+            assert session.notify is not None and len(session) == 1
+
+
+def test_socket_ingests_segments_and_streams_the_note(monkeypatch):
+    app = _socket_app(monkeypatch)
+    llm.set_provider(LocalProvider(base_ms=0, per_kchar_ms=0, jitter_ms=0))
+    try:
+        with TestClient(app) as client:
+            with client.websocket_connect("/api/v1/tele/live/call-1?patient_id=p1&token=doc-token") as ws:
+                assert ws.receive_json() == {"type": "ready", "segments": 0}
+                ws.send_json({"type": "segment", "id": 1, "speaker": "Patient", "text": "Dry cough for three days."})
+                ws.send_json({"type": "segment", "id": 2, "speaker": "Doctor", "text": "Any fever?"})
+                ws.send_json({"type": "segment", "id": 1, "speaker": "Patient", "text": "Dry cough for four days."})
+            # a reconnect resumes the same session
+            with client.websocket_connect("/api/v1/tele/live/call-1?patient_id=p1&token=doc-token") as ws:
+                assert ws.receive_json() == {"type": "ready", "segments": 2}
+                ws.send_json({"type": "finalize"})
+                frames = []
+                while not frames or frames[-1]["type"] not in ("done", "error"):
+                    frames.append(ws.receive_json())
+        assert frames[-1]["type"] == "done"
+        assert frames[-1]["notes"]["subjective"] == "Patient: Dry cough for four days. Doctor: Any fever?"
+        assert [f["name"] for f in frames if f["type"] == "section"] == ["subjective", "objective", "assessment", "plan"]
+    finally:
+        llm.set_provider(None)
@@ -0,0 +1,139 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+import sqlalchemy as sa
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, get_db
+from app.models.user import User  # noqa: F401  (MedicalRecord relationship target)
+from app.models.medical_record import MedicalRecord  # noqa: F401
+from app.models.doctor import Doctor  # noqa: F401  (User.doctor_profile backref)
+from app.models.patient import Patient  # noqa: F401  (User.patient_profile backref)
+from app.services import llm
+from app.services.llm import Completion, GeminiProvider, LLMProvider, LocalProvider
+
+
+class SleepyProvider(LLMProvider):
+    name = "sleepy"
+
+    def __init__(self, delay, **limits):
+        super().__init__("sleepy-1", **limits)
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def _complete(self, prompt):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return Completion(f"echo:{prompt}")
+
+
+def test_calls_respect_the_concurrency_cap_without_blocking_the_loop():
+    async def scenario():
+        provider = SleepyProvider(0.02, max_concurrency=2)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        background = asyncio.create_task(ticker())
+        results = await asyncio.gather(*(provider.complete(str(i)) for i in range(6)))
+        background.cancel()
+        assert [r.text for r in results] == [f"echo:{i}" for i in range(6)]
+        assert provider.peak == 2
+        # the event loop kept running while calls were in flight
+        assert ticks > 10
+        metrics = provider.metrics()
+        assert metrics["provider"] == "sleepy" and metrics["calls"] == 6 and metrics["in_flight"] == 0
+        assert metrics["latency_ms"]["window"] == 6 and metrics["latency_ms"]["p50"] >= 15
+
+    asyncio.run(scenario())
+
+
+def test_timeouts_and_busy_rejections_map_to_http_errors():
+    async def scenario():
+        provider = SleepyProvider(1.0, max_concurrency=1, timeout=0.02, queue_timeout=0.01)
+        first = asyncio.create_task(provider.complete("slow"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as busy:
+            await provider.complete("queued")
+        with pytest.raises(HTTPException) as timed_out:
+            await first
+        assert (busy.value.status_code, timed_out.value.status_code) == (503, 504)
+        metrics = provider.metrics()
+        assert (metrics["rejected"], metrics["timeouts"], metrics["in_flight"]) == (1, 1, 0)
+
+    asyncio.run(scenario())
+
+
+def test_gemini_reuses_one_async_client_and_keeps_the_baa_guard(monkeypatch):
+    calls = []
+
+    async def generate_content(model, contents):
+        calls.append((model, contents))
+        return SimpleNamespace(text="note")
+
+    provider = GeminiProvider(model="models/test")
+    provider._client, provider._api_key = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))), "key"
+
+    monkeypatch.setenv("GEMINI_API_KEY", "key")
+    monkeypatch.delenv("GEMINI_BAA_SIGNED", raising=False)
+    with pytest.raises(HTTPException) as blocked:
+        asyncio.run(provider.complete("phi"))
+    assert blocked.value.status_code == 503 and calls == []
+
+    monkeypatch.setenv("GEMINI_ENTERPRISE", "true")
+    monkeypatch.setenv("GEMINI_BAA_SIGNED", "true")
+    client = provider._client
+    assert [asyncio.run(provider.complete(p)).text for p in ("a", "b")] == ["note", "note"]
+    assert provider._client is client and calls == [("models/test", "a"), ("models/test", "b")]
+
+
+def test_local_provider_is_deterministic():
+    provider = LocalProvider(base_ms=100, per_kchar_ms=50, jitter_ms=10)
+    prompt = "Convert to a SOAP Note.\n\nTranscript:\nPatient reports a dry cough.\nNo fever.\n\nProvide the SOAP Note (JSON)"
+    assert provider.latency(prompt) == provider.latency(prompt)
+    assert 0.1 <= provider.latency(prompt) <= 0.1 + 0.05 * len(prompt) / 1000 + 0.01
+    note = json.loads(provider.render(prompt))
+    assert note["subjective"] == "Patient reports a dry cough. No fever."
+    assert provider.render(prompt) == provider.render(prompt) != provider.render(prompt + " ")
+
+
+def test_generate_notes_runs_offline_on_the_local_provider():
+    from app.api.v1 import tele
+
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)
+
+    def override_db():
+        db = session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(tele.router, prefix="/api/v1/tele")
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[tele.require_doctor] = lambda: None
+    llm.set_provider(LocalProvider(base_ms=1, per_kchar_ms=0, jitter_ms=0))
+    try:
+        with TestClient(app) as client:
+            resp = client.post("/api/v1/tele/generate-notes", json={"transcript": "Cough for 3 days.", "patient_id": "p1"})
+        assert resp.status_code == 200
+        assert llm.get_provider().metrics()["calls"] == 1
+    finally:
+        llm.set_provider(None)
@@ -0,0 +1,146 @@
+import json
+
+import pytest
+import sqlalchemy as sa
+from cryptography.fernet import Fernet
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.encryption import encrypt_data
+from app.database import Base, get_db
+from app.models.user import User  # noqa: F401  (MedicalRecord relationship target)
+from app.models.medical_record import MedicalRecord  # noqa: F401
+from app.models.doctor import Doctor  # noqa: F401  (User.doctor_profile backref)
+from app.models.patient import Patient  # noqa: F401  (User.patient_profile backref)
+from app.services import history_digest, llm, med_conflicts, response_cache
+from app.services.llm import LocalProvider
+from app.services.med_conflicts import InteractionIndex
+from app.utils.aho_corasick import AhoCorasick
+
+
+def test_matcher_finds_overlapping_whole_word_patterns_in_one_pass():
+    matcher = AhoCorasick([("he", 1), ("she", 2), ("hers", 3), ("his", 4), ("isosorbide mononitrate", 5), ("isosorbide", 6)])
+    assert sorted(v for _, _, v in matcher.iter("She said HIS and hers")) == [2, 3, 4]
+    # "he" inside "she"/"hers" is not a whole word
+    assert [v for _, _, v in matcher.iter("ushers")] == []
+    assert sorted(v for _, _, v in matcher.iter("isosorbide mononitrate 30mg")) == [5, 6]
+    assert [(s, e) for s, e, v in matcher.iter("take he.") if v == 1] == [(5, 7)]
+
+
+def test_bundled_index_expands_classes_and_reads_brand_names():
+    index = med_conflicts.get_index()
+    assert index.pairs[frozenset(("warfarin", "naproxen"))]["severity"] == "major"
+    assert index.pairs[frozenset(("tadalafil", "isosorbide"))]["severity"] == "contraindicated"
+    assert index.mentions("Started Advil 400mg; on Coumadin, trimethoprim-sulfamethoxazole") == {
+        "ibuprofen", "warfarin", "trimethoprim-sulfamethoxazole",
+    }
+    assert index.mentions("Moved to cardiology, no meds") == set()
+
+
+def test_conflicts_pair_new_medications_with_history():
+    history = "- 2026-01-01 | Afib | Diagnosis: atrial fibrillation | Notes: on warfarin 5mg daily, lisinopril"
+    conflicts = med_conflicts.check("Doctor: let's start ibuprofen and Viagra. Patient: I use nitroglycerin spray.", history)
+    assert [(c["drugs"], c["severity"]) for c in conflicts] == [
+        (["nitroglycerin", "sildenafil"], "contraindicated"),
+        (["ibuprofen", "warfarin"], "major"),
+    ]
+    assert conflicts[1]["found_in"] == {"ibuprofen": "transcript", "warfarin": "history"}
+    # conflicts only within the history are not new
+    assert med_conflicts.check("Follow-up in two weeks.", history + " aspirin") == []
+
+
+def test_invalid_data_is_rejected_at_load():
+    data = {"drugs": {"a": []}, "classes": {"x": ["a", "b"]}, "interactions": []}
+    with pytest.raises(ValueError):
+        InteractionIndex(data)
+    with pytest.raises(ValueError):
+        InteractionIndex({"drugs": {"a": []}, "interactions": [{"a": "a", "b": "c", "severity": "major", "description": ""}]})
+
+
+class DisabledProvider(LocalProvider):
+    def check_ready(self):
+        raise HTTPException(status_code=503, detail="AI service disabled for PHI protection")
+
+
+def _client(records=()):
+    from app.api.v1 import tele
+
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)
+    with session() as db:
+        db.add_all(records)
+        db.commit()
+
+    def override_db():
+        db = session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(tele.router, prefix="/api/v1/tele")
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[tele.require_doctor] = lambda: None
+    return TestClient(app)
+
+
+def test_conflicts_are_returned_when_the_model_is_disabled():
+    payload = {"transcript": "Prescribing clarithromycin. Continue simvastatin.", "patient_id": "p1"}
+    llm.set_provider(DisabledProvider(base_ms=0, per_kchar_ms=0, jitter_ms=0))
+    history_digest.cache.clear()
+    try:
+        with _client() as client:
+            resp = client.post("/api/v1/tele/generate-notes", json=payload)
+            streamed = client.post("/api/v1/tele/generate-notes/stream", json=payload)
+        assert resp.status_code == streamed.status_code == 503
+        for body in (resp.json(), streamed.json()):
+            assert body["detail"] == "AI service disabled for PHI protection"
+            assert [c["drugs"] for c in body["conflicts"]] == [["clarithromycin", "simvastatin"]]
+    finally:
+        llm.set_provider(None)
+
+
+def test_stream_sends_conflicts_first_and_passes_them_to_the_model():
+    prompts = []
+
+    class Recording(LocalProvider):
+        async def _complete(self, prompt):
+            prompts.append(prompt)
+            return await super()._complete(prompt)
+
+    llm.set_provider(Recording(base_ms=0, per_kchar_ms=0, jitter_ms=0))
+    response_cache.cache.clear()
+    try:
+        with _client() as client:
+            resp = client.post("/api/v1/tele/generate-notes/stream",
+                               json={"transcript": "Start Zoloft 50mg; already on phenelzine.", "patient_id": "p1"})
+            notes = client.post("/api/v1/tele/generate-notes",
+                                json={"transcript": "Start lithium; takes naproxen.", "patient_id": "p1"})
+        first = resp.text.split("\n\n")[0].split("\n")
+        assert first[0] == "event: conflicts"
+        assert json.loads(first[1][len("data: "):])["conflicts"][0]["severity"] == "contraindicated"
+        assert notes.json()["conflicts"][0]["drugs"] == ["lithium", "naproxen"]
+        assert "- lithium + naproxen (major; naproxen from transcript)" in prompts[-1]
+    finally:
+        llm.set_provider(None)
+
+
+def test_history_half_of_the_check_reads_the_patients_records(monkeypatch):
+    monkeypatch.setenv("ENCRYPTION_KEY", Fernet.generate_key().decode())
+    llm.set_provider(LocalProvider(base_ms=0, per_kchar_ms=0, jitter_ms=0))
+    history_digest.cache.clear()
+    record = MedicalRecord(user_id="p1", doctor_name="Dr Kim", diagnosis=encrypt_data("atrial fibrillation"),
+                           prescription=encrypt_data("warfarin 5mg daily"))
+    try:
+        with _client([User(id="p1", email="p1@x.io", hashed_password="h"), record]) as client:
+            resp = client.post("/api/v1/tele/generate-notes", json={"transcript": "Start ibuprofen for the knee.", "patient_id": "p1"})
+        conflicts = resp.json()["conflicts"]
+        assert [(c["drugs"], c["found_in"]) for c in conflicts] == [
+            (["ibuprofen", "warfarin"], {"ibuprofen": "transcript", "warfarin": "history"}),
+        ]
+    finally:
+        llm.set_provider(None)
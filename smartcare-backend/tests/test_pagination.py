@@ -0,0 +1,22 @@
+import pytest
+from fastapi import HTTPException
+
+from app.utils.pagination import decode_cursor, encode_cursor, escape_like
+
+
+def test_cursor_roundtrip():
+    cursor = encode_cursor("bob@example.com", 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 2) == ["bob@example.com", 42]
+    assert decode_cursor(None, 2) is None
+
+
+def test_bad_cursor_is_rejected():
+    with pytest.raises(HTTPException):
+        decode_cursor("not-a-cursor", 1)
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_cursor("a", "b"), 1)
+
+
+def test_escape_like():
+    assert escape_like("50%_off\\") == "50\\%\\_off\\\\"
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.llm import Completion, LLMProvider
+from app.services.response_cache import ResponseCache, normalize_prompt
+
+
+class CountingProvider(LLMProvider):
+    name = "counting"
+
+    def __init__(self, delay=0.01, fail=False):
+        super().__init__("counting-1")
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def _complete(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise HTTPException(status_code=504, detail="AI service timed out")
+        return Completion(f"note for {normalize_prompt(prompt)}", 0.9)
+
+    async def _stream(self, prompt):
+        self.calls += 1
+        for part in ("note ", "for ", normalize_prompt(prompt)):
+            await asyncio.sleep(self.delay)
+            yield part
+
+
+def test_identical_prompts_share_one_call_and_hit_afterwards():
+    async def scenario():
+        cache = ResponseCache()
+        provider = CountingProvider()
+        results = await asyncio.gather(*(cache.complete(provider, "Transcript:\r\n  cough  ") for _ in range(5)))
+        assert provider.calls == 1 and len(set(results)) == 1
+        # whitespace-only differences hit the same entry
+        assert await cache.complete(provider, "Transcript:\ncough") == results[0]
+        assert provider.calls == 1
+        assert (cache.misses, cache.shared, cache.hits) == (1, 4, 1)
+        await cache.complete(provider, "Transcript:\nwheeze")
+        assert provider.calls == 2 and cache.stats()["entries"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_errors_are_shared_but_not_cached():
+    async def scenario():
+        cache = ResponseCache()
+        provider = CountingProvider(fail=True)
+        results = await asyncio.gather(*(cache.complete(provider, "p") for _ in range(3)), return_exceptions=True)
+        assert provider.calls == 1 and all(isinstance(r, HTTPException) and r.status_code == 504 for r in results)
+        provider.fail = False
+        assert (await cache.complete(provider, "p")).text == "note for p" and provider.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_ttl_and_lru_bounds_and_sealed_values():
+    async def scenario():
+        cache = ResponseCache(max_entries=2, ttl_seconds=0.05)
+        provider = CountingProvider(delay=0)
+        for prompt in ("a", "b", "c"):
+            await cache.complete(provider, prompt)
+        assert len(cache) == 2 and cache.get(cache.key(provider, "a")) is None
+        assert all(b"note for" not in sealed for _, sealed in cache._entries.values())
+        await asyncio.sleep(0.06)
+        await cache.complete(provider, "c")
+        assert provider.calls == 4 and cache.expired == 1
+
+    asyncio.run(scenario())
+
+
+def test_stream_waiters_get_the_whole_text_and_retry_when_the_leader_goes_away():
+    async def collect(stream):
+        return [chunk async for chunk in stream]
+
+    async def scenario():
+        cache = ResponseCache()
+        provider = CountingProvider()
+        leader, follower = await asyncio.gather(collect(cache.stream(provider, "x")), collect(cache.stream(provider, "x")))
+        assert leader == ["note ", "for ", "x"] and follower == ["note for x"] and provider.calls == 1
+        assert await collect(cache.stream(provider, "x")) == ["note for x"]
+
+        # the leader's client disconnects after the first chunk: the waiter makes its own call
+        abandoned = cache.stream(provider, "y")
+        assert await abandoned.__anext__() == "note "
+        waiter = asyncio.create_task(collect(cache.stream(provider, "y")))
+        await asyncio.sleep(0)
+        await abandoned.aclose()
+        assert await waiter == ["note ", "for ", "y"] and provider.calls == 3
+
+    asyncio.run(scenario())
+
+
+def test_disabled_provider_is_refused_even_on_a_hit():
+    class Guarded(CountingProvider):
+        blocked = False
+
+        def check_ready(self):
+            if self.blocked:
+                raise HTTPException(status_code=503, detail="AI service disabled for PHI protection")
+
+    async def scenario():
+        cache = ResponseCache()
+        provider = Guarded()
+        await cache.complete(provider, "p")
+        provider.blocked = True
+        with pytest.raises(HTTPException):
+            await cache.complete(provider, "p")
+
+    asyncio.run(scenario())
+
+
+def test_stream_filled_entries_do_not_serve_unscored_completions():
+    async def collect(stream):
+        return [chunk async for chunk in stream]
+
+    async def scenario():
+        cache = ResponseCache()
+        provider = CountingProvider(delay=0)
+        assert "".join(await collect(cache.stream(provider, "x"))) == "note for x"
+        assert cache.get(cache.key(provider, "x"), scored=True) is None
+        # a non-streaming caller gets the provider's score, not the stream's text-only entry
+        assert await cache.complete(provider, "x") == Completion("note for x", 0.9)
+        assert provider.calls == 2 and await collect(cache.stream(provider, "x")) == ["note for x"]
+        assert await cache.complete(provider, "x") == Completion("note for x", 0.9) and provider.calls == 2
+
+        # a completion that waited on a streaming call makes its own, once it has finished
+        provider.delay = 0.01
+        streamed, completed = await asyncio.gather(collect(cache.stream(provider, "y")), cache.complete(provider, "y"))
+        assert "".join(streamed) == "note for y" and completed.score == 0.9 and provider.calls == 4
+
+    asyncio.run(scenario())
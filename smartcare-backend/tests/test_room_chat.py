@@ -0,0 +1,169 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+import sqlalchemy as sa
+from cryptography.fernet import Fernet
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1 import tele
+from app.api.v1.medical_records import get_current_user
+from app.database import Base, get_db
+from app.models.appointment import Appointment
+from app.models.doctor import Doctor  # noqa: F401  (User.doctor_profile backref)
+from app.models.medical_record import MedicalRecord  # noqa: F401  (User relationship target)
+from app.models.patient import Patient  # noqa: F401  (User.patient_profile backref)
+from app.models.room_chat import RoomChatMessage
+from app.models.user import User
+from app.services import room_chat
+from app.services.room_chat import RoomChatLog
+from app.signaling import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def encryption_key(monkeypatch):
+    monkeypatch.setenv("ENCRYPTION_KEY", Fernet.generate_key().decode())
+
+
+def _session_factory():
+    # one shared in-memory database, usable from the writer's worker thread
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+async def _room(manager):
+    sockets = {pid: FakeWebSocket() for pid in ("h1", "p1")}
+    for pid, ws in sockets.items():
+        await manager.connect(ws, "r1", pid)
+        await manager.announce(ws, "r1", pid, "host")
+    return sockets
+
+
+def test_chat_is_stamped_batched_and_replayed_since_seq():
+    async def scenario():
+        factory = _session_factory()
+        manager = ConnectionManager()
+        manager.use_redis(None)
+        manager.use_chat_log(RoomChatLog(factory, batch_size=3, flush_interval=60))
+        sockets = await _room(manager)
+
+        for n in range(5):
+            # a client-supplied seq must not survive
+            await manager.relay("r1", "h1", json.dumps({"type": "chat", "text": f"m{n}", "seq": 1}), "chat")
+            if n == 2:
+                await asyncio.sleep(0.05)
+        await asyncio.sleep(0.05)
+        relayed = list(sockets["p1"].sent)
+        delivered = [json.loads(m) for m in relayed]
+        seqs = [m["seq"] for m in delivered]
+        assert [m["text"] for m in delivered] == ["m0", "m1", "m2", "m3", "m4"]
+        assert seqs == sorted(seqs) and len(set(seqs)) == 5 and seqs[0] > 1
+
+        # the relay path did not wait: reaching batch_size woke the writer, the rest is buffered
+        log = manager.chat_log
+        assert (log.written, len(log.buffer)) == (3, 2)
+
+        # replay merges the table with rows not yet written
+        await manager.chat_sync("r1", "p1", seqs[1])
+        await asyncio.sleep(0.05)
+        history = json.loads(sockets["p1"].sent[-1])
+        assert history["type"] == "chat_history" and history["more"] is False
+        assert [m["text"] for m in history["messages"]] == ["m2", "m3", "m4"]
+
+        await log.close()
+        db = factory()
+        stored = db.query(RoomChatMessage).order_by(RoomChatMessage.seq).all()
+        # chat is PHI: only ciphertext reaches the table, and it decrypts to the relayed frames
+        assert [room_chat.stored_frame(row) for row in stored] == relayed
+        for row, frame in zip(stored, relayed):
+            assert row.frame != frame
+            with pytest.raises(ValueError):
+                json.loads(row.frame)
+
+        # replay from the table (nothing buffered any more) decrypts the frames
+        await manager.chat_sync("r1", "p1", seqs[2])
+        await asyncio.sleep(0.05)
+        assert [m["text"] for m in json.loads(sockets["p1"].sent[-1])["messages"]] == ["m3", "m4"]
+
+    asyncio.run(scenario())
+
+
+def test_history_pages_newest_first_and_since_pages_forward():
+    async def scenario():
+        factory = _session_factory()
+        log = RoomChatLog(factory, batch_size=100, flush_interval=60)
+        seqs = []
+        for n in range(7):
+            seq = log.next_seq()
+            seqs.append(seq)
+            log.append("r1", seq, "h1", json.dumps({"type": "chat", "seq": seq, "text": f"m{n}"}))
+        log.append("r2", log.next_seq(), "h2", json.dumps({"type": "chat", "text": "elsewhere"}))
+        await log.close()
+        return factory(), seqs
+
+    db, seqs = asyncio.run(scenario())
+    rows, more = room_chat.history_page(db, "r1", limit=3)
+    assert [r.seq for r in rows] == seqs[6:3:-1] and more
+    rows, more = room_chat.history_page(db, "r1", (rows[-1].seq, rows[-1].id), limit=5)
+    assert [r.seq for r in rows] == seqs[3::-1] and not more
+
+    rows, more = room_chat.since_page(db, "r1", seqs[2], limit=2)
+    assert [r.seq for r in rows] == seqs[3:5] and more
+    assert room_chat.message_row(rows[0])["message"]["text"] == "m3"
+
+
+def test_chat_endpoint_is_limited_to_the_appointment_participants():
+    async def write(factory, room_id):
+        log = RoomChatLog(factory, batch_size=10, flush_interval=60)
+        seq = log.next_seq()
+        log.append(room_id, seq, "h1", json.dumps({"type": "chat", "seq": seq, "text": "hello"}))
+        await log.close()
+
+    factory = _session_factory()
+    db = factory()
+    doctor = User(email="doc@x.io", hashed_password="h", role="doctor")
+    patient = User(email="pat@x.io", hashed_password="h")
+    outsider = User(email="out@x.io", hashed_password="h", role="doctor")
+    db.add_all([doctor, patient, outsider])
+    db.commit()
+    appointment = Appointment(doctor_id=doctor.id, patient_id=patient.id, appointment_time=datetime.now(timezone.utc))
+    db.add(appointment)
+    db.commit()
+    asyncio.run(write(factory, appointment.id))
+
+    app = FastAPI()
+    app.include_router(tele.router, prefix="/api/v1/tele")
+    app.dependency_overrides[get_db] = lambda: db
+    client = TestClient(app)
+
+    def as_user(user):
+        app.dependency_overrides[get_current_user] = lambda: user
+
+    for user, status in ((doctor, 200), (patient, 200), (outsider, 403)):
+        as_user(user)
+        resp = client.get(f"/api/v1/tele/rooms/{appointment.id}/chat")
+        assert resp.status_code == status
+        if status == 200:
+            assert [m["message"]["text"] for m in resp.json()] == ["hello"]
+    # a room that is not an appointment has no participants to check against
+    as_user(doctor)
+    assert client.get("/api/v1/tele/rooms/random-room/chat").status_code == 403
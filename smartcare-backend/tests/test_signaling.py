@@ -0,0 +1,633 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.realtime.frames import is_critical
+from app.realtime.heartbeat import PING_FRAME, TimingWheel
+from app.realtime.outbound import POLICY_DISCONNECT, POLICY_DROP_OLDEST, SocketWriter
+from app.realtime.ratelimit import RateLimit
+from app.realtime.room_state import MemoryRoomStateStore, RedisRoomStateStore
+from app.signaling import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.sent_at = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.sent.append(data)
+        self.sent_at.append(time.perf_counter())
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.closed = True
+
+
+class StalledWebSocket(FakeWebSocket):
+    """A peer whose network never drains."""
+
+    async def send_text(self, data):
+        await asyncio.Event().wait()
+
+
+async def _flush():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def _wait_for(condition, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        await asyncio.sleep(0.001)
+
+
+def _types(ws):
+    return [json.loads(m)["type"] for m in ws.sent]
+
+
+def test_join_flow_and_cleanup():
+    async def scenario():
+        manager = ConnectionManager()
+        manager.use_redis(None)
+        host, patient, stranger = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await manager.connect(patient, "r1", "p1")
+        await manager.join_request(patient, "r1", "p1", {"name": "Pat", "intake": "cough"})
+        await manager.connect(stranger, "r2", "p2")
+        await manager.join_request(stranger, "r2", "p2", {"name": "Other"})
+
+        await manager.connect(host, "r1", "h1")
+        await manager.announce(host, "r1", "h1", "host")
+        await _flush()
+        # Host only hears about pending requests in its own room
+        assert [json.loads(m)["from"] for m in host.sent] == ["p1"]
+
+        await manager.approve_join("r1", "h1", "p1")
+        await _flush()
+        assert _types(patient) == ["connection_granted"]
+        assert manager.is_active("r1", "p1")
+
+        await manager.publish("r1", "hello")
+        await _flush()
+        assert host.sent[-1] == "hello" and patient.sent[-1] == "hello"
+        assert "hello" not in stranger.sent
+
+        await manager.reject_join("r2", "h1", "p2")
+        await _flush()
+        assert _types(stranger) == ["connection_rejected"]
+        assert stranger.closed and "r2" not in manager.rooms
+
+        manager.disconnect(patient, "r1", "p1")
+        manager.disconnect(host, "r1", "h1")
+        assert manager.rooms == {}
+
+    asyncio.run(scenario())
+
+
+def test_slow_peer_does_not_block_room():
+    async def scenario():
+        manager = ConnectionManager()
+        manager.use_redis(None)
+        fast, slow = FakeWebSocket(), StalledWebSocket()
+        for ws, pid in ((fast, "h1"), (slow, "h2")):
+            await manager.connect(ws, "r1", pid)
+            await manager.announce(ws, "r1", pid, "host")
+
+        for i in range(5):
+            await asyncio.wait_for(manager.publish("r1", json.dumps({"type": "chat", "n": i})), 0.5)
+        await _flush()
+        assert len(fast.sent) == 5
+        # one frame is stuck in the slow socket's send, the rest wait in its queue
+        assert manager.metrics()["queue"]["queued_frames"] == 4
+
+    asyncio.run(scenario())
+
+
+def test_drop_oldest_keeps_critical_frames():
+    async def scenario():
+        writer = SocketWriter(FakeWebSocket(), max_frames=3, policy=POLICY_DROP_OLDEST)
+        writer.send("ping1", critical=False)
+        writer.send("offer")
+        writer.send("ping2", critical=False)
+        assert writer.send("answer")
+        assert [f for f, _ in writer.queue] == ["offer", "ping2", "answer"]
+        # queue now holds one droppable frame; a new ping evicts it
+        assert writer.send("ping3", critical=False)
+        assert [f for f, _ in writer.queue] == ["offer", "answer", "ping3"]
+        assert writer.stats.dropped_frames == 2
+
+    asyncio.run(scenario())
+
+
+def test_candidates_are_never_dropped_for_a_slow_socket():
+    async def scenario():
+        manager = ConnectionManager()
+        manager.use_redis(None)
+        manager.queue_max_frames = 3
+        slow = StalledWebSocket()
+        await manager.connect(slow, "r1", "h1")
+        await manager.announce(slow, "r1", "h1", "host")
+        assert not is_critical("ping") and is_critical("candidate") and is_critical("candidates")
+        for n in range(5):
+            await manager.publish("r1", json.dumps({"type": "candidate", "candidate": f"c{n}"}))
+        await _flush()
+        # a full queue of candidates closes the socket instead of losing one
+        assert slow.closed
+        assert manager.metrics()["queue"]["overflow_disconnects"] == 1
+        assert manager.metrics()["queue"]["dropped_frames"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_overflow_disconnects_slow_consumer():
+    async def scenario():
+        manager = ConnectionManager()
+        manager.use_redis(None)
+        manager.queue_max_frames = 2
+        manager.queue_policy = POLICY_DISCONNECT
+        slow = StalledWebSocket()
+        await manager.connect(slow, "r1", "h1")
+        await manager.announce(slow, "r1", "h1", "host")
+        for _ in range(4):
+            await manager.publish("r1", json.dumps({"type": "offer"}))
+        await _flush()
+        assert slow.closed
+        assert "r1" not in manager.rooms
+        assert manager.metrics()["queue"]["overflow_disconnects"] == 1
+
+    asyncio.run(scenario())
+
+
+class RecordingRedis:
+    """Records pub/sub calls; never delivers anything."""
+
+    def __init__(self, version="6.2.0"):
+        self.version = version
+        self.calls = []
+
+    async def info(self, section=None):
+        return {"redis_version": self.version}
+
+    def pubsub(self):
+        return self
+
+    async def subscribe(self, channel):
+        self.calls.append(("subscribe", channel))
+
+    async def unsubscribe(self, channel):
+        self.calls.append(("unsubscribe", channel))
+
+    async def ssubscribe(self, channel):
+        self.calls.append(("ssubscribe", channel))
+
+    async def sunsubscribe(self, channel):
+        self.calls.append(("sunsubscribe", channel))
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        await asyncio.sleep(timeout)
+
+    async def aclose(self):
+        pass
+
+
+def test_room_channels_follow_local_peers():
+    async def scenario():
+        client = RecordingRedis()
+        manager = ConnectionManager()
+        manager.use_redis(client, store=MemoryRoomStateStore())
+        a, b = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(a, "r1", "h1")
+        await manager.connect(b, "r1", "p1")
+        assert client.calls == [("subscribe", "room:r1")]
+
+        manager.disconnect(a, "r1", "h1")
+        await _flush()
+        assert client.calls == [("subscribe", "room:r1")]
+        manager.disconnect(b, "r1", "p1")
+        await _flush()
+        assert client.calls[-1] == ("unsubscribe", "room:r1")
+        assert manager.channels.rooms == set()
+        await manager.channels.close()
+
+    asyncio.run(scenario())
+
+
+def test_room_channels_use_sharded_pubsub_on_redis_7():
+    async def scenario():
+        client = RecordingRedis(version="7.2.4")
+        manager = ConnectionManager()
+        manager.use_redis(client, store=MemoryRoomStateStore())
+        ws = FakeWebSocket()
+        await manager.connect(ws, "r1", "h1")
+        manager.disconnect(ws, "r1", "h1")
+        await _flush()
+        assert client.calls == [("ssubscribe", "room:r1"), ("sunsubscribe", "room:r1")]
+        await manager.channels.close()
+
+    asyncio.run(scenario())
+
+
+class LoopbackServer:
+    """Tiny pub/sub server with a fixed network delay on every publish."""
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.subscribers = {}
+
+    def client(self):
+        return LoopbackClient(self)
+
+    def deliver(self, channel, data):
+        for queue in self.subscribers.get(channel, ()):
+            queue.put_nowait({"type": "message", "channel": channel, "data": data})
+
+
+class LoopbackClient:
+    def __init__(self, server):
+        self.server = server
+        self.queue = asyncio.Queue()
+
+    async def info(self, section=None):
+        return {"redis_version": "6.2.0"}
+
+    def pubsub(self):
+        return self
+
+    async def subscribe(self, channel):
+        self.server.subscribers.setdefault(channel, []).append(self.queue)
+
+    async def unsubscribe(self, channel):
+        self.server.subscribers.get(channel, []).remove(self.queue)
+
+    async def publish(self, channel, data):
+        await asyncio.sleep(self.server.latency)
+        self.server.deliver(channel, data)
+
+    def pipeline(self, transaction=True):
+        client, batch = self, []
+
+        class Pipeline:
+            def publish(self, channel, data):
+                batch.append((channel, data))
+
+            async def execute(self):
+                await asyncio.sleep(client.server.latency)
+                for channel, data in batch:
+                    client.server.deliver(channel, data)
+
+        return Pipeline()
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        pass
+
+
+async def _two_instances(server):
+    # Two workers sharing one pub/sub server and one room-state store
+    store = MemoryRoomStateStore()
+    a, b = ConnectionManager(), ConnectionManager()
+    a.instance_id, b.instance_id = "node-a", "node-b"
+    a.use_redis(server.client(), store=store)
+    b.use_redis(server.client(), store=store)
+    return a, b
+
+
+def test_gaps_count_only_the_receivers_rooms():
+    async def scenario():
+        server = LoopbackServer(latency=0.001)
+        a, b = await _two_instances(server)
+        sockets = {}
+        for manager, room, pid in ((a, "r1", "h1"), (a, "r2", "h2"), (b, "r1", "h3")):
+            sockets[pid] = FakeWebSocket()
+            await manager.connect(sockets[pid], room, pid)
+            await manager.announce(sockets[pid], room, pid, "host")
+
+        for i in range(20):
+            # r2 traffic is interleaved but b never subscribes to it
+            await a.publish("r1" if i % 2 else "r2", json.dumps({"type": "offer", "n": i}))
+        await _wait_for(lambda: len(sockets["h3"].sent) == 10)
+        assert b.channels.gaps == 0
+
+        # a genuinely lost r1 frame is still counted
+        origin = a.channels._streams["r1"][0]
+        server.deliver("room:r1", f"{origin}:13|" + json.dumps({"type": "offer", "n": 99}))
+        await _wait_for(lambda: b.channels.gaps == 2)
+        for manager in (a, b):
+            await manager.channels.close()
+
+    asyncio.run(scenario())
+
+
+def test_local_first_delivery_skips_redis_round_trip():
+    async def scenario():
+        server = LoopbackServer(latency=0.02)
+        a, b = await _two_instances(server)
+        sender, local_peer, remote_peer = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        for manager, ws, pid in ((a, sender, "h1"), (a, local_peer, "h2"), (b, remote_peer, "h3")):
+            await manager.connect(ws, "r1", pid)
+            await manager.announce(ws, "r1", pid, "host")
+
+        start = time.perf_counter()
+        await a.publish("r1", json.dumps({"type": "offer", "sdp": "v=0"}))
+        await _wait_for(lambda: remote_peer.sent and a.channels.skipped_own)
+        await _flush()
+
+        local_latency = local_peer.sent_at[0] - start
+        remote_latency = remote_peer.sent_at[0] - start
+        # The local peer no longer waits for the publish to come back from Redis
+        assert remote_latency - local_latency >= 0.015
+        # ...and does not get a second copy when it does
+        assert len(local_peer.sent) == 1 and len(sender.sent) == 1 and len(remote_peer.sent) == 1
+        assert _types(remote_peer) == ["offer"]
+        for manager in (a, b):
+            await manager.channels.close()
+
+    asyncio.run(scenario())
+
+
+def test_remote_delivery_keeps_sender_order_and_drops_duplicates():
+    async def scenario():
+        server = LoopbackServer(latency=0.001)
+        a, b = await _two_instances(server)
+        sender, remote_peer = FakeWebSocket(), FakeWebSocket()
+        await a.connect(sender, "r1", "h1")
+        await a.announce(sender, "r1", "h1", "host")
+        await b.connect(remote_peer, "r1", "h2")
+        await b.announce(remote_peer, "r1", "h2", "host")
+
+        for i in range(50):
+            await a.publish("r1", json.dumps({"type": "candidate", "n": i}))
+        await _wait_for(lambda: len(remote_peer.sent) == 50)
+        # a replayed envelope (e.g. after a reconnect) must not be delivered twice
+        origin = a.channels._streams["r1"][0]
+        server.deliver("room:r1", f"{origin}:7|" + json.dumps({"type": "candidate", "n": 6}))
+        await _wait_for(lambda: b.channels.duplicates == 1)
+        await _flush()
+
+        assert [json.loads(m)["n"] for m in remote_peer.sent] == list(range(50))
+        assert b.channels.duplicates == 1 and b.channels.gaps == 0
+        for manager in (a, b):
+            await manager.channels.close()
+
+    asyncio.run(scenario())
+
+
+def test_join_flow_across_instances():
+    async def scenario():
+        server = LoopbackServer(latency=0.001)
+        a, b = await _two_instances(server)
+        patient, late_patient, host = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+
+        # Patient waits on worker A before the host (on worker B) shows up
+        await a.connect(patient, "r1", "p1")
+        await a.join_request(patient, "r1", "p1", {"name": "Pat", "intake": "cough"})
+        await b.connect(host, "r1", "h1")
+        await b.announce(host, "r1", "h1", "host")
+        await _flush()
+        assert [json.loads(m)["from"] for m in host.sent] == ["p1"]
+
+        # A request made while the host is present is routed to B
+        await a.connect(late_patient, "r1", "p2")
+        await a.join_request(late_patient, "r1", "p2", {"name": "Lee"})
+        await _wait_for(lambda: len(host.sent) == 2)
+        assert json.loads(host.sent[-1])["from"] == "p2"
+
+        await b.approve_join("r1", "h1", "p1")
+        await b.approve_join("r1", "h1", "p1")  # second approval is a no-op
+        await _wait_for(lambda: a.is_active("r1", "p1"))
+        await _flush()
+        assert _types(patient) == ["connection_granted"]
+
+        await b.publish("r1", json.dumps({"type": "offer"}))
+        await _wait_for(lambda: len(patient.sent) == 2)
+
+        await b.reject_join("r1", "h1", "p2")
+        await _wait_for(lambda: late_patient.closed)
+        assert _types(late_patient) == ["connection_rejected"]
+        assert "p2" not in a.rooms["r1"].sockets
+        for manager in (a, b):
+            await manager.channels.close()
+
+    asyncio.run(scenario())
+
+
+class DictRedis:
+    """Just enough of redis.asyncio (hashes, sets, pipelines) for RedisRoomStateStore."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttl = {}
+
+    async def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field] = value
+
+    async def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    async def hdel(self, key, field):
+        return 1 if self.data.get(key, {}).pop(field, None) is not None else 0
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    async def srem(self, key, member):
+        self.data.get(key, set()).discard(member)
+
+    async def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    async def expire(self, key, seconds):
+        self.ttl[key] = seconds
+
+    def pipeline(self, transaction=True):
+        client, ops = self, []
+
+        class Pipeline:
+            def __getattr__(self, name):
+                return lambda *args: ops.append((name, args))
+
+            async def execute(self):
+                return [await getattr(client, name)(*args) for name, args in ops]
+
+        return Pipeline()
+
+
+@pytest.mark.parametrize("make_store", [MemoryRoomStateStore, lambda: RedisRoomStateStore(DictRedis(), ttl_seconds=60)])
+def test_room_state_store_contract(make_store):
+    async def scenario():
+        store = make_store()
+        await store.announce("r1", "h1", "host", "node-a")
+        await store.add_pending("r1", "p1", {"name": "Pat", "intake": None}, "node-b")
+        assert await store.hosts("r1") == {"h1"}
+        assert await store.pending("r1") == {"p1": {"name": "Pat", "intake": None}}
+        assert await store.locate("r1", "p1") == "node-b"
+
+        assert await store.take_pending("r1", "p1") == {"name": "Pat", "intake": None}
+        assert await store.take_pending("r1", "p1") is None
+        assert await store.pending("r1") == {}
+
+        # Cleanup from a worker the peer already left must not remove it
+        await store.remove_peer("r1", "p1", "node-a")
+        assert await store.locate("r1", "p1") == "node-b"
+        await store.remove_peer("r1", "p1", "node-b")
+        await store.remove_peer("r1", "h1")
+        assert await store.locate("r1", "p1") is None
+        assert await store.hosts("r1") == set()
+
+    asyncio.run(scenario())
+
+
+def test_timing_wheel_reschedule_and_cancel():
+    wheel = TimingWheel(tick_seconds=1.0, slots=8)
+    wheel.schedule("a", 2)
+    wheel.schedule("b", 2)
+    wheel.schedule("a", 3)  # pushed back: only one entry per key
+    wheel.schedule("c", 100)  # clamped to the wheel's span
+    wheel.cancel("b")
+    due = [wheel.advance() for _ in range(7)]
+    assert due[1] == [] and due[2] == ["a"] and due[6] == ["c"]
+    assert len(wheel) == 0
+
+
+def test_idle_sockets_are_pinged_then_reaped_with_all_state():
+    async def scenario():
+        manager = ConnectionManager()
+        manager.use_redis(None)
+        manager.heartbeat_tick = 0.01
+        manager.ping_interval, manager.idle_timeout = 0.03, 0.08
+        host, patient = FakeWebSocket(), FakeWebSocket()
+        host_writer = await manager.connect(host, "r1", "h1")
+        await manager.announce(host, "r1", "h1", "host")
+        await manager.connect(patient, "r1", "p1")
+        await manager.join_request(patient, "r1", "p1", {"name": "Pat", "intake": "x" * 500})
+        assert manager.metrics()["gauges"]["room_state"]["pending_payload_bytes"] > 500
+
+        # The host keeps talking; the waiting patient's connection has silently died
+        deadline = time.perf_counter() + 0.2
+        while time.perf_counter() < deadline:
+            host_writer.last_seen = time.monotonic()
+            await asyncio.sleep(0.01)
+
+        assert PING_FRAME not in host.sent
+        assert PING_FRAME in patient.sent and patient.closed
+        assert "p1" not in manager.rooms["r1"].sockets
+        gauges = manager.metrics()["gauges"]
+        assert gauges["live_sockets"] == 1 and gauges["watched_sockets"] == 1
+        assert gauges["room_state"]["pending_requests"] == 0
+        assert gauges["room_state"]["pending_payload_bytes"] == 0
+        assert manager.reaped == {"idle": 1}
+
+        manager.disconnect(host, "r1", "h1")
+        await _flush()
+        assert manager.rooms == {} and manager.store.stats()["rooms"] == 0
+        assert manager.metrics()["gauges"]["watched_sockets"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_candidate_coalescing_respects_protocol_and_order():
+    async def scenario():
+        manager = ConnectionManager()
+        manager.use_redis(None)
+        manager.set_candidate_window(20)
+        sender, modern, legacy = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await manager.connect(sender, "r1", "h1")
+        await manager.announce(sender, "r1", "h1", "host", 2)
+        await manager.connect(modern, "r1", "h2")
+        await manager.announce(modern, "r1", "h2", "host", 2)
+        await manager.connect(legacy, "r1", "h3")
+        await manager.announce(legacy, "r1", "h3", "host")
+
+        candidates = [json.dumps({"type": "candidate", "payload": {"candidate": f"c{i}"}}) for i in range(5)]
+        for frame in candidates[:3]:
+            await manager.relay("r1", "h1", frame, "candidate")
+        await _flush()
+        assert modern.sent == [] and legacy.sent == []  # still inside the window
+
+        # A non-candidate frame flushes the buffer first so order is kept
+        offer = json.dumps({"type": "offer"})
+        await manager.relay("r1", "h1", offer, "offer")
+        for frame in candidates[3:]:
+            await manager.relay("r1", "h1", frame, "candidate")
+        await asyncio.sleep(0.05)
+        await _flush()
+
+        assert _types(modern) == ["candidates", "offer", "candidates"]
+        assert [f["payload"]["candidate"] for f in json.loads(modern.sent[0])["frames"]] == ["c0", "c1", "c2"]
+        assert legacy.sent == candidates[:3] + [offer] + candidates[3:]
+        assert manager.metrics()["coalescing"]["batches_out"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_refills_up_to_burst():
+    limit = RateLimit(rate=10, burst=3)
+    bucket = limit.bucket(now=0.0)
+    assert [limit.allow(bucket, 0.0) for _ in range(4)] == [True, True, True, False]
+    # 0.1 s at 10/s buys one frame; a long pause never banks more than the burst
+    assert limit.allow(bucket, 0.1) and not limit.allow(bucket, 0.1)
+    assert sum(limit.allow(bucket, 100.0) for _ in range(5)) == 3
+
+
+def test_rate_limit_drops_per_peer_and_per_room():
+    async def scenario():
+        manager = ConnectionManager()
+        manager.use_redis(None)
+        manager.peer_limit = RateLimit(rate=1, burst=2)
+        manager.room_limit = RateLimit(rate=1, burst=3)
+        sockets = {pid: FakeWebSocket() for pid in ("h1", "h2", "h3")}
+        for pid, ws in sockets.items():
+            await manager.connect(ws, "r1", pid)
+            await manager.announce(ws, "r1", pid, "host")
+
+        now = time.monotonic()
+        admitted = [manager.admit("r1", "h1", now) for _ in range(4)]
+        assert admitted == [True, True, False, False]
+        for pid in ("h1", "h1", "h2", "h3"):
+            await manager.relay("r1", pid, json.dumps({"type": "chat", "from": pid}), "chat")
+        await _flush()
+        # the room bucket let three frames through and dropped the fourth
+        assert len(sockets["h2"].sent) == 3
+        stats = manager.metrics()["rate_limit"]
+        assert (stats["peer_limited"], stats["room_limited"], stats["disconnects"]) == (2, 1, 0)
+        assert stats["rooms"] == {"r1": {"limited": 3, "disconnects": 0}}
+
+    asyncio.run(scenario())
+
+
+def test_rate_limit_disconnect_policy_reaps_flooding_peer():
+    async def scenario():
+        manager = ConnectionManager()
+        manager.use_redis(None)
+        manager.peer_limit = RateLimit(rate=1, burst=1)
+        manager.rate_policy = "disconnect"
+        host, flooder = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(host, "r1", "h1")
+        await manager.connect(flooder, "r1", "p1")
+        now = time.monotonic()
+        assert manager.admit("r1", "p1", now)
+        assert not manager.admit("r1", "p1", now)
+        await _flush()
+        assert flooder.closed and not host.closed
+        assert "p1" not in manager.rooms["r1"].sockets
+        assert manager.reaped["rate_limited"] == 1
+        assert manager.metrics()["rate_limit"]["disconnects"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,59 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import signaling
+from app.realtime.frames import parse_frame, sniff_type
+from app.realtime.pubsub import KIND_BINARY, decode_envelope, encode_envelope
+
+
+def _msgpack_map(fields):
+    # minimal MessagePack encoder for {str: str} maps with short values
+    out = bytearray([0x80 | len(fields)])
+    for key, value in fields.items():
+        for s in (key.encode(), value.encode()):
+            out += bytes([0xA0 | len(s)]) + s if len(s) < 32 else bytes([0xD9, len(s)]) + s
+    return bytes(out)
+
+
+def test_sniff_reads_only_a_leading_type():
+    assert sniff_type('{"type": "offer", "sdp": "v=0"}') == "offer"
+    assert sniff_type(' {"type":"candidate"}') == "candidate"
+    # a nested type is never mistaken for the frame's own
+    assert sniff_type('{"payload": {"type": "announce"}, "type": "offer"}') is None
+    assert sniff_type("hello") is None
+    assert sniff_type(b'{"type": "chat", "text": "hi"}') == "chat"
+    assert sniff_type(_msgpack_map({"type": "candidate", "candidate": "c"})) == "candidate"
+    assert sniff_type(_msgpack_map({"sdp": "v=0", "type": "offer"})) is None
+    assert sniff_type(b"\x00\x01\x02") is None
+
+
+def test_parse_frame_only_returns_objects():
+    assert parse_frame('{"type": "announce", "role": "host"}') == {"type": "announce", "role": "host"}
+    assert parse_frame("[1, 2]") is None
+    assert parse_frame("not json") is None
+
+
+def test_binary_frames_survive_the_redis_envelope():
+    frame = _msgpack_map({"type": "offer", "sdp": "v=0"})
+    origin, seq, kind, decoded = decode_envelope(encode_envelope("node-a", 3, frame))
+    assert (origin, seq, kind, decoded) == ("node-a", 3, KIND_BINARY, frame)
+
+
+def test_relay_forwards_original_frames():
+    app = FastAPI()
+    app.include_router(signaling.router)
+    signaling.manager.use_redis(None)
+    offer = '{"type":"offer",   "sdp":"v=0\\r\\no=- 1 2 IN IP4 127.0.0.1"}'
+    binary = _msgpack_map({"type": "candidate", "candidate": "candidate:1 1 udp 1 10.0.0.1 5000 typ host"})
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/r1/h1") as host, client.websocket_connect("/ws/r1/h2") as other:
+            host.send_text(json.dumps({"type": "announce", "role": "host"}))
+            other.send_text(json.dumps({"type": "announce", "role": "host"}))
+            host.send_text(offer)
+            # byte-for-byte, including the sender's whitespace and escapes
+            assert other.receive_text() == offer
+            host.send_bytes(binary)
+            assert other.receive_bytes() == binary
+            assert host.receive_text() == offer
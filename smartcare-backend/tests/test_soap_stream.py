@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import pytest
+import sqlalchemy as sa
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, get_db
+from app.models.user import User  # noqa: F401  (MedicalRecord relationship target)
+from app.models.medical_record import MedicalRecord  # noqa: F401
+from app.models.doctor import Doctor  # noqa: F401  (User.doctor_profile backref)
+from app.models.patient import Patient  # noqa: F401  (User.patient_profile backref)
+from app.services import llm, response_cache
+from app.services.llm import LocalProvider
+from app.services.soap_stream import SoapNoteStream, SoapSectionParser
+
+
+def _pieces(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_parser_emits_members_as_they_complete_across_fragments():
+    note = {"subjective": 'Says "it hurts", {not json}', "objective": {"bp": [135, 85]}, "plan": None}
+    text = "```json\n" + json.dumps(note) + "\n```"
+    parser = SoapSectionParser()
+    seen = []
+    for piece in _pieces(text, 3):
+        for key, value in parser.feed(piece):
+            seen.append((key, value, parser.buffer))
+    assert [(k, v) for k, v, _ in seen] == list(note.items())
+    # subjective is emitted before the objective value has fully arrived
+    assert "135, 85]" not in seen[0][2]
+    assert parser.complete and parser.feed('{"extra": 1}') == []
+
+
+def test_safety_alert_is_sent_before_any_section():
+    note = {"subjective": "s", "objective": "o", "safety_alert": "Warfarin + aspirin", "plan": "p"}
+    stream = SoapNoteStream()
+    events = []
+    for piece in _pieces(json.dumps(note), 5):
+        events += [e for e in stream.feed(piece) if e[0] != "token"]
+    events += stream.finish()
+    assert [e[0] for e in events] == ["safety_alert", "section", "section", "section", "done"]
+    assert events[0][1] == {"value": "Warfarin + aspirin"}
+    assert [e[1]["name"] for e in events[1:4]] == ["subjective", "objective", "plan"]
+    assert events[-1][1]["notes"] == note
+
+
+def test_unstructured_text_falls_back_like_generate_notes():
+    stream = SoapNoteStream()
+    stream.feed("Model declined ")
+    stream.feed("to answer.")
+    [(name, data)] = stream.finish()
+    assert name == "done" and data["notes"] == {"text": "Model declined to answer."}
+
+
+def test_stream_endpoint_sends_sections_then_done():
+    from app.api.v1 import tele
+
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)
+
+    def override_db():
+        db = session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(tele.router, prefix="/api/v1/tele")
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[tele.require_doctor] = lambda: None
+    provider = LocalProvider(base_ms=0, per_kchar_ms=0, jitter_ms=0)
+    llm.set_provider(provider)
+    response_cache.cache.clear()
+    try:
+        with TestClient(app) as client:
+            resp = client.post("/api/v1/tele/generate-notes/stream", json={"transcript": "Cough for 3 days.", "patient_id": "p1"})
+        assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/event-stream")
+        events = [
+            (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+            for block in resp.text.strip().split("\n\n")
+        ]
+        names = [name for name, _ in events]
+        assert names.count("token") > 1 and names[-1] == "done"
+        assert [data["name"] for name, data in events if name == "section"] == ["subjective", "objective", "assessment", "plan"]
+        assert "".join(data["text"] for name, data in events if name == "token") == json.dumps(events[-1][1]["notes"])
+        assert events[-1][1]["notes"]["subjective"] == "Cough for 3 days."
+        assert provider.metrics()["in_flight"] == 0 and provider.metrics()["calls"] == 1
+    finally:
+        llm.set_provider(None)
+
+
+def test_stream_holds_the_slot_until_closed_and_times_out_idle_chunks():
+    class Stalling(LocalProvider):
+        async def _stream(self, prompt):
+            yield "{"
+            await asyncio.sleep(1)
+            yield "}"
+
+    async def scenario():
+        provider = Stalling(base_ms=0, per_kchar_ms=0, jitter_ms=0, max_concurrency=1, timeout=0.02)
+        chunks = provider.stream("x")
+        assert await chunks.__anext__() == "{"
+        assert provider.metrics()["in_flight"] == 1
+        with pytest.raises(HTTPException) as timed_out:
+            await chunks.__anext__()
+        assert timed_out.value.status_code == 504
+        metrics = provider.metrics()
+        assert (metrics["timeouts"], metrics["in_flight"]) == (1, 0)
+
+    asyncio.run(scenario())
+
+
+def test_note_endpoints_require_a_doctor():
+    from app.api.v1 import tele
+    from app.api.v1.medical_records import get_current_user
+    from app.models.user import User
+
+    app = FastAPI()
+    app.include_router(tele.router, prefix="/api/v1/tele")
+    app.dependency_overrides[get_db] = lambda: None
+    payload = {"transcript": "Cough for 3 days.", "patient_id": "p1"}
+    for url in ("/api/v1/tele/generate-notes", "/api/v1/tele/generate-notes/stream"):
+        app.dependency_overrides.pop(get_current_user, None)
+        with TestClient(app) as client:
+            assert client.post(url, json=payload).status_code == 401
+            app.dependency_overrides[get_current_user] = lambda: User(id="u1", role="patient")
+            resp = client.post(url, json=payload)
+        assert resp.status_code == 403 and resp.json()["detail"] == "Only doctors can generate clinical notes"
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.llm import Completion, LLMProvider
+from app.services.soap_stream import sse_map_reduce
+from app.services.transcript_summary import ChunkSummaryCache, TranscriptJob, chunk_transcript
+
+
+class ScriptedProvider(LLMProvider):
+    name = "scripted"
+
+    def __init__(self, fail=()):
+        super().__init__("scripted-1", max_concurrency=16)
+        self.fail = set(fail)
+        self.prompts = []
+        self.active = 0
+        self.peak = 0
+
+    async def _complete(self, prompt):
+        self.prompts.append(prompt)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.005)
+        finally:
+            self.active -= 1
+        excerpt = prompt.split("Excerpt:\n", 1)[-1].split("\n\nProvide", 1)[0]
+        first = excerpt.splitlines()[0]
+        if first in self.fail:
+            raise HTTPException(status_code=504, detail="AI service timed out")
+        return Completion(f"summary of {first}")
+
+    async def _stream(self, prompt):
+        yield '{"safety_alert": null, "subjective": "s"'
+        yield ', "objective": "o", "assessment": "a", "plan": "p"}'
+
+
+TRANSCRIPT = "\n".join(f"line {n:02d} " + "x" * 30 for n in range(40))
+
+
+def test_chunks_are_bounded_ordered_and_overlap():
+    chunks = chunk_transcript(TRANSCRIPT, max_chars=200, overlap_chars=90)
+    assert all(len(chunk) <= 200 for chunk in chunks) and len(chunks) > 5
+    for prev, chunk in zip(chunks, chunks[1:]):
+        # each chunk starts with the last two lines of the previous one
+        assert chunk.splitlines()[:2] == prev.splitlines()[-2:]
+    assert chunks[0].startswith("line 00") and chunks[-1].endswith(TRANSCRIPT[-30:])
+    assert chunk_transcript("short", 200, 90) == ["short"]
+    assert [len(c) for c in chunk_transcript("y" * 450, 200, 50)] == [200, 200, 50]
+
+
+def test_map_runs_under_the_cap_and_retry_only_redoes_failed_chunks():
+    cache = ChunkSummaryCache()
+
+    async def scenario():
+        job = TranscriptJob(TRANSCRIPT, ScriptedProvider(), chunk_chars=200, overlap_chars=90,
+                            concurrency=3, summary_cache=cache)
+        failing = job.chunks[2].splitlines()[0]
+        job.provider.fail = {failing}
+        progress = []
+        with pytest.raises(HTTPException) as failed:
+            async for update in job.progress():
+                progress.append(update)
+        assert failed.value.status_code == 504
+        assert job.provider.peak == 3 and len(job.provider.prompts) == len(job.chunks)
+        assert [p["done"] for p in progress] == list(range(1, len(job.chunks) + 1))
+        assert progress[-1]["failed"] == 1
+
+        retry = TranscriptJob(TRANSCRIPT, ScriptedProvider(), chunk_chars=200, overlap_chars=90, summary_cache=cache)
+        summaries = await retry.run()
+        assert len(retry.provider.prompts) == 1 and retry.cached == len(retry.chunks) - 1
+        assert summaries[2] == f"summary of {failing}"
+        assert retry.reduce_input().index("[Part 1 of") < retry.reduce_input().index("[Part 2 of")
+
+    asyncio.run(scenario())
+
+
+def test_stream_reports_progress_before_the_note():
+    async def scenario():
+        job = TranscriptJob(TRANSCRIPT, ScriptedProvider(), chunk_chars=400, overlap_chars=0,
+                            summary_cache=ChunkSummaryCache())
+        prompts = []
+
+        def prompt(summaries):
+            prompts.append(summaries)
+            return summaries
+
+        events = [block.split("\n")[0][len("event: "):] async for block in sse_map_reduce(job, prompt)]
+        total = len(job.chunks)
+        assert events[:total + 1] == ["progress"] * (total + 1)
+        assert events.count("section") == 4 and events[-1] == "done"
+        assert "summary of line 00" in prompts[0]
+
+    asyncio.run(scenario())
@@ -6,7 +6,7 @@ import { Video, VideoOff, Mic, MicOff, PhoneOff, Camera, MessageCircle, Papercli
 import { useAuth } from '@/contexts/AuthContext';
 import { toast } from 'sonner';
 import LoadingSpinner from '@/components/LoadingSpinner';
-import apiFetch from '@/lib/api';
+import apiFetch, { API_URL } from '@/lib/api';
 import { supabase } from '@/lib/supabase';
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogDescription, DialogFooter } from '@/components/ui/dialog';
 
@@ -69,6 +69,8 @@ const VideoCallPage: React.FC = () => {
   const [chatOpen, setChatOpen] = useState(false);
   const [chatMessages, setChatMessages] = useState<Array<{ sender: string; text: string; ts: number }>>([]);
   const [chatInput, setChatInput] = useState('');
+  // highest server chat `seq` seen, so a reconnect only replays what was missed
+  const lastChatSeqRef = useRef<number>(0);
 
   const [notesOpen, setNotesOpen] = useState(false);
   const [notesLoading, setNotesLoading] = useState(false);
@@ -170,7 +172,10 @@ const VideoCallPage: React.FC = () => {
     ws.onopen = () => {
       // websocket opened
       try {
-        ws.send(JSON.stringify({ type: 'announce', role, peerId, name: (user as any)?.full_name || user?.email }));
+        // protocol 2: accepts batched `candidates` frames
+        ws.send(JSON.stringify({ type: 'announce', role, peerId, name: (user as any)?.full_name || user?.email, protocol: 2 }));
+        // hosts are active right away; patients sync once granted
+        if (role === 'doctor') ws.send(JSON.stringify({ type: 'chat_sync', since: lastChatSeqRef.current }));
       } catch (e) { }
 
       // start heartbeat every 30s
@@ -188,6 +193,11 @@ const VideoCallPage: React.FC = () => {
         const type = msg?.type;
         const from = msg?.from;
         const payload = msg?.payload ?? msg?.data ?? null;
+        // server keepalive: answer so the server does not reap this socket as idle
+        if (type === 'ping' && from === 'server') {
+          try { ws.send(JSON.stringify({ type: 'pong' })); } catch (e) { }
+          return;
+        }
         // handle file-share
         if (type === 'file-share') {
           try {
@@ -202,9 +212,19 @@ const VideoCallPage: React.FC = () => {
         }
         // handle chat
         if (type === 'chat') {
+          if (typeof msg.seq === 'number') lastChatSeqRef.current = Math.max(lastChatSeqRef.current, msg.seq);
           setChatMessages(prev => [...prev, { sender: msg.sender || 'Peer', text: msg.text || '', ts: Date.now() }]);
           return;
         }
+        // chat missed while disconnected (reply to chat_sync)
+        if (type === 'chat_history') {
+          const missed = (msg.messages || []).filter((m: any) => typeof m?.seq === 'number' && m.seq > lastChatSeqRef.current);
+          if (missed.length) {
+            lastChatSeqRef.current = missed[missed.length - 1].seq;
+            setChatMessages(prev => [...prev, ...missed.map((m: any) => ({ sender: m.sender || 'Peer', text: m.text || '', ts: Date.now() }))]);
+          }
+          return;
+        }
 
         if (type === 'join_request') {
           if (role === 'doctor') {
@@ -216,6 +236,7 @@ const VideoCallPage: React.FC = () => {
 
         if (type === 'connection_granted') {
           if (role === 'patient') {
+            try { ws.send(JSON.stringify({ type: 'chat_sync', since: lastChatSeqRef.current })); } catch (e) { }
             setIsWaiting(false);
             setJoining(true);
             try { await startCall(); } catch (e) { console.warn(e); }
@@ -233,13 +254,17 @@ const VideoCallPage: React.FC = () => {
           return;
         }
 
-        if (type === 'candidate') {
-          const cand = payload;
+        if (type === 'candidate' || type === 'candidates') {
+          // `candidates` carries several original candidate frames coalesced by the server
+          const cands = type === 'candidates' ? (msg.frames || []).map((f: any) => f?.payload ?? f?.data) : [payload];
           const pc = pcRef.current;
-          if (pc && pc.remoteDescription && pc.remoteDescription.type) {
-            try { await pc.addIceCandidate(cand); } catch (e) { console.warn('addIceCandidate failed', e); }
-          } else {
-            pendingCandidatesRef.current.push(cand);
+          for (const cand of cands) {
+            if (!cand) continue;
+            if (pc && pc.remoteDescription && pc.remoteDescription.type) {
+              try { await pc.addIceCandidate(cand); } catch (e) { console.warn('addIceCandidate failed', e); }
+            } else {
+              pendingCandidatesRef.current.push(cand);
+            }
           }
           return;
         }
@@ -788,17 +813,53 @@ const VideoCallPage: React.FC = () => {
                       const chatTranscript = chatMessages.map(m => `${m.sender}: ${m.text}`).join('\n');
                       const transcript = intake || chatTranscript || 'Patient exam transcript...';
 
-                      const res = await apiFetch({
-                        path: '/api/v1/tele/generate-notes',
+                      // Stream the note (SSE): sections appear as the model finishes them,
+                      // with any safety alert shown first.
+                      const token = localStorage.getItem('access_token');
+                      const res = await fetch(`${API_URL}/tele/generate-notes/stream`, {
                         method: 'POST',
+                        headers: { 'Content-Type': 'application/json', ...(token ? { Authorization: `Bearer ${token}` } : {}) },
                         body: JSON.stringify({ transcript, patient_id: patientIdFromUrl }),
-                        auth: true as any
-                      } as any);
-                      // apiFetch may return an Axios-like response where the payload is under `data`,
-                      // so normalize by checking common locations for the notes payload.
-                      const notes = (res as any)?.data?.notes ?? (res as any)?.notes ?? (res as any)?.data ?? res;
-                      setNotesContent(notes);
+                      });
+                      if (!res.ok || !res.body) {
+                        const err = await res.json().catch(() => null);
+                        // the local medication check still answers when the AI service is unavailable
+                        if (err?.conflicts?.length) {
+                          setNotesContent({ conflicts: err.conflicts });
+                          setNotesOpen(true);
+                        }
+                        throw new Error(err?.detail || `Note generation failed (${res.status})`);
+                      }
+                      setNotesContent({});
                       setNotesOpen(true);
+                      const reader = res.body.getReader();
+                      const decoder = new TextDecoder();
+                      let buffered = '';
+                      for (;;) {
+                        const { value, done } = await reader.read();
+                        if (done) break;
+                        buffered += decoder.decode(value, { stream: true });
+                        const blocks = buffered.split('\n\n');
+                        buffered = blocks.pop() || '';
+                        for (const block of blocks) {
+                          const event = block.match(/^event: (.*)$/m)?.[1];
+                          const data = block.match(/^data: (.*)$/m)?.[1];
+                          if (!event || !data) continue;
+                          const payload = JSON.parse(data);
+                          if (event === 'conflicts') {
+                            if (payload.conflicts.length) setNotesContent((n: any) => ({ conflicts: payload.conflicts, ...n }));
+                          }
+                          else if (event === 'progress') {
+                            // long transcripts: chunk summaries first, then the note itself
+                            const status = payload.stage === 'map' ? `Summarizing transcript (${payload.done}/${payload.total})` : 'Writing note...';
+                            setNotesContent((n: any) => ({ ...n, status }));
+                          }
+                          else if (event === 'safety_alert') setNotesContent((n: any) => ({ safety_alert: payload.value, ...n }));
+                          else if (event === 'section') setNotesContent((n: any) => ({ ...n, [payload.name]: payload.value }));
+                          else if (event === 'done') setNotesContent((n: any) => (n?.conflicts ? { conflicts: n.conflicts, ...payload.notes } : payload.notes));
+                          else if (event === 'error') toast.error(String(payload.detail));
+                        }
+                      }
                     }
                     catch (e: any) { toast.error(String(e?.message || e)); }
                     finally { setNotesLoading(false); }